@@ -2,3 +2,6 @@
 # from ferry.gym_grpc import gym_pb2, gym_pb2_grpc
 from ferry.mmap_backends import ClientBackend, ServerBackend
 from ferry.mmap_envs import ServerEnv, ClientEnv
+from ferry.vector_envs import ClientVectorEnv, BatchClientEnv
+from ferry.async_envs import AsyncClientEnv, gather_steps
+from ferry.policy_server import PolicyServer
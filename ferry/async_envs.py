@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+import numpy as np
+
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.mmap_envs import ClientEnv
+
+
+async def receive_message(communicator, max_sleep: float = 1e-3) -> Optional[gym_ferry_pb2.GymnasiumMessage]:
+    """
+    Await the next message on a channel without blocking the event loop.
+
+    If the channel has a file descriptor to wait on (sockets, or the "block" wait strategy), the event loop wakes up
+    when the other side notifies. Otherwise the flag is polled, sleeping with an exponentially growing interval
+    of up to `max_sleep` seconds in between.
+    """
+    fd = communicator.fileno()
+    if fd is not None:
+        loop = asyncio.get_running_loop()
+        while not communicator.poll():
+            readable = loop.create_future()
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(fd)
+            communicator.clear_wakeups()
+    else:
+        delay = 0.
+        while not communicator.poll():
+            await asyncio.sleep(delay)
+            delay = min(max(2 * delay, 1e-6), max_sleep)
+    return communicator.receive_message()
+
+
+class AsyncClientEnv(ClientEnv):
+    """
+    A ClientEnv with awaitable `reset`, `step` and `close`, so that a single event loop can drive many envs.
+    The handshake in the constructor still blocks until the backend is up.
+    """
+    async def reset(self, seed=None, options=None):
+        self.reset_async(seed=seed, options=options)
+        return self._reset_result(await receive_message(self.communicator))
+
+    async def step(self, action: np.ndarray | int):
+        self.step_async(action)
+        return self._step_result(await receive_message(self.communicator))
+
+    async def close(self):
+        super().close()
+
+
+async def gather_steps(envs: list[AsyncClientEnv], actions) -> list[tuple]:
+    """Step every env with its action concurrently, and return their results in order."""
+    return list(await asyncio.gather(*(env.step(action) for env, action in zip(envs, actions))))
@@ -0,0 +1,331 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import time
+from typing import Dict, List, Optional, Tuple
+
+import gymnasium as gym
+import numpy as np
+from typarse import BaseParser
+
+from ferry.compression import COMPRESSORS, ObsDecoder, ObsEncoder
+from ferry.core import Communicator, make_communicator, TRANSPORTS
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.mmap_backends import ClientBackend, ServerBackend
+from ferry.mmap_envs import ClientEnv, ServerEnv
+from ferry.utils import decode, encode
+from ferry.wait import WAIT_STRATEGIES
+
+
+# Sockets always block in the kernel, so there's no wait strategy to compare
+SOCKET_TRANSPORTS = ("unix", "tcp")
+
+# ClientEnv talking to a ServerBackend, or ServerEnv talking to a ClientBackend
+PARADIGMS = ("client", "server")
+
+BENCH_ENV = "ferry/Bench-v0"
+
+
+class BenchEnv(gym.Env):
+    """An env that does no work at all, so that only the cost of moving its observations shows."""
+    def __init__(self, size: int = 4, dtype: str = "float32", episode_length: int = 1000):
+        self.observation_space = gym.spaces.Box(0, 1, (size,), np.dtype(dtype))
+        self.action_space = gym.spaces.Discrete(2)
+        self.episode_length = episode_length
+        self.obs = np.zeros(size, dtype=dtype)
+        self.t = 0
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.t = 0
+        return self.obs, {}
+
+    def step(self, action):
+        self.t += 1
+        return self.obs, 1., False, self.t >= self.episode_length, {}
+
+
+if BENCH_ENV not in gym.registry:
+    gym.register(BENCH_ENV, entry_point="ferry.bench:BenchEnv")
+
+
+def _summary(latencies: np.ndarray, wall: float, client_cpu: float, server_cpu: float) -> dict:
+    return {
+        "per_sec": len(latencies) / wall,
+        "p50_us": float(np.percentile(latencies, 50) * 1e6),
+        "p99_us": float(np.percentile(latencies, 99) * 1e6),
+        "client_cpu": client_cpu / wall,
+        "server_cpu": server_cpu / wall,
+    }
+
+
+def _echo(transport: str, name: str, wait: str, round_trips: int, work: float, port: int,
+          cpu: multiprocessing.Queue):
+    communicator = make_communicator(transport, name, create=True, port=port, wait=wait)
+    communicator.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))
+    start = time.process_time()
+    for _ in range(round_trips):
+        msg = communicator.receive_message()
+        if work > 0:
+            time.sleep(work)
+        communicator.send_message(msg)
+    cpu.put(time.process_time() - start)
+    communicator.receive_message()
+    communicator.close()
+
+
+def bench_wait(wait: str, round_trips: int = 10_000, work: float = 0., name: str = "ferry_bench",
+               transport: str = "mmap", port: int = 50123) -> dict:
+    """
+    Ping-pong messages with an echo process, which sleeps for `work` seconds before each reply to emulate an env
+    or a policy doing heavy work. Reports the round trip latency, and how much CPU both sides burned meanwhile.
+    Socket transports go over loopback, on `port` for "tcp".
+    """
+    Communicator.unlink(name)
+    cpu = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_echo, args=(transport, name, wait, round_trips, work, port, cpu))
+    process.start()
+
+    communicator = make_communicator(transport, name, create=False, port=port)
+    communicator.receive_message()
+    msg = gym_ferry_pb2.GymnasiumMessage(status=True)
+    latencies = np.zeros(round_trips)
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    for i in range(round_trips):
+        t0 = time.perf_counter()
+        communicator.send_message(msg)
+        communicator.receive_message()
+        latencies[i] = time.perf_counter() - t0
+    wall, client_cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+    server_cpu = cpu.get()
+    communicator.send_message(gym_ferry_pb2.GymnasiumMessage(close=True))
+    process.join()
+
+    return {
+        "transport": transport,
+        "wait": "-" if transport in SOCKET_TRANSPORTS else wait,
+        "work": work,
+        **_summary(latencies, wall, client_cpu, server_cpu),
+    }
+
+
+def _run_backend(paradigm: str, env_kwargs: dict, transport: str, wait: str, name: str, port: int,
+                 cpu: multiprocessing.Queue):
+    with contextlib.redirect_stdout(io.StringIO()):
+        if paradigm == "client":
+            backend = ServerBackend(BENCH_ENV, port=port, env_kwargs=env_kwargs, name=name, wait=wait,
+                                    transport=transport)
+        else:
+            backend = ClientBackend(BENCH_ENV, port=port, env_kwargs=env_kwargs, name=name, transport=transport)
+    start = time.process_time()
+    backend.run()
+    cpu.put(time.process_time() - start)
+
+
+def bench_env(paradigm: str, size: int, dtype: str, transport: str = "mmap", wait: str = "spin",
+              steps: int = 2000, name: str = "ferry_bench", port: int = 50123) -> dict:
+    """
+    Step a BenchEnv with `size` observation elements of type `dtype` through a backend process, in either
+    paradigm, and report the step latency seen by the env side and the CPU both sides burned.
+    """
+    env_kwargs = {"size": size, "dtype": dtype}
+    Communicator.unlink(name)
+    cpu = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_backend,
+                                      args=(paradigm, env_kwargs, transport, wait, name, port, cpu))
+    process.start()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if paradigm == "client":
+            env = ClientEnv(port=port, name=name, transport=transport)
+        else:
+            env = ServerEnv(port=port, name=name, wait=wait, transport=transport)
+    env.reset(seed=0)
+    action = np.array([0])
+    latencies = np.zeros(steps)
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    for i in range(steps):
+        t0 = time.perf_counter()
+        _, _, terminated, truncated, _ = env.step(action)
+        latencies[i] = time.perf_counter() - t0
+        if terminated or truncated:
+            env.reset()
+    wall, client_cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+    env.close()
+    server_cpu = cpu.get()
+    process.join()
+
+    return {
+        "paradigm": paradigm,
+        "size": size,
+        "dtype": dtype,
+        "transport": transport,
+        "wait": "-" if transport in SOCKET_TRANSPORTS else wait,
+        **_summary(latencies, wall, client_cpu, server_cpu),
+    }
+
+
+def bench_gym(size: int, dtype: str, steps: int = 2000) -> dict:
+    """The same BenchEnv stepped in-process through `gym.make`, as the floor for the other paradigms."""
+    env = gym.make(BENCH_ENV, size=size, dtype=dtype)
+    env.reset(seed=0)
+    latencies = np.zeros(steps)
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    for i in range(steps):
+        t0 = time.perf_counter()
+        _, _, terminated, truncated, _ = env.step(0)
+        latencies[i] = time.perf_counter() - t0
+        if terminated or truncated:
+            env.reset()
+    wall, client_cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    env.close()
+
+    return {
+        "paradigm": "gym.make",
+        "size": size,
+        "dtype": dtype,
+        "transport": "-",
+        "wait": "-",
+        **_summary(latencies, wall, client_cpu, 0.),
+    }
+
+
+def _frames(shape: Tuple[int, ...], change: float, count: int) -> List[np.ndarray]:
+    """Synthetic pixel observations: a smooth image, in which a `change` fraction of the pixels is redrawn each step."""
+    rng = np.random.default_rng(0)
+    frame = (np.indices(shape).sum(axis=0) * 255 // sum(shape)).astype(np.uint8)
+    frames = []
+    for _ in range(count):
+        frame = frame.copy()
+        changed = rng.random(shape[:2]) < change
+        frame[changed] = rng.integers(256, size=(int(changed.sum()),) + shape[2:], dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def bench_obs_codec(shape: Tuple[int, ...], compression: str, change: float, count: int = 200,
+                    keyframe_interval: int = 100) -> dict:
+    """
+    Encode and decode a stream of synthetic frames with an observation codec, against plain `encode`/`decode`.
+    `break_even_MBps` is the link bandwidth below which the smaller payload makes up for the extra CPU time.
+    """
+    frames = _frames(shape, change, count)
+    raw_bytes = frames[0].nbytes
+
+    start = time.perf_counter()
+    for frame in frames:
+        decode(encode(frame))
+    raw_s = (time.perf_counter() - start) / count
+
+    encoder, decoder = ObsEncoder(compression, keyframe_interval), ObsDecoder()
+    sizes, encode_s, decode_s = [], 0., 0.
+    for frame in frames:
+        t0 = time.perf_counter()
+        msg = encoder.encode(frame)
+        t1 = time.perf_counter()
+        decoder.decode(msg)
+        decode_s += time.perf_counter() - t1
+        encode_s += t1 - t0
+        sizes.append(len(msg.data))
+    encode_s, decode_s = encode_s / count, decode_s / count
+    codec_bytes = float(np.mean(sizes))
+
+    extra_s = encode_s + decode_s - raw_s
+    return {
+        "shape": "x".join(map(str, shape)),
+        "compression": compression,
+        "change": change,
+        "ratio": raw_bytes / codec_bytes,
+        "raw_us": raw_s * 1e6,
+        "encode_us": encode_s * 1e6,
+        "decode_us": decode_s * 1e6,
+        "break_even_MBps": (raw_bytes - codec_bytes) / extra_s / 1e6 if extra_s > 0 else float("inf"),
+    }
+
+
+class Parser(BaseParser):
+    transports: Optional[List[str]]
+    waits: Optional[List[str]]
+    paradigms: Optional[List[str]]
+    sizes: Optional[List[int]]
+    dtypes: Optional[List[str]]
+    round_trips: int = 10_000
+    steps: int = 2000
+    work: float = 0.
+    codecs: Optional[List[str]]
+    changes: Optional[List[float]]
+    codec_frames: int = 200
+    json: bool
+
+    _help = {
+        "transports": "Transports to compare (default: all)",
+        "waits": "Wait strategies to compare on shared memory transports (default: all)",
+        "paradigms": "Which side hosts the env: client (ClientEnv + ServerBackend), server (ServerEnv + ClientBackend)",
+        "sizes": "Observation sizes, in elements (default: 4 1024 100800)",
+        "dtypes": "Observation dtypes (default: float32 uint8)",
+        "round_trips": "Number of raw message round trips per channel, 0 to skip them",
+        "steps": "Number of env steps per configuration, 0 to skip them",
+        "work": "Seconds the echo side sleeps before each reply",
+        "codecs": "Observation compressors to compare (default: all available)",
+        "changes": "Fractions of pixels changing between frames (default: 0.001 0.01 0.1)",
+        "codec_frames": "Number of frames per observation codec configuration, 0 to skip them",
+        "json": "Print the results as JSON",
+    }
+
+
+def _print_table(results: List[Dict], keys: List[str]):
+    print(" ".join(f"{key:>9}" for key in keys) +
+          f" {'per sec':>10} {'p50 us':>10} {'p99 us':>10} {'client cpu':>11} {'server cpu':>11}")
+    for r in results:
+        print(" ".join(f"{r[key]:>9}" for key in keys) +
+              f" {r['per_sec']:>10.0f} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} "
+              f"{r['client_cpu']:>11.0%} {r['server_cpu']:>11.0%}")
+
+
+if __name__ == "__main__":
+    args = Parser()
+
+    configs = []
+    for transport in args.transports or TRANSPORTS:
+        waits = ["block"] if transport in SOCKET_TRANSPORTS else args.waits or WAIT_STRATEGIES
+        configs += [(transport, wait) for wait in waits]
+
+    results = {"round_trips": [], "steps": [], "codecs": []}
+    if args.round_trips > 0:
+        results["round_trips"] = [bench_wait(wait, args.round_trips, args.work, transport=transport)
+                                  for transport, wait in configs]
+    if args.steps > 0:
+        for size in args.sizes or [4, 1024, 100800]:
+            for dtype in args.dtypes or ["float32", "uint8"]:
+                results["steps"].append(bench_gym(size, dtype, args.steps))
+                for paradigm in args.paradigms or PARADIGMS:
+                    results["steps"] += [bench_env(paradigm, size, dtype, transport, wait, args.steps)
+                                         for transport, wait in configs]
+
+    if args.codec_frames > 0:
+        for shape in [(84, 84, 4), (210, 160, 3), (512, 512, 3)]:
+            for compression in args.codecs or COMPRESSORS:
+                results["codecs"] += [bench_obs_codec(shape, compression, change, args.codec_frames)
+                                      for change in args.changes or [0.001, 0.01, 0.1]]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        if results["round_trips"]:
+            _print_table(results["round_trips"], ["transport", "wait"])
+            print()
+        if results["steps"]:
+            _print_table(results["steps"], ["paradigm", "size", "dtype", "transport", "wait"])
+            print()
+        if results["codecs"]:
+            print(f"{'shape':>11} {'codec':>6} {'change':>7} {'ratio':>7} {'raw us':>8} {'encode us':>10} "
+                  f"{'decode us':>10} {'wins below MB/s':>16}")
+            for r in results["codecs"]:
+                print(f"{r['shape']:>11} {r['compression']:>6} {r['change']:>7} {r['ratio']:>7.1f} {r['raw_us']:>8.1f} "
+                      f"{r['encode_us']:>10.1f} {r['decode_us']:>10.1f} {r['break_even_MBps']:>16.0f}")
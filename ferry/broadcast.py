@@ -0,0 +1,192 @@
+"""
+Fan-out of the transitions a backend steps through to any number of observers (evaluation dashboards, video capture,
+loggers), without slowing down the trainer.
+
+The backend is the single writer of a ring of slots in shared memory, at `{CHANNEL_DIR}/{name}.broadcast`. Each
+slot holds one record, with the same fixed layout as a raw frame, and a sequence number that is odd while the slot
+is being written. The writer never waits for readers: readers attach and detach whenever they like, and one that
+falls more than a ring behind skips the records that were overwritten, counting them in `dropped`.
+
+    reader = BroadcastReader("ferry")
+    while not reader.closed:
+        record = reader.read()
+
+A record is a dict with obs, action, reward, terminated and truncated, its sequence number under `seq`, and `reset`
+set for the first observation of an episode, whose action and reward are zeros. Infos aren't broadcast.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import time
+from typing import Any, Optional
+
+import gymnasium as gym
+import numpy as np
+
+from ferry import profiling
+from ferry.gym_grpc.gym_ferry_pb2 import Handshake
+from ferry.layout import FrameLayout, space_spec, assign_value, copy_value
+from ferry.shm import channel_path, create_file, publish, prefault, wait_for
+
+# Header layout: whether the writer closed the ring, the number of slots, the size of a slot and the length of the
+# serialized specs of the spaces, then the number of records published on its own cache line, then the specs.
+# A slot starts with its sequence number and whether it holds the first observation of an episode.
+CLOSED = 0
+SLOTS = slice(4, 8)
+SLOT_SIZE = slice(8, 16)
+SPEC_LENGTH = slice(16, 20)
+HEAD_OFFSET = 64
+SPEC_OFFSET = 128
+SLOT_RESET = 8
+SLOT_PAYLOAD = 16
+
+
+def _path(name: str) -> str:
+    return channel_path(f"{name}.broadcast")
+
+
+def _slots_offset(spec_length: int) -> int:
+    return -(-(SPEC_OFFSET + spec_length) // 64) * 64
+
+
+class BroadcastWriter:
+    """
+    Publishes the transitions of a single env to the broadcast ring `name`, replacing any previous one.
+    Has the same interface as TrajectoryRecorder, so backends feed both the same way.
+    """
+    def __init__(self, name: str, observation_space: gym.Space, action_space: gym.Space, slots: int = 32):
+        obs_spec, action_spec = space_spec(observation_space), space_spec(action_space)
+        if obs_spec is None or action_spec is None:
+            raise ValueError(f"Can't broadcast the spaces {observation_space} and {action_space}, "
+                             f"they have no fixed layout")
+        specs = Handshake(obs=obs_spec, action=action_spec).SerializeToString()
+        self.layout = FrameLayout(obs_spec, action_spec)
+        self.slot_size = -(-(SLOT_PAYLOAD + self.layout.nbytes) // 64) * 64
+        self.slots = slots
+        offset = _slots_offset(len(specs))
+        size = offset + slots * self.slot_size
+
+        self.name = name
+        self.path = _path(name)
+        staging, self.file = create_file(self.path, size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        prefault(self.map)
+        self.map[SLOTS] = slots.to_bytes(4, byteorder='little')
+        self.map[SLOT_SIZE] = self.slot_size.to_bytes(8, byteorder='little')
+        self.map[SPEC_LENGTH] = len(specs).to_bytes(4, byteorder='little')
+        self.map[SPEC_OFFSET:SPEC_OFFSET + len(specs)] = specs
+        self.head = np.ndarray((), dtype=np.uint64, buffer=self.map, offset=HEAD_OFFSET)
+        self.sequences = [np.ndarray((), dtype=np.uint64, buffer=self.map, offset=offset + i * self.slot_size)
+                          for i in range(slots)]
+        self.frames = [self.layout.bind(self.map, offset + i * self.slot_size + SLOT_PAYLOAD) for i in range(slots)]
+        self.action_bytes = [self.layout.bind_bytes(self.map, offset + i * self.slot_size + SLOT_PAYLOAD)["action"]
+                             for i in range(slots)]
+        self.resets = [offset + i * self.slot_size + SLOT_RESET for i in range(slots)]
+        self.count = 0
+        publish(staging, self.path)
+
+    def _publish(self, reset: bool, **values: Any):
+        start = profiling.enabled and time.perf_counter_ns()
+        slot = self.count % self.slots
+        # Odd while the slot is being written, so that readers can tell a torn record
+        self.sequences[slot][...] = 2 * self.count + 1
+        self.map[self.resets[slot]] = reset
+        frame = self.frames[slot]
+        if values["action"] is None:
+            # Zeroed as bytes, since a scalar can't be assigned to the views of a composite action
+            self.action_bytes[slot][...] = 0
+            del values["action"]
+        for name, value in values.items():
+            assign_value(frame[name], value)
+        self.sequences[slot][...] = 2 * self.count + 2
+        self.count += 1
+        self.head[...] = self.count
+        if start:
+            profiling.record("broadcast", start)
+
+    def reset(self, obs: Any):
+        """Publish the first observation of an episode."""
+        self._publish(True, obs=obs, action=None, reward=0., terminated=False, truncated=False)
+
+    def step(self, action: Any, obs: Any, reward: float, terminated: bool, truncated: bool):
+        """Publish an action and what it led to."""
+        self._publish(False, obs=obs, action=action, reward=reward, terminated=terminated, truncated=truncated)
+
+    def close(self):
+        """Tell the readers that nothing more is coming, and remove the ring. Attached readers keep their mapping."""
+        self.map[CLOSED] = 1
+        self.frames = []
+        self.action_bytes = []
+        self.sequences = []
+        self.head = None
+        self.map.close()
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BroadcastReader:
+    """
+    Reads the records published to the broadcast ring `name`, waiting for it to appear. Starts from the next record
+    to be published, or with `from_start`, from the oldest one still in the ring.
+    """
+    def __init__(self, name: str, from_start: bool = False):
+        path = _path(name)
+        wait_for(lambda: os.path.exists(path))
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.slots = int.from_bytes(self.map[SLOTS], byteorder='little')
+        slot_size = int.from_bytes(self.map[SLOT_SIZE], byteorder='little')
+        spec_length = int.from_bytes(self.map[SPEC_LENGTH], byteorder='little')
+        specs = Handshake.FromString(self.map[SPEC_OFFSET:SPEC_OFFSET + spec_length])
+        self.layout = FrameLayout(specs.obs, specs.action)
+        offset = _slots_offset(spec_length)
+
+        self.head = np.ndarray((), dtype=np.uint64, buffer=self.map, offset=HEAD_OFFSET)
+        self.sequences = [np.ndarray((), dtype=np.uint64, buffer=self.map, offset=offset + i * slot_size)
+                          for i in range(self.slots)]
+        self.frames = [self.layout.bind(self.map, offset + i * slot_size + SLOT_PAYLOAD) for i in range(self.slots)]
+        self.resets = [offset + i * slot_size + SLOT_RESET for i in range(self.slots)]
+
+        head = int(self.head)
+        self.next = max(head - self.slots, 0) if from_start else head
+        self.dropped = 0
+
+    @property
+    def closed(self) -> bool:
+        """Whether the writer closed the ring. Records published before that can still be read."""
+        return self.map[CLOSED] == 1 and not self.poll()
+
+    def poll(self) -> bool:
+        """Whether a record is waiting to be read."""
+        return int(self.head) > self.next
+
+    def read(self) -> Optional[dict[str, Any]]:
+        """The next record, copied out of the ring, or None if there's nothing new yet."""
+        while True:
+            head = int(self.head)
+            if self.next >= head:
+                return None
+            if head - self.next > self.slots:
+                # Lapped by the writer, skip to the oldest record still there
+                self.dropped += head - self.slots - self.next
+                self.next = head - self.slots
+            n, slot = self.next, self.next % self.slots
+            self.next += 1
+            sequence = int(self.sequences[slot])
+            if sequence == 2 * n + 2:
+                record = copy_value(self.frames[slot])
+                reset = self.map[self.resets[slot]] == 1
+                # The writer may have started overwriting the slot while it was copied
+                if int(self.sequences[slot]) == sequence:
+                    return {**record, "reward": float(record["reward"]), "terminated": bool(record["terminated"]),
+                            "truncated": bool(record["truncated"]), "seq": n, "reset": reset}
+            self.dropped += 1
+
+    def close(self):
+        self.frames = []
+        self.sequences = []
+        self.head = None
+        self.map.close()
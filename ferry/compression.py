@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import time
+import zlib
+from typing import Callable, Optional
+
+import numpy as np
+
+from ferry import profiling
+from ferry.gym_grpc.gym_ferry_pb2 import NumpyArray
+from ferry.utils import decode
+
+# Compressors by name, as (compress, decompress). Both sides of a channel must have the one they agree on.
+COMPRESSORS: dict[str, tuple[Callable[[memoryview], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+
+try:
+    import lz4.frame
+    COMPRESSORS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+
+try:
+    import zstandard
+    COMPRESSORS["zstd"] = (zstandard.ZstdCompressor(level=1).compress, zstandard.ZstdDecompressor().decompress)
+except ImportError:
+    pass
+
+
+def register_compressor(name: str, compress: Callable[[memoryview], bytes], decompress: Callable[[bytes], bytes]):
+    """Make a compressor available for observations under `name`, on both sides of the channel."""
+    COMPRESSORS[name] = (compress, decompress)
+
+
+class ObsEncoder:
+    """
+    Compresses the observations sent over one channel. Each one is XORed with the previous one first, so that
+    pixels that didn't change become runs of zeros, except for keyframes, sent every `keyframe_interval`
+    observations, after `reset`, and whenever the shape or dtype changes.
+    """
+    def __init__(self, compression: str = "zlib", keyframe_interval: int = 100):
+        self.compression = compression
+        self.compress = COMPRESSORS[compression][0]
+        self.keyframe_interval = keyframe_interval
+        self.reference: Optional[np.ndarray] = None
+        self.scratch: Optional[np.ndarray] = None
+        self.since_keyframe = 0
+
+    def reset(self):
+        """Send the next observation as a keyframe."""
+        self.reference = None
+
+    def encode(self, array: np.ndarray, keyframe: bool = False) -> NumpyArray:
+        start = profiling.enabled and time.perf_counter_ns()
+        array = np.ascontiguousarray(array)
+        data = array.reshape(-1).view(np.uint8)
+
+        delta = (not keyframe and self.reference is not None and self.reference.shape == data.shape
+                 and self.since_keyframe + 1 < self.keyframe_interval)
+        if delta:
+            np.bitwise_xor(data, self.reference, out=self.scratch)
+            payload = self.scratch
+            self.reference[...] = data
+            self.since_keyframe += 1
+        else:
+            payload = data
+            self.reference, self.scratch = data.copy(), np.empty_like(data)
+            self.since_keyframe = 0
+
+        msg = NumpyArray(data=self.compress(memoryview(payload)), shape=array.shape, dtype=array.dtype.str,
+                         compression=self.compression, delta=delta)
+        if start:
+            profiling.record("compress", start, array.nbytes)
+        return msg
+
+
+class ObsDecoder:
+    """
+    Decodes the observations received over one channel, keeping the last one as the reference for the next delta.
+    Plain NumpyArrays are passed through `decode`. Results are read-only.
+    """
+    def __init__(self):
+        self.reference: Optional[np.ndarray] = None
+
+    def decode(self, msg: NumpyArray) -> np.ndarray:
+        if not msg.compression:
+            return decode(msg)
+
+        start = profiling.enabled and time.perf_counter_ns()
+        data = np.frombuffer(COMPRESSORS[msg.compression][1](msg.data), dtype=np.uint8)
+        if msg.delta:
+            if self.reference is None or self.reference.shape != data.shape:
+                raise ValueError("Received a delta observation without a matching reference frame")
+            data = np.bitwise_xor(data, self.reference)
+            data.flags.writeable = False
+        self.reference = data
+        array = data.view(msg.dtype).reshape(msg.shape)
+        if start:
+            profiling.record("decompress", start, array.nbytes)
+        return array
@@ -8,74 +8,262 @@ from typing import Optional
 
 import numpy as np
 
-from ferry.gym_grpc.gym_ferry_pb2 import GymnasiumMessage, StepReturn, ResetArgs
+from ferry import profiling
+from ferry.compression import ObsEncoder
+from ferry.gym_grpc.gym_ferry_pb2 import GymnasiumMessage, StepReturn, ResetArgs, BatchStepReturn
+from ferry.info import InfoEncoder
+from ferry.layout import FrameLayout, assign_value
+from ferry.ring import RingCommunicator
+from ferry.shm import channel_path, create_file, publish, prefault, wait_for
+from ferry.sockets import SocketCommunicator
 from ferry.utils import encode, wrap_dict
+from ferry.wait import WaitStrategy, make_wait_strategy, wait_strategy_from_kind
 from ferry.gym_grpc import gym_ferry_pb2
 
+# Header layout: the turn flag, the channel's wait strategy, whether more chunks of the message follow,
+# the length of the payload, and the current and maximum sizes of the mapping, followed by the payload
+# (a serialized message or a chunk of one, or a raw frame marked by FRAME_LENGTH) at an aligned offset
+WAIT_KIND = 1
+MORE = 2
+LENGTH = slice(4, 8)
+SIZE = slice(8, 16)
+MAX_SIZE = slice(16, 24)
+PAYLOAD_OFFSET = 24
+FRAME_LENGTH = (0xFFFFFFFF).to_bytes(4, byteorder='little')
+
 
 class Communicator:
-    def __init__(self, name: str, size: int = 1024, create: bool = True):
+    """
+    One side of a channel over the memory mapped file `{CHANNEL_DIR}/{name}` (see `ferry.shm`).
+
+    The creator picks the wait strategy and the sizes, which are recorded in the header and adopted by the side
+    attaching to it. The mapping starts at `size` bytes and grows when a message doesn't fit, up to `max_size`.
+    Whichever side holds the turn may grow it, and the other side remaps when it gets the turn back.
+    Messages larger than that are sent in chunks. Pages are faulted in as soon as the mapping is created or grown,
+    as transparent huge pages for large mappings with `hugepages=True`.
+
+    The creator only moves the file into place once its header is written, so the other side can attach as soon
+    as it sees the file.
+    """
+    def __init__(self, name: str, size: int = 1024, create: bool = True, wait: str | WaitStrategy = "spin",
+                 max_size: int = 1 << 26, hugepages: bool = False):
         self.name = name
-        self.size = size
+        self.create = create
+        self.max_size = max_size
+        self.hugepages = hugepages
 
-        filename = f"/tmp/{name}"
+        filename = channel_path(name)
 
         if create:
-            if os.path.exists(filename):
-                os.remove(filename)
-            self.file = open(filename, "wb+")
-            self.file.truncate(size)
+            staging, self.file = create_file(filename, size)
             self.active_code = 0x01
             self.wait_code = 0x02
         else:
-            while not os.path.exists(filename):
-                time.sleep(0.001)
+            wait_for(lambda: os.path.exists(filename))
             self.file = open(filename, "r+b")
+            wait_for(lambda: os.fstat(self.file.fileno()).st_size > 0)
+            size = os.fstat(self.file.fileno()).st_size
             self.active_code = 0x02
             self.wait_code = 0x01
         self.busy_code = 0x00
+        self.size = size
         self.map = mmap.mmap(self.file.fileno(), size)
         if create:
+            prefault(self.map, hugepages=hugepages)
+            self.map[SIZE] = size.to_bytes(8, byteorder='little')
+            self.map[MAX_SIZE] = max_size.to_bytes(8, byteorder='little')
+            self.waiter = make_wait_strategy(wait)
+            self.waiter.attach(name, create, self.active_code)
+            self.map[WAIT_KIND] = self.waiter.kind
             self.map[0] = self.active_code
+            publish(staging, filename)
+        else:
+            # Creators in other languages may not stage the file, so the header can still be filling in
+            wait_for(lambda: self.map[WAIT_KIND] != 0)
+            self.waiter = wait_strategy_from_kind(self.map[WAIT_KIND])
+            self.waiter.attach(name, create, self.active_code)
+            self.max_size = int.from_bytes(self.map[MAX_SIZE], byteorder='little')
+
+        self.frame_capacity = self.max_size - PAYLOAD_OFFSET
+        self.layout: Optional[FrameLayout] = None
+        self.frame: Optional[dict[str, np.ndarray]] = None
+
+    def set_layout(self, layout: Optional[FrameLayout]):
+        """
+        Bind the views of a negotiated frame layout, or go back to protobuf-only steps with None.
+        Must be called while holding the turn, since the mapping may need to grow to fit the frame.
+        """
+        self.layout = layout
+        if layout is not None:
+            self._reserve(layout.nbytes)
+        self._bind()
+
+    def _bind(self):
+        self.frame = self.layout.bind(self.map, PAYLOAD_OFFSET) if self.layout is not None else None
+
+    def _remap(self, size: int):
+        self.frame = None  # The views pin the old mapping
+        self.map.close()
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.size = size
+        self._bind()
+
+    def _reserve(self, nbytes: int):
+        """Grow the mapping so that the payload can hold `nbytes`. Only while holding the turn."""
+        if PAYLOAD_OFFSET + nbytes <= self.size:
+            return
+        size = max(PAYLOAD_OFFSET + nbytes, 2 * self.size)
+        size = min(-(-size // mmap.PAGESIZE) * mmap.PAGESIZE, self.max_size)
+        self.file.truncate(size)
+        old_size = self.size
+        self._remap(size)
+        prefault(self.map, old_size, self.hugepages)
+        self.map[SIZE] = size.to_bytes(8, byteorder='little')
+
+    def _wait_turn(self):
+        start = profiling.enabled and time.perf_counter_ns()
+        self.waiter.wait(self.map, self.active_code)
+        if start:
+            profiling.record("wait", start)
+        size = int.from_bytes(self.map[SIZE], byteorder='little')
+        if size != self.size:
+            self._remap(size)
+
+    def _pass_turn(self):
+        self.map[0] = self.wait_code
+        self.waiter.notify()
 
     def send_message(self, msg: gym_ferry_pb2.GymnasiumMessage):
-        serialized_msg = msg.SerializeToString()
-        msg_len = len(serialized_msg).to_bytes(4, byteorder='little')
-        while self.map[0] != self.active_code:
-            pass
+        start = profiling.enabled and time.perf_counter_ns()
+        serialized_msg = memoryview(msg.SerializeToString())
+        if start:
+            profiling.record("serialize", start, len(serialized_msg))
+        chunk_size = self.max_size - PAYLOAD_OFFSET
+        for offset in range(0, len(serialized_msg) or 1, chunk_size):
+            chunk = serialized_msg[offset:offset + chunk_size]
+            self._wait_turn()
+            start = profiling.enabled and time.perf_counter_ns()
+            self.map[0] = self.busy_code
+            self._reserve(len(chunk))
+            self.map[MORE] = offset + chunk_size < len(serialized_msg)
+            self.map[LENGTH] = len(chunk).to_bytes(4, byteorder='little')
+            self.map[PAYLOAD_OFFSET:PAYLOAD_OFFSET + len(chunk)] = chunk
+            if start:
+                profiling.record("send", start, len(chunk))
+            self._pass_turn()
+
+    def send_frame(self, **values: np.ndarray | float | bool):
+        """Write step values directly into their slots of the frame, skipping serialization."""
+        self._wait_turn()
+        start = profiling.enabled and time.perf_counter_ns()
         self.map[0] = self.busy_code
-        self.map[1:self.size] = b'\x00' * (self.size - 1)
+        for name, value in values.items():
+            assign_value(self.frame[name], value)
+        self.map[LENGTH] = FRAME_LENGTH
+        if start:
+            profiling.record("send_frame", start, sum(self.layout.sizes[name] for name in values))
+        self._pass_turn()
 
-        self.map[1:5] = msg_len
-        self.map[5:len(serialized_msg) + 5] = serialized_msg
-        self.map[0] = self.wait_code
+    def poll(self) -> bool:
+        """Whether a message is waiting, so that `receive_message` wouldn't block."""
+        return self.map[0] == self.active_code
+
+    def fileno(self) -> Optional[int]:
+        """A file descriptor that becomes readable when a message might be waiting, if the wait strategy has one."""
+        return self.waiter.fileno()
+
+    def clear_wakeups(self):
+        """Consume the notifications that made `fileno()` readable."""
+        self.waiter.clear()
+
+    def _read_chunk(self) -> bytes:
+        msg_len = int.from_bytes(self.map[LENGTH], byteorder='little')
+        return self.map[PAYLOAD_OFFSET:PAYLOAD_OFFSET + msg_len]
 
     def receive_message(self) -> Optional[gym_ferry_pb2.GymnasiumMessage]:
-        while self.map[0] != self.active_code:
-            pass
-        msg_len = int.from_bytes(self.map[1:5], byteorder='little')
-        serialized_msg = bytes(self.map[5:5 + msg_len])
+        """Wait for the next message. Returns None if it was a raw frame, which can then be read from `self.frame`."""
+        self._wait_turn()
+        if self.map[LENGTH] == FRAME_LENGTH:
+            return None
+        start = profiling.enabled and time.perf_counter_ns()
+        serialized_msg = self._read_chunk()
+        if self.map[MORE]:
+            chunks = [serialized_msg]
+            while self.map[MORE]:
+                # Hand the turn back so that the sender can write the next chunk
+                self._pass_turn()
+                self._wait_turn()
+                chunks.append(self._read_chunk())
+            serialized_msg = b"".join(chunks)
+        if start:
+            profiling.record("receive", start, len(serialized_msg))
+
+        start = profiling.enabled and time.perf_counter_ns()
         msg = gym_ferry_pb2.GymnasiumMessage()
         msg.ParseFromString(serialized_msg)
+        if start:
+            profiling.record("parse", start, len(serialized_msg))
         return msg
 
     def close(self):
+        self.frame = None
+        self.waiter.close(remove=self.create)
+        self.map.close()
         self.file.close()
-        os.remove(f"/tmp/{self.name}")
+        if self.create:
+            os.remove(channel_path(self.name))
+
+    @staticmethod
+    def unlink(name: str):
+        """Remove a stale channel file left behind by a crashed process, so that nobody attaches to it."""
+        filename = channel_path(name)
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+TRANSPORTS = {
+    "mmap": Communicator,
+    "ring": RingCommunicator,
+    "unix": SocketCommunicator,
+    "tcp": SocketCommunicator,
+}
+
+
+def make_communicator(transport: str, name: str, create: bool, host: str = "localhost", port: Optional[int] = None,
+                      **kwargs) -> Communicator | RingCommunicator | SocketCommunicator:
+    """
+    Open one side of a channel with the given transport. Both sides of a channel must use the same one.
+    `host` and `port` are only used by "tcp", where the creating side listens on them.
+    """
+    if transport == "tcp":
+        kwargs["address"] = (host, port)
+    return TRANSPORTS[transport](name, create=create, **kwargs)
 
 
 def create_gymnasium_message(step_return: Optional[tuple[np.ndarray, float, bool, bool, dict[str, Any]]] = None,
                              reset_return: Optional[tuple[np.ndarray, dict[str, Any]]] = None,
                              reset_args: Optional[tuple[int, dict[str, Any]]]= None,
                              action: Optional[np.ndarray] = None,
-                             close: Optional[bool] = None) -> GymnasiumMessage:
-
+                             close: Optional[bool] = None,
+                             batch_step_return: Optional[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+                                                               list[dict[str, Any]], np.ndarray, list[np.ndarray],
+                                                               list[dict[str, Any]]]] = None,
+                             batch_action: Optional[np.ndarray] = None,
+                             info_encoder: Optional[InfoEncoder] = None,
+                             obs_encoder: Optional[ObsEncoder] = None) -> GymnasiumMessage:
+    """
+    Build a message from exactly one of the keyword arguments. Info dicts are packed with `info_encoder`,
+    which should be the one kept for the channel, so that their schemas are only sent once. Likewise, single
+    observations are compressed with the channel's `obs_encoder` if it has one.
+    """
+    start = profiling.enabled and time.perf_counter_ns()
+    info_encoder = info_encoder or InfoEncoder()
     message = GymnasiumMessage()
 
     if step_return is not None:
         obs, reward, terminated, truncated, info = step_return
-        obs_data = encode(obs)
-        info = wrap_dict(info)
+        obs_data = obs_encoder.encode(obs) if obs_encoder is not None else encode(obs)
+        info = info_encoder.encode(info)
 
         step_return = StepReturn(obs=obs_data,
                                  reward=reward,
@@ -87,7 +275,9 @@ def create_gymnasium_message(step_return: Optional[tuple[np.ndarray, float, bool
     elif reset_return is not None:
         obs, info = reset_return
 
-        reset_return_ = StepReturn(obs=encode(obs), reward=0, terminated=False, truncated=False, info=wrap_dict(info))
+        obs_data = obs_encoder.encode(obs, keyframe=True) if obs_encoder is not None else encode(obs)
+        reset_return_ = StepReturn(obs=obs_data, reward=0, terminated=False, truncated=False,
+                                   info=info_encoder.encode(info))
 
         message.step_return.CopyFrom(reset_return_)
 
@@ -106,7 +296,26 @@ def create_gymnasium_message(step_return: Optional[tuple[np.ndarray, float, bool
     elif close is not None:
         message.close = close
 
+    elif batch_step_return is not None:
+        obs, reward, terminated, truncated, infos, done, final_obs, final_infos = batch_step_return
+        final_obs = np.stack(final_obs) if final_obs else np.zeros((0,) + obs.shape[1:], dtype=obs.dtype)
+
+        batch_step_return = BatchStepReturn(obs=encode(obs),
+                                            reward=encode(reward),
+                                            terminated=encode(terminated),
+                                            truncated=encode(truncated),
+                                            info=[info_encoder.encode(info) for info in infos],
+                                            done=encode(done),
+                                            final_obs=encode(final_obs),
+                                            final_info=[info_encoder.encode(info) for info in final_infos])
+        message.batch_step_return.CopyFrom(batch_step_return)
+
+    elif batch_action is not None:
+        message.batch_action.CopyFrom(encode(batch_action))
+
     else:
         raise ValueError("No valid keyword arguments provided.")
 
+    if start:
+        profiling.record("build_message", start)
     return message
@@ -14,7 +14,7 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import struct_pb2 as google_dot_protobuf_dot_struct__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x18gym_grpc/gym_ferry.proto\x12\x03\x65nv\x1a\x1cgoogle/protobuf/struct.proto\"\x17\n\x05\x45nvID\x12\x0e\n\x06\x65nv_id\x18\x01 \x01(\t\"\x18\n\x06Status\x12\x0e\n\x06status\x18\x01 \x01(\x08\"8\n\nNumpyArray\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\r\n\x05shape\x18\x02 \x01(\x0c\x12\r\n\x05\x64type\x18\x03 \x01(\t\"5\n\x07NDArray\x12\r\n\x05shape\x18\x01 \x03(\x05\x12\x0c\n\x04\x64\x61ta\x18\x02 \x03(\x02\x12\r\n\x05\x64type\x18\x03 \x01(\t\"\x18\n\x06\x41\x63tion\x12\x0e\n\x06\x61\x63tion\x18\x01 \x01(\x05\"\x14\n\x04Seed\x12\x0c\n\x04seed\x18\x01 \x01(\x05\"z\n\x07Options\x12(\n\x06params\x18\x01 \x03(\x0b\x32\x18.env.Options.ParamsEntry\x1a\x45\n\x0bParamsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.google.protobuf.Value:\x02\x38\x01\"t\n\x04Info\x12%\n\x06params\x18\x01 \x03(\x0b\x32\x15.env.Info.ParamsEntry\x1a\x45\n\x0bParamsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.google.protobuf.Value:\x02\x38\x01\"\x9d\x01\n\tResetArgs\x12\x11\n\x04seed\x18\x01 \x01(\x05H\x00\x88\x01\x01\x12,\n\x07options\x18\x02 \x03(\x0b\x32\x1b.env.ResetArgs.OptionsEntry\x1a\x46\n\x0cOptionsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.google.protobuf.Value:\x02\x38\x01\x42\x07\n\x05_seed\"\xcc\x01\n\nStepReturn\x12\x19\n\x03obs\x18\x01 \x01(\x0b\x32\x0c.env.NDArray\x12\x0e\n\x06reward\x18\x02 \x01(\x02\x12\x12\n\nterminated\x18\x03 \x01(\x08\x12\x11\n\ttruncated\x18\x04 \x01(\x08\x12\'\n\x04info\x18\x05 \x03(\x0b\x32\x19.env.StepReturn.InfoEntry\x1a\x43\n\tInfoEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.google.protobuf.Value:\x02\x38\x01\"\xc1\x01\n\x10GymnasiumMessage\x12&\n\x0bstep_return\x18\x01 \x01(\x0b\x32\x0f.env.StepReturnH\x00\x12$\n\nreset_args\x18\x03 \x01(\x0b\x32\x0e.env.ResetArgsH\x00\x12\x1e\n\x06\x61\x63tion\x18\x04 \x01(\x0b\x32\x0c.env.NDArrayH\x00\x12\x0f\n\x05\x63lose\x18\x05 \x01(\x08H\x00\x12\x11\n\x07request\x18\x06 \x01(\x08H\x00\x12\x10\n\x06status\x18\x07 \x01(\x08H\x00\x42\t\n\x07message2\x82\x01\n\x03\x45nv\x12\'\n\nInitialize\x12\n.env.EnvID\x1a\x0b.env.Status\"\x00\x12*\n\x05Reset\x12\x0e.env.ResetArgs\x1a\x0f.env.StepReturn\"\x00\x12&\n\x04Step\x12\x0b.env.Action\x1a\x0f.env.StepReturn\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x18gym_grpc/gym_ferry.proto\x12\x03\x65nv\x1a\x1cgoogle/protobuf/struct.proto\"\x17\n\x05\x45nvID\x12\x0e\n\x06\x65nv_id\x18\x01 \x01(\t\"\x18\n\x06Status\x12\x0e\n\x06status\x18\x01 \x01(\x08\"\\\n\nNumpyArray\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\r\n\x05shape\x18\x02 \x03(\x05\x12\r\n\x05\x64type\x18\x03 \x01(\t\x12\x13\n\x0b\x63ompression\x18\x04 \x01(\t\x12\r\n\x05\x64\x65lta\x18\x05 \x01(\x08\"5\n\x07NDArray\x12\r\n\x05shape\x18\x01 \x03(\x05\x12\x0c\n\x04\x64\x61ta\x18\x02 \x03(\x02\x12\r\n\x05\x64type\x18\x03 \x01(\t\"Y\n\tArraySpec\x12\r\n\x05shape\x18\x01 \x03(\x05\x12\r\n\x05\x64type\x18\x02 \x01(\t\x12 \n\x08\x63hildren\x18\x03 \x03(\x0b\x32\x0e.env.ArraySpec\x12\x0c\n\x04keys\x18\x04 \x03(\t\"\xee\x01\n\tHandshake\x12\x1b\n\x03obs\x18\x01 \x01(\x0b\x32\x0e.env.ArraySpec\x12\x1e\n\x06\x61\x63tion\x18\x02 \x01(\x0b\x32\x0e.env.ArraySpec\x12\x0e\n\x06\x66rames\x18\x03 \x01(\x08\x12\x10\n\x08num_envs\x18\x04 \x01(\x05\x12\x15\n\raction_repeat\x18\x05 \x01(\x05\x12\x10\n\x08max_pool\x18\x06 \x01(\x08\x12\x11\n\tautoreset\x18\x07 \x01(\x08\x12\x17\n\x0fobs_compression\x18\x08 \x01(\t\x12\x19\n\x11keyframe_interval\x18\t \x01(\x05\x12\x12\n\npreprocess\x18\n \x03(\t\"\x18\n\x06\x41\x63tion\x12\x0e\n\x06\x61\x63tion\x18\x01 \x01(\x05\"\x14\n\x04Seed\x12\x0c\n\x04seed\x18\x01 \x01(\x05\"z\n\x07Options\x12(\n\x06params\x18\x01 \x03(\x0b\x32\x18.env.Options.ParamsEntry\x1a\x45\n\x0bParamsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.google.protobuf.Value:\x02\x38\x01\"t\n\x04Info\x12%\n\x06params\x18\x01 \x03(\x0b\x32\x15.env.Info.ParamsEntry\x1a\x45\n\x0bParamsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.google.protobuf.Value:\x02\x38\x01\"M\n\x0b\x45ncodedInfo\x12\x11\n\tschema_id\x18\x01 \x01(\x05\x12\x0e\n\x06schema\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\x12\r\n\x05\x62lobs\x18\x04 \x03(\x0c\"\x9d\x01\n\tResetArgs\x12\x11\n\x04seed\x18\x01 \x01(\x05H\x00\x88\x01\x01\x12,\n\x07options\x18\x02 \x03(\x0b\x32\x1b.env.ResetArgs.OptionsEntry\x1a\x46\n\x0cOptionsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.google.protobuf.Value:\x02\x38\x01\x42\x07\n\x05_seed\"\x87\x01\n\nStepReturn\x12\x1c\n\x03obs\x18\x01 \x01(\x0b\x32\x0f.env.NumpyArray\x12\x0e\n\x06reward\x18\x02 \x01(\x01\x12\x12\n\nterminated\x18\x03 \x01(\x08\x12\x11\n\ttruncated\x18\x04 \x01(\x08\x12\x1e\n\x04info\x18\x06 \x01(\x0b\x32\x10.env.EncodedInfoJ\x04\x08\x05\x10\x06\"\xae\x02\n\x0f\x42\x61tchStepReturn\x12\x1c\n\x03obs\x18\x01 \x01(\x0b\x32\x0f.env.NumpyArray\x12\x1f\n\x06reward\x18\x02 \x01(\x0b\x32\x0f.env.NumpyArray\x12#\n\nterminated\x18\x03 \x01(\x0b\x32\x0f.env.NumpyArray\x12\"\n\ttruncated\x18\x04 \x01(\x0b\x32\x0f.env.NumpyArray\x12\x1d\n\x04\x64one\x18\x06 \x01(\x0b\x32\x0f.env.NumpyArray\x12\"\n\tfinal_obs\x18\x07 \x01(\x0b\x32\x0f.env.NumpyArray\x12\x1e\n\x04info\x18\t \x03(\x0b\x32\x10.env.EncodedInfo\x12$\n\nfinal_info\x18\n \x03(\x0b\x32\x10.env.EncodedInfoJ\x04\x08\x05\x10\x06J\x04\x08\x08\x10\t\"C\n\x05Lease\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x11\n\ttransport\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\x12\x0b\n\x03pid\x18\x04 \x01(\x05\"\xe2\x02\n\x10GymnasiumMessage\x12&\n\x0bstep_return\x18\x01 \x01(\x0b\x32\x0f.env.StepReturnH\x00\x12$\n\nreset_args\x18\x03 \x01(\x0b\x32\x0e.env.ResetArgsH\x00\x12!\n\x06\x61\x63tion\x18\x04 \x01(\x0b\x32\x0f.env.NumpyArrayH\x00\x12\x0f\n\x05\x63lose\x18\x05 \x01(\x08H\x00\x12\x11\n\x07request\x18\x06 \x01(\x08H\x00\x12\x10\n\x06status\x18\x07 \x01(\x08H\x00\x12#\n\thandshake\x18\x08 \x01(\x0b\x32\x0e.env.HandshakeH\x00\x12\'\n\x0c\x62\x61tch_action\x18\t \x01(\x0b\x32\x0f.env.NumpyArrayH\x00\x12\x31\n\x11\x62\x61tch_step_return\x18\n \x01(\x0b\x32\x14.env.BatchStepReturnH\x00\x12\x1b\n\x05lease\x18\x0b \x01(\x0b\x32\n.env.LeaseH\x00\x42\t\n\x07message2\x82\x01\n\x03\x45nv\x12\'\n\nInitialize\x12\n.env.EnvID\x1a\x0b.env.Status\"\x00\x12*\n\x05Reset\x12\x0e.env.ResetArgs\x1a\x0f.env.StepReturn\"\x00\x12&\n\x04Step\x12\x0b.env.Action\x1a\x0f.env.StepReturn\"\x00\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'gym_grpc.gym_ferry_pb2', globals())
@@ -27,38 +27,44 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _INFO_PARAMSENTRY._serialized_options = b'8\001'
   _RESETARGS_OPTIONSENTRY._options = None
   _RESETARGS_OPTIONSENTRY._serialized_options = b'8\001'
-  _STEPRETURN_INFOENTRY._options = None
-  _STEPRETURN_INFOENTRY._serialized_options = b'8\001'
   _ENVID._serialized_start=63
   _ENVID._serialized_end=86
   _STATUS._serialized_start=88
   _STATUS._serialized_end=112
   _NUMPYARRAY._serialized_start=114
-  _NUMPYARRAY._serialized_end=170
-  _NDARRAY._serialized_start=172
-  _NDARRAY._serialized_end=225
-  _ACTION._serialized_start=227
-  _ACTION._serialized_end=251
-  _SEED._serialized_start=253
-  _SEED._serialized_end=273
-  _OPTIONS._serialized_start=275
-  _OPTIONS._serialized_end=397
-  _OPTIONS_PARAMSENTRY._serialized_start=328
-  _OPTIONS_PARAMSENTRY._serialized_end=397
-  _INFO._serialized_start=399
-  _INFO._serialized_end=515
-  _INFO_PARAMSENTRY._serialized_start=328
-  _INFO_PARAMSENTRY._serialized_end=397
-  _RESETARGS._serialized_start=518
-  _RESETARGS._serialized_end=675
-  _RESETARGS_OPTIONSENTRY._serialized_start=596
-  _RESETARGS_OPTIONSENTRY._serialized_end=666
-  _STEPRETURN._serialized_start=678
-  _STEPRETURN._serialized_end=882
-  _STEPRETURN_INFOENTRY._serialized_start=815
-  _STEPRETURN_INFOENTRY._serialized_end=882
-  _GYMNASIUMMESSAGE._serialized_start=885
-  _GYMNASIUMMESSAGE._serialized_end=1078
-  _ENV._serialized_start=1081
-  _ENV._serialized_end=1211
+  _NUMPYARRAY._serialized_end=206
+  _NDARRAY._serialized_start=208
+  _NDARRAY._serialized_end=261
+  _ARRAYSPEC._serialized_start=263
+  _ARRAYSPEC._serialized_end=352
+  _HANDSHAKE._serialized_start=355
+  _HANDSHAKE._serialized_end=593
+  _ACTION._serialized_start=595
+  _ACTION._serialized_end=619
+  _SEED._serialized_start=621
+  _SEED._serialized_end=641
+  _OPTIONS._serialized_start=643
+  _OPTIONS._serialized_end=765
+  _OPTIONS_PARAMSENTRY._serialized_start=696
+  _OPTIONS_PARAMSENTRY._serialized_end=765
+  _INFO._serialized_start=767
+  _INFO._serialized_end=883
+  _INFO_PARAMSENTRY._serialized_start=696
+  _INFO_PARAMSENTRY._serialized_end=765
+  _ENCODEDINFO._serialized_start=885
+  _ENCODEDINFO._serialized_end=962
+  _RESETARGS._serialized_start=965
+  _RESETARGS._serialized_end=1122
+  _RESETARGS_OPTIONSENTRY._serialized_start=1043
+  _RESETARGS_OPTIONSENTRY._serialized_end=1113
+  _STEPRETURN._serialized_start=1125
+  _STEPRETURN._serialized_end=1260
+  _BATCHSTEPRETURN._serialized_start=1263
+  _BATCHSTEPRETURN._serialized_end=1565
+  _LEASE._serialized_start=1567
+  _LEASE._serialized_end=1634
+  _GYMNASIUMMESSAGE._serialized_start=1637
+  _GYMNASIUMMESSAGE._serialized_end=1991
+  _ENV._serialized_start=1994
+  _ENV._serialized_end=2124
 # @@protoc_insertion_point(module_scope)
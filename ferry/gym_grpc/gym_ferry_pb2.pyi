@@ -12,6 +12,50 @@ class Action(_message.Message):
     action: int
     def __init__(self, action: _Optional[int] = ...) -> None: ...
 
+class ArraySpec(_message.Message):
+    __slots__ = ["children", "dtype", "keys", "shape"]
+    CHILDREN_FIELD_NUMBER: _ClassVar[int]
+    DTYPE_FIELD_NUMBER: _ClassVar[int]
+    KEYS_FIELD_NUMBER: _ClassVar[int]
+    SHAPE_FIELD_NUMBER: _ClassVar[int]
+    children: _containers.RepeatedCompositeFieldContainer[ArraySpec]
+    dtype: str
+    keys: _containers.RepeatedScalarFieldContainer[str]
+    shape: _containers.RepeatedScalarFieldContainer[int]
+    def __init__(self, shape: _Optional[_Iterable[int]] = ..., dtype: _Optional[str] = ..., children: _Optional[_Iterable[_Union[ArraySpec, _Mapping]]] = ..., keys: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class BatchStepReturn(_message.Message):
+    __slots__ = ["done", "final_info", "final_obs", "info", "obs", "reward", "terminated", "truncated"]
+    DONE_FIELD_NUMBER: _ClassVar[int]
+    FINAL_INFO_FIELD_NUMBER: _ClassVar[int]
+    FINAL_OBS_FIELD_NUMBER: _ClassVar[int]
+    INFO_FIELD_NUMBER: _ClassVar[int]
+    OBS_FIELD_NUMBER: _ClassVar[int]
+    REWARD_FIELD_NUMBER: _ClassVar[int]
+    TERMINATED_FIELD_NUMBER: _ClassVar[int]
+    TRUNCATED_FIELD_NUMBER: _ClassVar[int]
+    done: NumpyArray
+    final_info: _containers.RepeatedCompositeFieldContainer[EncodedInfo]
+    final_obs: NumpyArray
+    info: _containers.RepeatedCompositeFieldContainer[EncodedInfo]
+    obs: NumpyArray
+    reward: NumpyArray
+    terminated: NumpyArray
+    truncated: NumpyArray
+    def __init__(self, obs: _Optional[_Union[NumpyArray, _Mapping]] = ..., reward: _Optional[_Union[NumpyArray, _Mapping]] = ..., terminated: _Optional[_Union[NumpyArray, _Mapping]] = ..., truncated: _Optional[_Union[NumpyArray, _Mapping]] = ..., done: _Optional[_Union[NumpyArray, _Mapping]] = ..., final_obs: _Optional[_Union[NumpyArray, _Mapping]] = ..., info: _Optional[_Iterable[_Union[EncodedInfo, _Mapping]]] = ..., final_info: _Optional[_Iterable[_Union[EncodedInfo, _Mapping]]] = ...) -> None: ...
+
+class EncodedInfo(_message.Message):
+    __slots__ = ["blobs", "data", "schema", "schema_id"]
+    BLOBS_FIELD_NUMBER: _ClassVar[int]
+    DATA_FIELD_NUMBER: _ClassVar[int]
+    SCHEMA_FIELD_NUMBER: _ClassVar[int]
+    SCHEMA_ID_FIELD_NUMBER: _ClassVar[int]
+    blobs: _containers.RepeatedScalarFieldContainer[bytes]
+    data: bytes
+    schema: str
+    schema_id: int
+    def __init__(self, schema_id: _Optional[int] = ..., schema: _Optional[str] = ..., data: _Optional[bytes] = ..., blobs: _Optional[_Iterable[bytes]] = ...) -> None: ...
+
 class EnvID(_message.Message):
     __slots__ = ["env_id"]
     ENV_ID_FIELD_NUMBER: _ClassVar[int]
@@ -19,20 +63,52 @@ class EnvID(_message.Message):
     def __init__(self, env_id: _Optional[str] = ...) -> None: ...
 
 class GymnasiumMessage(_message.Message):
-    __slots__ = ["action", "close", "request", "reset_args", "status", "step_return"]
+    __slots__ = ["action", "batch_action", "batch_step_return", "close", "handshake", "lease", "request", "reset_args", "status", "step_return"]
     ACTION_FIELD_NUMBER: _ClassVar[int]
+    BATCH_ACTION_FIELD_NUMBER: _ClassVar[int]
+    BATCH_STEP_RETURN_FIELD_NUMBER: _ClassVar[int]
     CLOSE_FIELD_NUMBER: _ClassVar[int]
+    HANDSHAKE_FIELD_NUMBER: _ClassVar[int]
+    LEASE_FIELD_NUMBER: _ClassVar[int]
     REQUEST_FIELD_NUMBER: _ClassVar[int]
     RESET_ARGS_FIELD_NUMBER: _ClassVar[int]
     STATUS_FIELD_NUMBER: _ClassVar[int]
     STEP_RETURN_FIELD_NUMBER: _ClassVar[int]
-    action: NDArray
+    action: NumpyArray
+    batch_action: NumpyArray
+    batch_step_return: BatchStepReturn
     close: bool
+    handshake: Handshake
+    lease: Lease
     request: bool
     reset_args: ResetArgs
     status: bool
     step_return: StepReturn
-    def __init__(self, step_return: _Optional[_Union[StepReturn, _Mapping]] = ..., reset_args: _Optional[_Union[ResetArgs, _Mapping]] = ..., action: _Optional[_Union[NDArray, _Mapping]] = ..., close: bool = ..., request: bool = ..., status: bool = ...) -> None: ...
+    def __init__(self, step_return: _Optional[_Union[StepReturn, _Mapping]] = ..., reset_args: _Optional[_Union[ResetArgs, _Mapping]] = ..., action: _Optional[_Union[NumpyArray, _Mapping]] = ..., close: bool = ..., request: bool = ..., status: bool = ..., handshake: _Optional[_Union[Handshake, _Mapping]] = ..., batch_action: _Optional[_Union[NumpyArray, _Mapping]] = ..., batch_step_return: _Optional[_Union[BatchStepReturn, _Mapping]] = ..., lease: _Optional[_Union[Lease, _Mapping]] = ...) -> None: ...
+
+class Handshake(_message.Message):
+    __slots__ = ["action", "action_repeat", "autoreset", "frames", "keyframe_interval", "max_pool", "num_envs", "obs", "obs_compression", "preprocess"]
+    ACTION_FIELD_NUMBER: _ClassVar[int]
+    ACTION_REPEAT_FIELD_NUMBER: _ClassVar[int]
+    AUTORESET_FIELD_NUMBER: _ClassVar[int]
+    FRAMES_FIELD_NUMBER: _ClassVar[int]
+    KEYFRAME_INTERVAL_FIELD_NUMBER: _ClassVar[int]
+    MAX_POOL_FIELD_NUMBER: _ClassVar[int]
+    NUM_ENVS_FIELD_NUMBER: _ClassVar[int]
+    OBS_COMPRESSION_FIELD_NUMBER: _ClassVar[int]
+    OBS_FIELD_NUMBER: _ClassVar[int]
+    PREPROCESS_FIELD_NUMBER: _ClassVar[int]
+    action: ArraySpec
+    action_repeat: int
+    autoreset: bool
+    frames: bool
+    keyframe_interval: int
+    max_pool: bool
+    num_envs: int
+    obs: ArraySpec
+    obs_compression: str
+    preprocess: _containers.RepeatedScalarFieldContainer[str]
+    def __init__(self, obs: _Optional[_Union[ArraySpec, _Mapping]] = ..., action: _Optional[_Union[ArraySpec, _Mapping]] = ..., frames: bool = ..., num_envs: _Optional[int] = ..., action_repeat: _Optional[int] = ..., max_pool: bool = ..., autoreset: bool = ..., obs_compression: _Optional[str] = ..., keyframe_interval: _Optional[int] = ..., preprocess: _Optional[_Iterable[str]] = ...) -> None: ...
 
 class Info(_message.Message):
     __slots__ = ["params"]
@@ -47,6 +123,18 @@ class Info(_message.Message):
     params: _containers.MessageMap[str, _struct_pb2.Value]
     def __init__(self, params: _Optional[_Mapping[str, _struct_pb2.Value]] = ...) -> None: ...
 
+class Lease(_message.Message):
+    __slots__ = ["name", "pid", "port", "transport"]
+    NAME_FIELD_NUMBER: _ClassVar[int]
+    PID_FIELD_NUMBER: _ClassVar[int]
+    PORT_FIELD_NUMBER: _ClassVar[int]
+    TRANSPORT_FIELD_NUMBER: _ClassVar[int]
+    name: str
+    pid: int
+    port: int
+    transport: str
+    def __init__(self, name: _Optional[str] = ..., transport: _Optional[str] = ..., port: _Optional[int] = ..., pid: _Optional[int] = ...) -> None: ...
+
 class NDArray(_message.Message):
     __slots__ = ["data", "dtype", "shape"]
     DATA_FIELD_NUMBER: _ClassVar[int]
@@ -58,14 +146,18 @@ class NDArray(_message.Message):
     def __init__(self, shape: _Optional[_Iterable[int]] = ..., data: _Optional[_Iterable[float]] = ..., dtype: _Optional[str] = ...) -> None: ...
 
 class NumpyArray(_message.Message):
-    __slots__ = ["data", "dtype", "shape"]
+    __slots__ = ["compression", "data", "delta", "dtype", "shape"]
+    COMPRESSION_FIELD_NUMBER: _ClassVar[int]
     DATA_FIELD_NUMBER: _ClassVar[int]
+    DELTA_FIELD_NUMBER: _ClassVar[int]
     DTYPE_FIELD_NUMBER: _ClassVar[int]
     SHAPE_FIELD_NUMBER: _ClassVar[int]
+    compression: str
     data: bytes
+    delta: bool
     dtype: str
-    shape: bytes
-    def __init__(self, data: _Optional[bytes] = ..., shape: _Optional[bytes] = ..., dtype: _Optional[str] = ...) -> None: ...
+    shape: _containers.RepeatedScalarFieldContainer[int]
+    def __init__(self, data: _Optional[bytes] = ..., shape: _Optional[_Iterable[int]] = ..., dtype: _Optional[str] = ..., compression: _Optional[str] = ..., delta: bool = ...) -> None: ...
 
 class Options(_message.Message):
     __slots__ = ["params"]
@@ -109,21 +201,14 @@ class Status(_message.Message):
 
 class StepReturn(_message.Message):
     __slots__ = ["info", "obs", "reward", "terminated", "truncated"]
-    class InfoEntry(_message.Message):
-        __slots__ = ["key", "value"]
-        KEY_FIELD_NUMBER: _ClassVar[int]
-        VALUE_FIELD_NUMBER: _ClassVar[int]
-        key: str
-        value: _struct_pb2.Value
-        def __init__(self, key: _Optional[str] = ..., value: _Optional[_Union[_struct_pb2.Value, _Mapping]] = ...) -> None: ...
     INFO_FIELD_NUMBER: _ClassVar[int]
     OBS_FIELD_NUMBER: _ClassVar[int]
     REWARD_FIELD_NUMBER: _ClassVar[int]
     TERMINATED_FIELD_NUMBER: _ClassVar[int]
     TRUNCATED_FIELD_NUMBER: _ClassVar[int]
-    info: _containers.MessageMap[str, _struct_pb2.Value]
-    obs: NDArray
+    info: EncodedInfo
+    obs: NumpyArray
     reward: float
     terminated: bool
     truncated: bool
-    def __init__(self, obs: _Optional[_Union[NDArray, _Mapping]] = ..., reward: _Optional[float] = ..., terminated: bool = ..., truncated: bool = ..., info: _Optional[_Mapping[str, _struct_pb2.Value]] = ...) -> None: ...
+    def __init__(self, obs: _Optional[_Union[NumpyArray, _Mapping]] = ..., reward: _Optional[float] = ..., terminated: bool = ..., truncated: bool = ..., info: _Optional[_Union[EncodedInfo, _Mapping]] = ...) -> None: ...
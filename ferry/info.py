@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import json
+import struct
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+
+from ferry import profiling
+from ferry.gym_grpc.gym_ferry_pb2 import EncodedInfo
+
+ALIGNMENT = 8
+
+# Python scalars packed as a single array when a list or tuple holds only one of these types
+_SCALAR_DTYPES = {bool: "|b1", int: "<i8", float: "<f8"}
+
+
+class _Packer:
+    """Walks an info dict, packing its values and returning its schema as a nested tuple."""
+    def __init__(self):
+        self.parts = []
+        self.blobs = []
+        self.offset = 0
+
+    def _write(self, data: bytes, align: int = 1):
+        padding = -self.offset % align
+        if padding:
+            self.parts.append(bytes(padding))
+        self.parts.append(data)
+        self.offset += padding + len(data)
+
+    def pack(self, value: Any) -> tuple:
+        # NumPy scalars first, since some of them (like np.float64) are also instances of the builtin types
+        if value is None:
+            return ("n",)
+        elif isinstance(value, (np.ndarray, np.generic)):
+            if value.dtype.hasobject:
+                raise TypeError("Can't encode an object array in an info dict")
+            self._write(value.tobytes(), ALIGNMENT)
+            return ("a" if isinstance(value, np.ndarray) else "g", value.dtype.str, value.shape)
+        elif isinstance(value, bool):
+            self._write(b"\x01" if value else b"\x00")
+            return ("b",)
+        elif isinstance(value, int):
+            if -2 ** 63 <= value < 2 ** 63:
+                self._write(value.to_bytes(8, byteorder='little', signed=True))
+                return ("i",)
+            self.blobs.append(str(value).encode())
+            return ("I",)
+        elif isinstance(value, float):
+            self._write(struct.pack("<d", value))
+            return ("f",)
+        elif isinstance(value, str):
+            self.blobs.append(value.encode())
+            return ("s",)
+        elif isinstance(value, bytes):
+            self.blobs.append(value)
+            return ("y",)
+        elif isinstance(value, dict):
+            for key in value:
+                if not isinstance(key, str):
+                    raise TypeError(f"Info keys must be strings, got {key!r}")
+            return ("d", tuple(value), tuple(self.pack(v) for v in value.values()))
+        elif isinstance(value, (list, tuple)):
+            kind = "l" if isinstance(value, list) else "t"
+            scalar_type = type(value[0]) if value else None
+            if scalar_type in _SCALAR_DTYPES and all(type(v) is scalar_type for v in value):
+                try:
+                    array = np.array(value, dtype=_SCALAR_DTYPES[scalar_type])
+                except OverflowError:
+                    pass
+                else:
+                    self._write(array.tobytes(), ALIGNMENT)
+                    return (kind.upper(), array.dtype.str, len(value))
+            return (kind, tuple(self.pack(v) for v in value))
+        raise TypeError(f"Can't encode a {type(value).__name__} in an info dict")
+
+
+class InfoEncoder:
+    """
+    Packs the info dicts sent over one channel, remembering which schemas the other side has already seen.
+
+    Supports None, bools, ints, floats, strings, bytes, NumPy arrays and scalars, and dicts, lists and tuples
+    of those, and raises a TypeError on anything else rather than dropping it.
+
+    At most `max_schemas` schemas are remembered. Past that, a new schema takes over the id of the least recently
+    sent one, so that neither side grows without bound when the keys of the infos keep changing.
+    """
+    def __init__(self, max_schemas: int = 64):
+        self.schemas: OrderedDict[tuple, int] = OrderedDict()
+        self.max_schemas = max_schemas
+
+    def encode(self, info: Optional[dict[str, Any]]) -> EncodedInfo:
+        if not info:
+            return EncodedInfo()
+
+        start = profiling.enabled and time.perf_counter_ns()
+        packer = _Packer()
+        schema = packer.pack(info)
+        data = b"".join(packer.parts)
+        schema_id = self.schemas.get(schema)
+        if schema_id is None:
+            if len(self.schemas) < self.max_schemas:
+                schema_id = len(self.schemas) + 1
+            else:
+                _, schema_id = self.schemas.popitem(last=False)
+            self.schemas[schema] = schema_id
+            msg = EncodedInfo(schema_id=schema_id, schema=json.dumps(schema), data=data, blobs=packer.blobs)
+        else:
+            self.schemas.move_to_end(schema)
+            msg = EncodedInfo(schema_id=schema_id, data=data, blobs=packer.blobs)
+        if start:
+            profiling.record("encode_info", start, len(data))
+        return msg
+
+
+class _Offsets:
+    """Replays the packing order of a schema, to find where each of its values lands."""
+    def __init__(self):
+        self.offset = 0
+        self.blob = 0
+
+    def take(self, nbytes: int, align: int = 1) -> int:
+        self.offset += -self.offset % align
+        offset = self.offset
+        self.offset += nbytes
+        return offset
+
+    def take_blob(self) -> int:
+        self.blob += 1
+        return self.blob - 1
+
+
+def _compile(schema: list, offsets: _Offsets) -> Callable[[bytes, list[bytes]], Any]:
+    """Turn a schema into a function reading the values of an info with that schema."""
+    kind = schema[0]
+    if kind == "n":
+        return lambda data, blobs: None
+    elif kind == "b":
+        offset = offsets.take(1)
+        return lambda data, blobs: data[offset] != 0
+    elif kind == "i":
+        offset = offsets.take(8)
+        return lambda data, blobs: int.from_bytes(data[offset:offset + 8], byteorder='little', signed=True)
+    elif kind == "f":
+        offset = offsets.take(8)
+        return lambda data, blobs: struct.unpack_from("<d", data, offset)[0]
+    elif kind in ("I", "s", "y"):
+        index = offsets.take_blob()
+        convert = {"I": lambda blob: int(blob), "s": lambda blob: blob.decode(), "y": lambda blob: blob}[kind]
+        return lambda data, blobs: convert(blobs[index])
+    elif kind in ("a", "g", "L", "T"):
+        dtype = np.dtype(schema[1])
+        shape = tuple(schema[2]) if kind in ("a", "g") else (schema[2],)
+        count = int(np.prod(shape, dtype=np.int64))
+        offset = offsets.take(count * dtype.itemsize, ALIGNMENT)
+
+        def read(data: bytes) -> np.ndarray:
+            if count == 0:
+                return np.empty(shape, dtype=dtype)
+            return np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+        if kind == "a":
+            return lambda data, blobs: read(data)
+        elif kind == "g":
+            return lambda data, blobs: read(data)[()]
+        elif kind == "L":
+            return lambda data, blobs: read(data).tolist()
+        return lambda data, blobs: tuple(read(data).tolist())
+    elif kind == "d":
+        keys = schema[1]
+        readers = [_compile(child, offsets) for child in schema[2]]
+        return lambda data, blobs: {key: read(data, blobs) for key, read in zip(keys, readers)}
+    elif kind in ("l", "t"):
+        readers = [_compile(child, offsets) for child in schema[1]]
+        container = list if kind == "l" else tuple
+        return lambda data, blobs: container(read(data, blobs) for read in readers)
+    raise ValueError(f"Unknown info schema {schema}")
+
+
+class LazyInfo(MutableMapping):
+    """
+    An info dict that is only decoded when first accessed. Arrays in it are read-only views of the message.
+    Use `dict(info)` where a plain dict is required.
+    """
+    def __init__(self, read: Callable[[bytes, list[bytes]], dict], data: bytes, blobs: list[bytes]):
+        self._read = read
+        self._data = data
+        self._blobs = blobs
+        self._info: Optional[dict] = None
+
+    @property
+    def info(self) -> dict[str, Any]:
+        if self._info is None:
+            start = profiling.enabled and time.perf_counter_ns()
+            self._info = self._read(self._data, self._blobs)
+            if start:
+                profiling.record("decode_info", start, len(self._data))
+            self._read = self._data = self._blobs = None
+        return self._info
+
+    def __getitem__(self, key: str) -> Any:
+        return self.info[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self.info[key] = value
+
+    def __delitem__(self, key: str):
+        del self.info[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.info)
+
+    def __len__(self) -> int:
+        return len(self.info)
+
+    def __repr__(self) -> str:
+        return repr(self.info)
+
+
+class InfoDecoder:
+    """
+    Unpacks the info dicts received over one channel, keeping the schemas sent by the other side. A schema sent
+    with an id that's already known replaces the old one.
+    """
+    def __init__(self):
+        self.readers: dict[int, Callable[[bytes, list[bytes]], dict]] = {}
+
+    def decode(self, msg: EncodedInfo) -> dict[str, Any] | LazyInfo:
+        if msg.schema_id == 0:
+            return {}
+        if msg.schema:
+            self.readers[msg.schema_id] = _compile(json.loads(msg.schema), _Offsets())
+        return LazyInfo(self.readers[msg.schema_id], msg.data, list(msg.blobs))
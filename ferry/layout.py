@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from typing import Any
+from typing import Iterator
+from typing import Optional
+
+import gymnasium as gym
+import numpy as np
+
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.gym_grpc.gym_ferry_pb2 import ArraySpec, Handshake
+
+
+ALIGNMENT = 8
+
+
+def space_spec(space: gym.Space) -> Optional[ArraySpec]:
+    """Describe a space as fixed-shape arrays, possibly nested in Dicts and Tuples, or None if it doesn't have one."""
+    if isinstance(space, gym.spaces.Discrete):
+        return ArraySpec(shape=(), dtype=np.dtype(np.int64).str)
+    elif isinstance(space, (gym.spaces.Box, gym.spaces.MultiBinary, gym.spaces.MultiDiscrete)):
+        return ArraySpec(shape=space.shape, dtype=np.dtype(space.dtype).str)
+    elif isinstance(space, (gym.spaces.Dict, gym.spaces.Tuple)):
+        subspaces = space.spaces.values() if isinstance(space, gym.spaces.Dict) else space.spaces
+        children = [space_spec(subspace) for subspace in subspaces]
+        if not children or any(child is None for child in children):
+            return None
+        keys = list(space.spaces) if isinstance(space, gym.spaces.Dict) else []
+        return ArraySpec(children=children, keys=keys)
+    return None
+
+
+def assign_value(view: Any, value: Any):
+    """Write a (possibly nested) value into views with the same structure."""
+    if isinstance(view, dict):
+        for key, subview in view.items():
+            assign_value(subview, value[key])
+    elif isinstance(view, tuple):
+        for subview, subvalue in zip(view, value):
+            assign_value(subview, subvalue)
+    else:
+        view[...] = value
+
+
+def copy_value(view: Any) -> Any:
+    """Copy (possibly nested) views out of the buffer they point into."""
+    if isinstance(view, dict):
+        return {key: copy_value(subview) for key, subview in view.items()}
+    elif isinstance(view, tuple):
+        return tuple(copy_value(subview) for subview in view)
+    return view.copy()
+
+
+def scalar_value(value: Any) -> Any:
+    """
+    Turn the 0-d arrays of a (possibly nested) value into NumPy scalars, which envs can hash, e.g. to look up
+    their transitions by action.
+    """
+    if isinstance(value, dict):
+        return {key: scalar_value(subvalue) for key, subvalue in value.items()}
+    elif isinstance(value, tuple):
+        return tuple(scalar_value(subvalue) for subvalue in value)
+    return value[()] if isinstance(value, np.ndarray) and value.ndim == 0 else value
+
+
+def _leaf_specs(spec: ArraySpec) -> list[ArraySpec]:
+    if not spec.children:
+        return [spec]
+    return [leaf for child in spec.children for leaf in _leaf_specs(child)]
+
+
+def _nbytes(spec: ArraySpec) -> int:
+    return int(np.prod(spec.shape, dtype=np.int64)) * np.dtype(spec.dtype).itemsize
+
+
+def _nest(spec: ArraySpec, leaves: Iterator[Any]) -> Any:
+    """Arrange the leaves of `spec`, in order, into its Dicts and Tuples."""
+    if not spec.children:
+        return next(leaves)
+    values = [_nest(child, leaves) for child in spec.children]
+    return dict(zip(spec.keys, values)) if spec.keys else tuple(values)
+
+
+class SpaceLayout:
+    """
+    Fixed offsets of every array of a space in one contiguous buffer, so that a nested Dict or Tuple value
+    crosses the channel as a single array, and comes out as views into it rather than a copy per key.
+    """
+    def __init__(self, spec: ArraySpec):
+        self.spec = spec
+        self.composite = len(spec.children) > 0
+        self.leaves = _leaf_specs(spec)
+
+        self.offsets = []
+        offset = 0
+        for leaf in self.leaves:
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            self.offsets.append(offset)
+            offset += _nbytes(leaf)
+        self.nbytes = -(-offset // ALIGNMENT) * ALIGNMENT
+
+    def bind(self, buffer: Any, offset: int = 0) -> Any:
+        """Create writable views of the space's arrays inside `buffer`, starting at `offset`."""
+        return _nest(self.spec, (np.ndarray(tuple(leaf.shape), dtype=np.dtype(leaf.dtype), buffer=buffer,
+                                            offset=offset + leaf_offset)
+                                 for leaf, leaf_offset in zip(self.leaves, self.offsets)))
+
+    def pack(self, value: Any) -> np.ndarray:
+        """Turn a value of the space into a single array. Composite values are packed into a byte buffer."""
+        if not self.composite:
+            return np.asarray(value)
+        buffer = np.zeros(self.nbytes, dtype=np.uint8)
+        assign_value(self.bind(buffer), value)
+        return buffer
+
+    def unpack(self, array: np.ndarray, batch: tuple[int, ...] = ()) -> Any:
+        """
+        Inverse of `pack`, with leading `batch` dimensions if the array holds several packed values.
+        Composite values come out as views into `array`.
+        """
+        if not self.composite:
+            return array.reshape(batch + tuple(self.spec.shape))
+        array = array.reshape(batch + (self.nbytes,))
+        return _nest(self.spec, (array[..., offset:offset + _nbytes(leaf)].view(leaf.dtype)
+                                 .reshape(batch + tuple(leaf.shape))
+                                 for leaf, offset in zip(self.leaves, self.offsets)))
+
+
+def space_layouts(handshake: gym_ferry_pb2.Handshake) -> tuple[Optional[SpaceLayout], Optional[SpaceLayout]]:
+    """Layouts of the observation and action spaces described in a handshake, None for those that aren't."""
+    return (SpaceLayout(handshake.obs) if handshake.HasField("obs") else None,
+            SpaceLayout(handshake.action) if handshake.HasField("action") else None)
+
+
+def pack_value(layout: Optional[SpaceLayout], value: Any) -> np.ndarray:
+    """Turn a value into a single array to encode, using the space's layout if there is one."""
+    return layout.pack(value) if layout is not None else np.asarray(value)
+
+
+def unpack_value(layout: Optional[SpaceLayout], array: np.ndarray, batch: tuple[int, ...] = ()) -> Any:
+    """Inverse of `pack_value`."""
+    return layout.unpack(array, batch) if layout is not None else array
+
+
+class FrameLayout:
+    """Fixed offsets of everything a step exchanges, so that it can be written straight into shared memory."""
+    def __init__(self, obs: ArraySpec, action: ArraySpec):
+        self.fields = [
+            ("action", SpaceLayout(action)),
+            ("obs", SpaceLayout(obs)),
+            ("reward", SpaceLayout(ArraySpec(shape=(), dtype=np.dtype(np.float64).str))),
+            ("terminated", SpaceLayout(ArraySpec(shape=(), dtype=np.dtype(np.bool_).str))),
+            ("truncated", SpaceLayout(ArraySpec(shape=(), dtype=np.dtype(np.bool_).str))),
+        ]
+
+        self.offsets = {}
+        self.sizes = {}
+        offset = 0
+        for name, layout in self.fields:
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            self.offsets[name] = offset
+            self.sizes[name] = layout.nbytes
+            offset += layout.nbytes
+        self.nbytes = offset
+
+    def bind(self, buffer: Any, offset: int = 0) -> dict[str, Any]:
+        """Create writable views of each field inside `buffer`, starting at `offset`. Composite fields are nested."""
+        return {name: layout.bind(buffer, offset + self.offsets[name]) for name, layout in self.fields}
+
+    def bind_bytes(self, buffer: Any, offset: int = 0) -> dict[str, np.ndarray]:
+        """Create a flat byte view of each field inside `buffer`, starting at `offset`."""
+        return {name: np.ndarray((self.sizes[name],), dtype=np.uint8, buffer=buffer, offset=offset + self.offsets[name])
+                for name, _ in self.fields}
+
+
+def offer_layout(observation_space: gym.Space, action_space: gym.Space, capacity: int) -> Handshake:
+    """Build the handshake a backend proposes for its env's spaces."""
+    obs, action = space_spec(observation_space), space_spec(action_space)
+    if obs is None or action is None:
+        return Handshake(obs=obs, action=action, frames=False)
+    return Handshake(obs=obs, action=action, frames=FrameLayout(obs, action).nbytes <= capacity)
+
+
+def accepted_layout(handshake: gym_ferry_pb2.Handshake) -> Optional[FrameLayout]:
+    """Layout agreed on in a final handshake, or None if steps stay on protobuf."""
+    return FrameLayout(handshake.obs, handshake.action) if handshake.frames else None
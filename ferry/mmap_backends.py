@@ -1,24 +1,147 @@
 from __future__ import annotations
 
+import os
+import time
+from typing import Any, Optional, Sequence
+
 import gymnasium as gym
+import numpy as np
 
-from ferry.core import Communicator, create_gymnasium_message
+from ferry import profiling
+from ferry.broadcast import BroadcastWriter
+from ferry.compression import COMPRESSORS, ObsEncoder
+from ferry.core import make_communicator, create_gymnasium_message
 from ferry.gym_grpc import gym_ferry_pb2
 from ferry.gym_grpc.gym_ferry_pb2 import GymnasiumMessage
-from ferry.utils import decode, unwrap_dict, encode, wrap_dict
+from ferry.info import InfoEncoder
+from ferry.layout import (offer_layout, accepted_layout, space_layouts, pack_value, unpack_value, copy_value,
+                          scalar_value)
+from ferry.preprocessing import Preprocessing
+from ferry.recording import TrajectoryRecorder
+from ferry.shm import pin
+from ferry.utils import decode, unwrap_dict
+
+
+def _accept_options(handshake: gym_ferry_pb2.Handshake, reply: gym_ferry_pb2.Handshake):
+    """Take on the execution options the env side asked for in its reply, as far as they apply to the env."""
+    handshake.action_repeat = max(reply.action_repeat, 1)
+    # Max-pooling only makes sense for a single observation array, e.g. images
+    handshake.max_pool = (reply.max_pool and handshake.action_repeat > 1 and handshake.HasField("obs")
+                          and not handshake.obs.children)
+    handshake.autoreset = reply.autoreset
+    # Compressed observations have to go through messages rather than raw frames
+    if reply.obs_compression in COMPRESSORS:
+        handshake.obs_compression = reply.obs_compression
+        handshake.keyframe_interval = reply.keyframe_interval or 100
+        handshake.frames = False
+
+
+def _accept_preprocessing(handshake: gym_ferry_pb2.Handshake, reply: gym_ferry_pb2.Handshake, env: gym.Env,
+                          frame_capacity: Optional[int]) -> Optional[Preprocessing]:
+    """
+    Set up the preprocessing chain the env side asked for in its reply, if any, and offer the layout of the
+    observations it produces instead of the env's own. A chain that can't be applied to the env's observations
+    is declined by leaving `preprocess` empty, for the env side to raise.
+    """
+    if not reply.preprocess:
+        return None
+    try:
+        preprocessing = Preprocessing(list(reply.preprocess), env.observation_space)
+    except ValueError as e:
+        print(f"Declining preprocessing {list(reply.preprocess)}: {e}")
+        return None
+    processed = offer_layout(preprocessing.observation_space, env.action_space, frame_capacity)
+    handshake.obs.CopyFrom(processed.obs)
+    handshake.frames = processed.frames
+    handshake.preprocess[:] = preprocessing.steps
+    return preprocessing
+
+
+def _execute(env: gym.Env, action: Any, options: gym_ferry_pb2.Handshake,
+             observers: Sequence[TrajectoryRecorder | BroadcastWriter] = (),
+             preprocessing: Optional[Preprocessing] = None) -> tuple[Any, float, bool, bool, dict]:
+    """
+    Step the env with an action the way the env side asked for at the handshake: repeat it up to `action_repeat`
+    times, summing the rewards and max-pooling the last two observations if asked, preprocess the observation, and
+    reset right away if the episode ends, with the final observation and info under `final_obs` and `final_info`.
+    Every transition, and the reset, is passed on to the `observers`.
+    """
+    start = profiling.enabled and time.perf_counter_ns()
+    action = scalar_value(action)
+    reward, previous = 0., None
+    for i in range(options.action_repeat or 1):
+        obs, step_reward, terminated, truncated, info = env.step(action)
+        reward += step_reward
+        if terminated or truncated:
+            break
+        if options.max_pool and i == options.action_repeat - 2:
+            previous = np.array(obs)
+    if previous is not None:
+        obs = np.maximum(previous, obs)
+    if start:
+        profiling.record("env_step", start)
+    if preprocessing is not None:
+        obs = preprocessing(obs)
+
+    for observer in observers:
+        observer.step(action, obs, reward, terminated, truncated)
+    if options.autoreset and (terminated or truncated):
+        # A stacked observation is a view of the ring that the reset refills
+        final_obs, final_info = obs if preprocessing is None else np.array(obs), info
+        obs, info = env.reset()
+        if preprocessing is not None:
+            obs = preprocessing.reset(obs)
+        info = {**info, "final_obs": final_obs, "final_info": final_info}
+        for observer in observers:
+            observer.reset(obs)
+    return obs, reward, terminated, truncated, info
 
 
 class ClientBackend:
-    def __init__(self, env_id: str, port: int = 5005):
-        self.env = gym.make(env_id)
+    """
+    Runs an environment for a ServerEnv, asking it for a decision at every step.
+
+    With `record` set, every transition is also appended to a TrajectoryRecorder at that path. If the ServerEnv
+    asked for preprocessing, the processed observations are the ones recorded. With `broadcast` set, they're also
+    published to the broadcast ring of that name, for any number of BroadcastReaders to watch.
+
+    With `cpus` set, the process is pinned to those CPUs first, e.g. to share a cache with the ServerEnv's.
+    """
+    def __init__(self, env_id: str, port: int = 5005, env_kwargs: dict = {}, name: str = "ferry",
+                 transport: str = "mmap", host: str = "localhost", record: Optional[str] = None,
+                 cpus: Optional[list[int]] = None, broadcast: Optional[str] = None):
+        pin(cpus)
+        self.env = gym.make(env_id, **env_kwargs)
         self.env.reset()
 
         # self.communicator = Communicator("ferry_client", "ferry_server", "ferry_lock", port=port, create=False)
-        self.communicator = Communicator("ferry", create=False)
+        self.communicator = make_communicator(transport, name, create=False, host=host, port=port)
+        self.info_encoder = InfoEncoder()
 
-        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))
-        handshake = self.communicator.receive_message() # handshake
+        # Offer a fixed frame layout for the env's spaces, and settle on it if the server accepts
+        self.communicator.receive_message()
+        handshake = offer_layout(self.env.observation_space, self.env.action_space,
+                                 self.communicator.frame_capacity)
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(handshake=handshake))
+        reply = self.communicator.receive_message().handshake
+        self.preprocessing = _accept_preprocessing(handshake, reply, self.env, self.communicator.frame_capacity)
+        handshake.frames = handshake.frames and reply.frames
+        _accept_options(handshake, reply)
+        self.handshake = handshake
+        self.communicator.set_layout(accepted_layout(handshake))
+        self.obs_layout, self.action_layout = space_layouts(handshake)
+        self.obs_encoder = (ObsEncoder(handshake.obs_compression, handshake.keyframe_interval)
+                            if handshake.obs_compression else None)
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(handshake=handshake))
+        self.communicator.receive_message()
 
+        observation_space = (self.preprocessing.observation_space if self.preprocessing is not None
+                             else self.env.observation_space)
+        self.observers = []
+        if record is not None:
+            self.observers.append(TrajectoryRecorder(record, observation_space, self.env.action_space))
+        if broadcast is not None:
+            self.observers.append(BroadcastWriter(broadcast, observation_space, self.env.action_space))
 
         print(f"Backend client listening on port {port}")
 
@@ -30,6 +153,12 @@ class ClientBackend:
         self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(request=True))
 
         msg = self.communicator.receive_message()
+        if msg.HasField("close"):
+            # The ServerEnv stopped before the first reset, e.g. because its preprocessing was declined
+            for observer in self.observers:
+                observer.close()
+            self.env.close()
+            return
         assert msg.HasField("reset_args"), "Environment must be reset before using."
 
         seed = msg.reset_args.seed if msg.reset_args.seed != -1 else None
@@ -37,27 +166,49 @@ class ClientBackend:
 
         obs, info = self.env.reset(seed=seed, options=options)
         reward, terminated, truncated = 0., False, False
+        if self.preprocessing is not None:
+            obs = self.preprocessing.reset(obs)
+        for observer in self.observers:
+            observer.reset(obs)
 
         while True:
             # Execute whatever logic. When we need a decision, send the current step return and get the decision
-            msg = create_gymnasium_message(step_return=(obs, reward, terminated, truncated, info))
-            self.communicator.send_message(msg)  # 1
+            if self.communicator.frame is not None and not info:
+                self.communicator.send_frame(obs=obs, reward=reward, terminated=terminated, truncated=truncated)  # 1
+            else:
+                msg = create_gymnasium_message(step_return=(pack_value(self.obs_layout, obs), reward, terminated,
+                                                            truncated, info),
+                                               info_encoder=self.info_encoder, obs_encoder=self.obs_encoder)
+                self.communicator.send_message(msg)  # 1
             response = self.communicator.receive_message()  # 2
 
-            if response.HasField("action"):
+            if response is None:
+                # The action came in a raw frame
+                action = copy_value(self.communicator.frame["action"])
+                obs, reward, terminated, truncated, info = _execute(self.env, action, self.handshake, self.observers,
+                                                                     self.preprocessing)
+
+            elif response.HasField("action"):
                 # If we got an action, execute it
-                action = decode(response.action)
-                if action.size == 1:
-                    action = action[0]
-                obs, reward, terminated, truncated, info = self.env.step(action)
+                action = unpack_value(self.action_layout, decode(response.action))
+                obs, reward, terminated, truncated, info = _execute(self.env, action, self.handshake, self.observers,
+                                                                     self.preprocessing)
 
             elif response.HasField("reset_args"):
                 seed = response.reset_args.seed if response.reset_args.seed != -1 else None
                 options = unwrap_dict(response.reset_args.options)
                 obs, info = self.env.reset(seed=seed, options=options)
                 reward, terminated, truncated = 0., False, False
+                if self.preprocessing is not None:
+                    obs = self.preprocessing.reset(obs)
+                for observer in self.observers:
+                    observer.reset(obs)
+                if self.obs_encoder is not None:
+                    self.obs_encoder.reset()
 
             elif response.HasField("close"):
+                for observer in self.observers:
+                    observer.close()
                 self.env.close()
                 return
             elif response.HasField("status"):
@@ -69,16 +220,73 @@ class ClientBackend:
 
 
 class ServerBackend:
-    def __init__(self, env_id: str, port: int = 50051, env_kwargs: dict = {}):
-        self.env = gym.make(env_id, **env_kwargs)
-        self.env.reset()
+    """
+    Hosts an environment for a ClientEnv.
+
+    With `num_envs` set, it hosts that many copies instead, and serves batch actions from a BatchClientEnv
+    by stepping all of them in a single exchange, resetting the ones that finish.
+
+    Already made (and reset) `envs` can be passed to host them instead of making new ones. They're then left open
+    when the channel closes, so that they can be hosted again, as EnvPool does.
+
+    With `record` set, every transition is also appended to a TrajectoryRecorder at that path, or for `num_envs`
+    copies, to one recording per copy at `{record}/{i}`. If the ClientEnv asked for preprocessing, the processed
+    observations are the ones recorded. Batched copies aren't preprocessed. With `broadcast` set, they're also
+    published to the broadcast ring of that name, or `{broadcast}_{i}` for `num_envs` copies, for any number of
+    BroadcastReaders to watch.
+
+    With `cpus` set, the process is pinned to those CPUs first, e.g. to share a cache with the ClientEnv's.
+    `hugepages` backs large shared memory channels with transparent huge pages.
+    """
+    def __init__(self, env_id: str, port: int = 50051, env_kwargs: dict = {}, name: str = "ferry",
+                 num_envs: Optional[int] = None, wait: str = "spin", transport: str = "mmap",
+                 host: str = "localhost", envs: Optional[list[gym.Env]] = None, record: Optional[str] = None,
+                 cpus: Optional[list[int]] = None, hugepages: bool = False, broadcast: Optional[str] = None):
+        pin(cpus)
+        self.num_envs = num_envs
+        self.owns_envs = envs is None
+        if envs is None:
+            envs = [gym.make(env_id, **env_kwargs) for _ in range(num_envs or 1)]
+            for env in envs:
+                env.reset()
+        self.envs = envs
+        self.env = self.envs[0]
 
-        self.communicator = Communicator("ferry", create=True)
+        self.communicator = make_communicator(transport, name, create=True, host=host, port=port, wait=wait,
+                                              hugepages=hugepages)
+        self.info_encoder = InfoEncoder()
 
         print("Waiting for handshake")
-        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(request=True))
-        self.communicator.receive_message() # handshake
-        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(request=True))
+        handshake = offer_layout(self.env.observation_space, self.env.action_space,
+                                 self.communicator.frame_capacity)
+        if num_envs is not None:
+            handshake.frames = False
+            handshake.num_envs = num_envs
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(handshake=handshake))
+        reply = self.communicator.receive_message().handshake
+        self.preprocessing = (_accept_preprocessing(handshake, reply, self.env, self.communicator.frame_capacity)
+                              if num_envs is None else None)
+        handshake.frames = handshake.frames and reply.frames
+        _accept_options(handshake, reply)
+        self.handshake = handshake
+        self.communicator.set_layout(accepted_layout(handshake))
+        self.obs_layout, self.action_layout = space_layouts(handshake)
+        self.obs_encoder = (ObsEncoder(handshake.obs_compression, handshake.keyframe_interval)
+                            if handshake.obs_compression else None)
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(handshake=handshake))
+
+        # What every copy's transitions are passed on to
+        self.observers = [[] for _ in self.envs]
+        observation_space = (self.preprocessing.observation_space if self.preprocessing is not None
+                             else self.env.observation_space)
+        if record is not None:
+            paths = [os.path.join(record, str(i)) for i in range(num_envs)] if num_envs is not None else [record]
+            for observers, path, env in zip(self.observers, paths, self.envs):
+                observers.append(TrajectoryRecorder(path, observation_space, env.action_space))
+        if broadcast is not None:
+            names = [f"{broadcast}_{i}" for i in range(num_envs)] if num_envs is not None else [broadcast]
+            for observers, channel, env in zip(self.observers, names, self.envs):
+                observers.append(BroadcastWriter(channel, observation_space, env.action_space))
 
         print(f"Backend server listening on port {port}")
 
@@ -86,30 +294,93 @@ class ServerBackend:
         msg = msg.reset_args
         seed = msg.seed if msg.seed != -1 else None
         options = unwrap_dict(msg.options)
+        if self.num_envs is not None:
+            self.process_batch_reset(seed, options)
+            return
         obs, info = self.env.reset(seed=seed, options=options)
-        response = create_gymnasium_message(reset_return=(obs, info))
+        if self.preprocessing is not None:
+            obs = self.preprocessing.reset(obs)
+        for observer in self.observers[0]:
+            observer.reset(obs)
+        response = create_gymnasium_message(reset_return=(pack_value(self.obs_layout, obs), info),
+                                            info_encoder=self.info_encoder, obs_encoder=self.obs_encoder)
+        self.communicator.send_message(response)
+
+    def process_batch_reset(self, seed: Optional[int], options: dict):
+        observations, infos = [], []
+        for i, env in enumerate(self.envs):
+            obs, info = env.reset(seed=seed + i if seed is not None else None, options=options)
+            for observer in self.observers[i]:
+                observer.reset(obs)
+            observations.append(pack_value(self.obs_layout, obs))
+            infos.append(info)
+        zeros = np.zeros(self.num_envs, dtype=bool)
+        response = create_gymnasium_message(batch_step_return=(np.stack(observations), np.zeros(self.num_envs),
+                                                               zeros, zeros, infos, zeros, [], []),
+                                            info_encoder=self.info_encoder)
         self.communicator.send_message(response)
 
     def process_close(self, msg: GymnasiumMessage):
-        self.env.close()
+        for observers in self.observers:
+            for observer in observers:
+                observer.close()
+        if self.owns_envs:
+            for env in self.envs:
+                env.close()
         self.communicator.close()
 
-    def process_step(self, msg: GymnasiumMessage):
-        action = decode(msg.action)
-        if action.size == 1:
-            action = action[0]
-        obs, reward, terminated, truncated, info = self.env.step(action)
-        step_return = gym_ferry_pb2.StepReturn(obs=encode(obs), reward=reward, terminated=terminated,
-                                         truncated=truncated, info=wrap_dict(info))
-        response = gym_ferry_pb2.GymnasiumMessage(step_return=step_return)
+    def process_step(self, msg: Optional[GymnasiumMessage]):
+        if msg is None:
+            # The action came in a raw frame
+            action = copy_value(self.communicator.frame["action"])
+        else:
+            action = unpack_value(self.action_layout, decode(msg.action))
+        obs, reward, terminated, truncated, info = _execute(self.env, action, self.handshake, self.observers[0],
+                                                           self.preprocessing)
+        if self.communicator.frame is not None and not info:
+            self.communicator.send_frame(obs=obs, reward=reward, terminated=terminated, truncated=truncated)
+        else:
+            response = create_gymnasium_message(step_return=(pack_value(self.obs_layout, obs), reward, terminated,
+                                                             truncated, info),
+                                                info_encoder=self.info_encoder, obs_encoder=self.obs_encoder)
+            self.communicator.send_message(response)
+
+    def process_batch_step(self, msg: GymnasiumMessage):
+        actions = decode(msg.batch_action)
+        observations, infos = [], []
+        rewards = np.zeros(self.num_envs)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        final_obs, final_infos = [], []
+        start = profiling.enabled and time.perf_counter_ns()
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            action = scalar_value(unpack_value(self.action_layout, action))
+            obs, rewards[i], terminated[i], truncated[i], info = env.step(action)
+            for observer in self.observers[i]:
+                observer.step(action, obs, rewards[i], terminated[i], truncated[i])
+            if terminated[i] or truncated[i]:
+                final_obs.append(pack_value(self.obs_layout, obs))
+                final_infos.append(info)
+                obs, info = env.reset()
+                for observer in self.observers[i]:
+                    observer.reset(obs)
+            observations.append(pack_value(self.obs_layout, obs))
+            infos.append(info)
+        if start:
+            profiling.record("env_step", start)
+        response = create_gymnasium_message(batch_step_return=(np.stack(observations), rewards, terminated, truncated,
+                                                               infos, terminated | truncated, final_obs, final_infos),
+                                            info_encoder=self.info_encoder)
         self.communicator.send_message(response)
 
     def run(self):
         while True:
             msg = self.communicator.receive_message()
 
-            if msg.HasField("action"):
+            if msg is None or msg.HasField("action"):
                 self.process_step(msg)
+            elif msg.HasField("batch_action"):
+                self.process_batch_step(msg)
             elif msg.HasField("reset_args"):
                 self.process_reset(msg)
             elif msg.HasField("close"):
@@ -1,32 +1,68 @@
 from __future__ import annotations
 
+import time
+from typing import Optional
+
 import gymnasium as gym
 import numpy as np
 
-from ferry.core import Communicator, create_gymnasium_message
+from ferry import profiling
+from ferry.compression import ObsDecoder
+from ferry.core import make_communicator, create_gymnasium_message
 from ferry.gym_grpc import gym_ferry_pb2
-from ferry.utils import wrap_dict, decode, unwrap_dict
+from ferry.info import InfoDecoder
+from ferry.layout import accepted_layout, space_layouts, pack_value, unpack_value, copy_value
 
 
 class ServerEnv(gym.Env):
-    def __init__(self, port: int = 5005):
+    """
+    Serves decisions to a ClientBackend running the env. Takes the same execution options as ClientEnv.
+    `hugepages` backs large shared memory channels with transparent huge pages. Observations are writable copies.
+    """
+    def __init__(self, port: int = 5005, frames: bool = True, name: str = "ferry", wait: str = "spin",
+                 transport: str = "mmap", host: str = "localhost", action_repeat: int = 1, max_pool: bool = False,
+                 autoreset: bool = False, obs_compression: Optional[str] = None, keyframe_interval: int = 100,
+                 preprocess: Optional[list[str]] = None, hugepages: bool = False):
         self.port = port
-        self.communicator = Communicator("ferry", create=True)
+        self.communicator = make_communicator(transport, name, create=True, host=host, port=port, wait=wait,
+                                              hugepages=hugepages)
+        self.info_decoder = InfoDecoder()
 
         self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))
-        handshake = self.communicator.receive_message()
+        offer = self.communicator.receive_message().handshake
+        # Preprocessed observations may fit in a frame even if the env's own don't, the backend decides
+        reply = gym_ferry_pb2.Handshake(frames=frames and (offer.frames or bool(preprocess)),
+                                        action_repeat=action_repeat, max_pool=max_pool, autoreset=autoreset,
+                                        obs_compression=obs_compression or "", keyframe_interval=keyframe_interval,
+                                        preprocess=preprocess or [])
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(handshake=reply))
+        handshake = self.communicator.receive_message().handshake
+        self.communicator.set_layout(accepted_layout(handshake))
+        self.obs_layout, self.action_layout = space_layouts(handshake)
+        self.action_repeat = max(handshake.action_repeat, 1)
+        self.max_pool = handshake.max_pool
+        self.autoreset = handshake.autoreset
+        self.obs_compression = handshake.obs_compression or None
+        self.preprocess = list(handshake.preprocess)
+        self.obs_decoder = ObsDecoder()
         self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))
+        if preprocess and not self.preprocess:
+            self.close()
+            raise ValueError(f"The backend declined the preprocessing {preprocess} for its observations")
 
 
     def reset(self, seed=None, options=None):
         # print("Resetting environment")
         seed = seed if seed is not None else -1
-        options = wrap_dict(options) if options else {}
+        options = options or {}
 
         reset_args = create_gymnasium_message(reset_args=(seed, options))
 
 
         old_msg = self.communicator.receive_message()  # 1
+        if old_msg is not None and old_msg.HasField("step_return"):
+            # Its info may be the first one with a new schema, which later ones won't carry again
+            self.info_decoder.decode(old_msg.step_return.info)
 
         # obs = decode(msg.step_return.obs)
         # reward = msg.step_return.reward
@@ -38,77 +74,160 @@ class ServerEnv(gym.Env):
         self.communicator.send_message(reset_args)  # 2
 
         msg = self.communicator.receive_message()  # 1
-        obs = decode(msg.step_return.obs)
-        info = unwrap_dict(msg.step_return.info)
+        if msg is None:
+            obs, info = copy_value(self.communicator.frame["obs"]), {}
+        else:
+            obs = copy_value(unpack_value(self.obs_layout, self.obs_decoder.decode(msg.step_return.obs)))
+            info = self.info_decoder.decode(msg.step_return.info)
 
         self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))  # 2
 
         return obs, info
 
-    def step(self, action: np.ndarray | int):
-        action_msg = create_gymnasium_message(action=action)
-
+    def receive_request(self):
+        """Wait for the backend's next decision request, and return the step result it carries."""
         msg = self.communicator.receive_message()  # 1
 
-        obs = decode(msg.step_return.obs)
-        reward = msg.step_return.reward
-        terminated = msg.step_return.terminated
-        truncated = msg.step_return.truncated
-        info = unwrap_dict(msg.step_return.info)
+        if msg is None:
+            frame = self.communicator.frame
+            obs = copy_value(frame["obs"])
+            reward = float(frame["reward"])
+            terminated = bool(frame["terminated"])
+            truncated = bool(frame["truncated"])
+            info = {}
+        else:
+            obs = copy_value(unpack_value(self.obs_layout, self.obs_decoder.decode(msg.step_return.obs)))
+            reward = msg.step_return.reward
+            terminated = msg.step_return.terminated
+            truncated = msg.step_return.truncated
+            info = self.info_decoder.decode(msg.step_return.info)
+        return obs, reward, terminated, truncated, info
 
-        self.communicator.send_message(action_msg)  # 2
+    def send_action(self, action: np.ndarray | int):
+        """Answer the decision request taken with `receive_request`."""
+        if self.communicator.frame is not None:
+            self.communicator.send_frame(action=action)  # 2
+        else:
+            self.communicator.send_message(create_gymnasium_message(action=pack_value(self.action_layout, action)))  # 2
 
-        return obs, reward, terminated, truncated, info
+    def step(self, action: np.ndarray | int):
+        start = profiling.enabled and time.perf_counter_ns()
+        result = self.receive_request()
+        self.send_action(action)
+        if start:
+            profiling.record("step", start)
+        return result
 
     def close(self):
+        # The backend always has a step return on the way, take it before telling it to stop
+        self.communicator.receive_message()
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(close=True))
         self.communicator.close()
 
 
 class ClientEnv:  # (gym.Env)
-    def __init__(self, port: int = 50051):
+    """
+    Steps an env hosted by a ServerBackend.
+
+    The backend can be asked to do more per round trip: repeat each action `action_repeat` times, summing the
+    rewards and, with `max_pool`, taking the elementwise max of the last two observations (as for Atari frame
+    skipping), and with `autoreset`, reset as soon as an episode ends and return the first observation of the next
+    one, with the final observation and info under `final_obs` and `final_info` in the info. With
+    `obs_compression` naming one of `ferry.compression.COMPRESSORS`, it sends observations as compressed deltas
+    against the previous one, with a keyframe every `keyframe_interval`, which pays off on slow links. With
+    `preprocess`, a list of `ferry.preprocessing` steps such as `["grayscale", "resize:84x84", "stack:4"]`, it
+    processes observations before sending them, or declines a chain that doesn't fit them, which raises a
+    ValueError. The attributes of the same names hold what the backend agreed to.
+
+    Observations are copied out of the channel, whether they came in a raw frame or a message, so they're always
+    writable and stay valid after the next step.
+    """
+    def __init__(self, port: int = 50051, frames: bool = True, name: str = "ferry", transport: str = "mmap",
+                 host: str = "localhost", action_repeat: int = 1, max_pool: bool = False, autoreset: bool = False,
+                 obs_compression: Optional[str] = None, keyframe_interval: int = 100,
+                 preprocess: Optional[list[str]] = None):
         self.port = port
-        self.communicator = Communicator("ferry", create=False)
-
-
-        self.communicator.receive_message()
-        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))
-        self.communicator.receive_message()
+        self.communicator = make_communicator(transport, name, create=False, host=host, port=port)
+        self.info_decoder = InfoDecoder()
+
+        offer = self.communicator.receive_message().handshake
+        # Preprocessed observations may fit in a frame even if the env's own don't, the backend decides
+        reply = gym_ferry_pb2.Handshake(frames=frames and (offer.frames or bool(preprocess)),
+                                        action_repeat=action_repeat, max_pool=max_pool, autoreset=autoreset,
+                                        obs_compression=obs_compression or "", keyframe_interval=keyframe_interval,
+                                        preprocess=preprocess or [])
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(handshake=reply))
+        handshake = self.communicator.receive_message().handshake
+        self.communicator.set_layout(accepted_layout(handshake))
+        self.obs_layout, self.action_layout = space_layouts(handshake)
+        self.action_repeat = max(handshake.action_repeat, 1)
+        self.max_pool = handshake.max_pool
+        self.autoreset = handshake.autoreset
+        self.obs_compression = handshake.obs_compression or None
+        self.preprocess = list(handshake.preprocess)
+        self.obs_decoder = ObsDecoder()
+        if preprocess and not self.preprocess:
+            self.close()
+            raise ValueError(f"The backend declined the preprocessing {preprocess} for its observations")
         print(f"Environment starting on port {port}")
 
-
-
-    def reset(self, seed=None, options=None):
+    def reset_async(self, seed=None, options=None):
+        """Send a reset request without waiting for the result."""
         seed = seed if seed is not None else -1
-        options = wrap_dict(options) if options else {}
+        options = options or {}
 
         reset_msg = create_gymnasium_message(reset_args=(seed, options))
         self.communicator.send_message(reset_msg)
 
+    def reset_wait(self):
+        """Receive the result of the last `reset_async`."""
+        return self._reset_result(self.communicator.receive_message())
 
-        response = self.communicator.receive_message()
-
+    def _reset_result(self, response: gym_ferry_pb2.GymnasiumMessage):
         if response.HasField("step_return"):
-            obs = decode(response.step_return.obs)
-            info = unwrap_dict(response.step_return.info)
+            obs = copy_value(unpack_value(self.obs_layout, self.obs_decoder.decode(response.step_return.obs)))
+            info = self.info_decoder.decode(response.step_return.info)
             return obs, info
 
-    def step(self, action: np.ndarray | int):
-        """Send an action to the server and receive a response."""
-        if isinstance(action, int):
-            action = np.array([action], dtype=int)
-        action_msg = create_gymnasium_message(action=action)
-
-        self.communicator.send_message(action_msg)
-        response = self.communicator.receive_message()
+    def reset(self, seed=None, options=None):
+        self.reset_async(seed=seed, options=options)
+        return self.reset_wait()
+
+    def step_async(self, action: np.ndarray | int):
+        """Send an action to the server without waiting for the result."""
+        if self.communicator.frame is not None:
+            self.communicator.send_frame(action=action)
+        else:
+            self.communicator.send_message(create_gymnasium_message(action=pack_value(self.action_layout, action)))
+
+    def step_wait(self):
+        """Receive the result of the last `step_async`."""
+        return self._step_result(self.communicator.receive_message())
+
+    def _step_result(self, response: Optional[gym_ferry_pb2.GymnasiumMessage]):
+        if response is None:
+            frame = self.communicator.frame
+            return (copy_value(frame["obs"]), float(frame["reward"]), bool(frame["terminated"]),
+                    bool(frame["truncated"]), {})
 
         if response.HasField("step_return"):
-            obs = decode(response.step_return.obs)
+            obs = copy_value(unpack_value(self.obs_layout, self.obs_decoder.decode(response.step_return.obs)))
             reward = response.step_return.reward
             terminated = response.step_return.terminated
             truncated = response.step_return.truncated
-            info = unwrap_dict(response.step_return.info)
+            info = self.info_decoder.decode(response.step_return.info)
             return obs, reward, terminated, truncated, info
 
+    def step(self, action: np.ndarray | int):
+        """Send an action to the server and receive a response."""
+        start = profiling.enabled and time.perf_counter_ns()
+        self.step_async(action)
+        result = self.step_wait()
+        if start:
+            profiling.record("step", start)
+        return result
+
     def close(self):
         close_msg = gym_ferry_pb2.GymnasiumMessage(close=True)
         self.communicator.send_message(close_msg)
+        self.communicator.close()
@@ -0,0 +1,141 @@
+"""
+A policy server for the ServerEnv paradigm that answers many ClientBackends at once, so that a single forward pass
+of the policy serves every env that is waiting for a decision.
+
+    server = PolicyServer(16, max_batch=16, max_wait=2e-3)
+    server.reset()
+    while True:
+        ids, obs, rewards, terminated, truncated, infos = server.receive()
+        server.respond(ids, policy(obs))
+
+with the clients running `ClientBackend(env_id, name=f"ferry_{i}")`.
+"""
+
+from __future__ import annotations
+
+import select
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from ferry import profiling
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.layout import SpaceLayout
+from ferry.mmap_envs import ServerEnv
+
+
+def _stack(layout: Optional[SpaceLayout], values: list[Any]) -> Any:
+    """Stack observations along a new first axis, keeping the nested structure of composite ones."""
+    if layout is not None and layout.composite:
+        return layout.unpack(np.stack([layout.pack(value) for value in values]), (len(values),))
+    return np.stack(values)
+
+
+def _take(values: Any, i: int) -> Any:
+    """Item `i` of a batch of (possibly nested) values."""
+    if isinstance(values, dict):
+        return {key: _take(value, i) for key, value in values.items()}
+    elif isinstance(values, tuple):
+        return tuple(_take(value, i) for value in values)
+    return values[i]
+
+
+class PolicyServer:
+    """
+    Serves decisions to `num_clients` ClientBackends, client `i` attaching to the channel `{name}_{i}` (and port
+    `port + i` over "tcp"). Clients are waited for in order when the server starts.
+
+    Each client is a ServerEnv asking its backend for autoreset, so after the initial `reset`, episodes roll over
+    on the clients, with the final observation and info under `final_obs` and `final_info`. The other execution
+    options, and `hugepages`, are passed on to every ServerEnv.
+
+    `receive` collects the pending decision requests: it returns as soon as `max_batch` clients are waiting, or
+    `max_wait` seconds after the first one came in. `respond` then sends back an action for each of them, in
+    the same order. Requests that aren't answered yet are left out of later batches.
+    """
+    def __init__(self, num_clients: int, name: str = "ferry", transport: str = "mmap", wait: str = "block",
+                 host: str = "localhost", port: int = 5005, max_batch: Optional[int] = None, max_wait: float = 1e-3,
+                 frames: bool = True, action_repeat: int = 1, max_pool: bool = False,
+                 obs_compression: Optional[str] = None, keyframe_interval: int = 100,
+                 preprocess: Optional[list[str]] = None, hugepages: bool = False):
+        self.envs = [ServerEnv(port=port + i, frames=frames, name=f"{name}_{i}", wait=wait, transport=transport,
+                               host=host, action_repeat=action_repeat, max_pool=max_pool, autoreset=True,
+                               obs_compression=obs_compression, keyframe_interval=keyframe_interval,
+                               preprocess=preprocess, hugepages=hugepages)
+                     for i in range(num_clients)]
+        self.num_clients = num_clients
+        self.max_batch = max_batch or num_clients
+        self.max_wait = max_wait
+        self.obs_layout = self.envs[0].obs_layout
+        # Whether the channels have file descriptors to block on, rather than flags to poll
+        self.fds = [env.communicator.fileno() for env in self.envs]
+        self.pending = np.zeros(num_clients, dtype=bool)
+        self._next = 0
+
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        """Reset every client's env, client `i` with `seed + i`. Their first requests then come through `receive`."""
+        assert not self.pending.any(), "Answer the pending requests before resetting."
+        for i, env in enumerate(self.envs):
+            env.reset(seed=seed + i if seed is not None else None, options=options)
+
+    def _ready(self) -> list[int]:
+        """Clients with a request waiting that isn't taken yet, starting after the last one taken, for fairness."""
+        order = [(self._next + k) % self.num_clients for k in range(self.num_clients)]
+        return [i for i in order if not self.pending[i] and self.envs[i].communicator.poll()]
+
+    def _wait(self, deadline: Optional[float]):
+        """Wait until a new request might have come in, or until the deadline."""
+        timeout = max(deadline - time.perf_counter(), 0.) if deadline is not None else None
+        if all(fd is not None for fd in self.fds):
+            waiting = [i for i in range(self.num_clients) if not self.pending[i]]
+            readable, _, _ = select.select([self.fds[i] for i in waiting], [], [], timeout)
+            for i in waiting:
+                if self.fds[i] in readable:
+                    self.envs[i].communicator.clear_wakeups()
+        else:
+            time.sleep(min(timeout, 1e-5) if timeout is not None else 0)
+
+    def receive(self) -> tuple[np.ndarray, Any, np.ndarray, np.ndarray, np.ndarray, list[dict]]:
+        """
+        Wait for a batch of decision requests, and return the ids of the clients that sent them, and their stacked
+        observations, rewards, terminated and truncated flags, and the list of their infos.
+        """
+        start = profiling.enabled and time.perf_counter_ns()
+        ids, deadline = [], None
+        while True:
+            ids += self._ready()[:self.max_batch - len(ids)]
+            self.pending[ids] = True
+            # Once every client has a request taken, no more can come in
+            full = len(ids) >= self.max_batch or self.pending.all()
+            if ids and (full or deadline is not None and time.perf_counter() >= deadline):
+                break
+            assert not self.pending.all(), "Every client has a pending request, answer some first."
+            if ids and deadline is None:
+                deadline = time.perf_counter() + self.max_wait
+            self._wait(deadline)
+        if start:
+            profiling.record("gather", start)
+        self._next = (ids[-1] + 1) % self.num_clients
+
+        observations, rewards, terminated, truncated, infos = zip(*(self.envs[i].receive_request() for i in ids))
+        return (np.array(ids), _stack(self.obs_layout, list(observations)), np.array(rewards, dtype=np.float64),
+                np.array(terminated, dtype=bool), np.array(truncated, dtype=bool), list(infos))
+
+    def respond(self, ids: np.ndarray, actions: Any):
+        """Send each client in `ids` its action from the batch `actions`, which may be a dict or tuple of batches."""
+        for k, i in enumerate(ids):
+            assert self.pending[i], f"Client {i} has no pending request."
+            self.envs[i].send_action(_take(actions, k))
+            self.pending[i] = False
+
+    def close(self):
+        """Tell every client to stop."""
+        for i, env in enumerate(self.envs):
+            if self.pending[i]:
+                # Its request was already taken, so there's nothing to receive before telling it to stop
+                env.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(close=True))
+                env.communicator.close()
+            else:
+                env.close()
+        self.pending[:] = False
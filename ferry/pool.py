@@ -0,0 +1,281 @@
+"""
+A daemon keeping warm envs ready to be handed out, so that starting an episode costs a channel attach rather than
+making the env.
+
+Each worker process makes the env once, resets it, and offers it on a fresh data channel. Clients ask the pool for one
+over its control channel, get a Lease naming that data channel, and attach to it with a ClientEnv. When the client
+closes the env, the worker resets it and offers it again on a new channel. If the client dies without closing it,
+the pool replaces the worker. Run one with
+
+    python -m ferry.pool --env_id CartPole-v1 --size 8
+
+and lease envs with `make_pooled_env()`.
+"""
+
+import contextlib
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import threading
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+import gymnasium as gym
+from typarse import BaseParser
+
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.mmap_backends import ServerBackend
+from ferry.mmap_envs import ClientEnv
+from ferry.shm import channel_path
+
+
+def _send(sock: socket.socket, msg: gym_ferry_pb2.GymnasiumMessage):
+    data = msg.SerializeToString()
+    sock.sendall(len(data).to_bytes(4, byteorder='little') + data)
+
+
+def _receive(sock: socket.socket) -> Optional[gym_ferry_pb2.GymnasiumMessage]:
+    """Read one length-prefixed message, or None if the other side hung up first."""
+    with sock.makefile("rb") as file:
+        header = file.read(4)
+        if len(header) < 4:
+            return None
+        data = file.read(int.from_bytes(header, byteorder='little'))
+    return gym_ferry_pb2.GymnasiumMessage.FromString(data)
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _control_address(name: str, host: str, port: Optional[int]) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    if port is None:
+        return socket.AF_UNIX, channel_path(f"{name}.pool")
+    return socket.AF_INET, (host, port)
+
+
+def _run_worker(env_id: str, env_kwargs: dict, name: str, transport: str, wait: str, host: str,
+                port: Optional[int], ready: multiprocessing.Queue):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        env = gym.make(env_id, **env_kwargs)
+        for lease in itertools.count():
+            env.reset()
+            # The pid keeps the names unique across pools and sessions on the same host
+            channel = f"{name}_{os.getpid()}_{lease}"
+            ready.put((os.getpid(), gym_ferry_pb2.Lease(name=channel, transport=transport,
+                                                        port=port or 0).SerializeToString()))
+            ServerBackend(env_id, port=port, name=channel, wait=wait, transport=transport, host=host,
+                          envs=[env]).run()
+
+
+class _LeaseHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        msg = _receive(self.request)
+        # A request is a Lease carrying the client's pid, or a bare request from a client that doesn't send one
+        if msg is not None and (msg.HasField("request") or msg.HasField("lease")):
+            worker, lease = self.server.pool.take_lease()
+            _send(self.request, gym_ferry_pb2.GymnasiumMessage(lease=lease))
+            if msg.HasField("lease") and msg.lease.pid:
+                self.server.pool.track_lease(worker, lease, msg.lease.pid)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class EnvPool:
+    """
+    Keeps `size` made and reset copies of an env in worker processes, and hands them out over a control channel.
+
+    The control channel is a Unix socket at `{CHANNEL_DIR}/{name}.pool`, or a TCP socket on `host:port` if `port`
+    is given. Requests wait until a worker is free. Data channels use `transport`; over "tcp", worker `i` listens on
+    `port + 1 + i`. Idle workers wait for a client to attach, so `wait` defaults to "block" to keep them off the CPU.
+
+    Workers that die are replaced, and the leases they had queued are dropped. Over sockets, a worker dies when its
+    client disconnects. Over shared memory, it would wait for its client forever, so the pool checks on the clients
+    of its leases every `watch_interval`, and replaces a worker whose client died with its data channel still open.
+    """
+    def __init__(self, env_id: str, size: int = 4, env_kwargs: dict = {}, name: str = "ferry_pool",
+                 transport: str = "mmap", wait: str = "block", host: str = "localhost", port: Optional[int] = None):
+        assert transport != "tcp" or port is not None, "A tcp pool needs a port, its workers listen on the next ones."
+        self.env_id = env_id
+        self.env_kwargs = env_kwargs
+        self.name = name
+        self.transport = transport
+        self.wait = wait
+        self.host = host
+        self.port = port
+
+        self.ready = multiprocessing.Queue()
+        self.workers = [self._spawn(i) for i in range(size)]
+        # Leases handed out to clients that sent their pid: worker pid -> (data channel, client pid, seen dead)
+        self.leases: Dict[int, Tuple[str, int, bool]] = {}
+        self.lock = threading.Lock()
+
+        family, address = _control_address(name, host, port)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = _UnixServer(address, _LeaseHandler)
+        else:
+            self.server = _TCPServer(address, _LeaseHandler)
+        self.server.pool = self
+        self.address = address
+
+        self.closed = threading.Event()
+        self._threads = []
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        port = self.port + 1 + index if self.transport == "tcp" else None
+        worker = multiprocessing.Process(target=_run_worker,
+                                         args=(self.env_id, self.env_kwargs, self.name, self.transport, self.wait,
+                                               self.host, port, self.ready),
+                                         daemon=True)
+        worker.start()
+        return worker
+
+    def _cleanup(self, worker: multiprocessing.Process):
+        """Remove the channel files a worker left behind."""
+        for path in glob.glob(channel_path(f"{self.name}_{worker.pid}_*")):
+            os.remove(path)
+
+    def _alive(self, pid: int) -> bool:
+        return any(worker.pid == pid and worker.is_alive() for worker in self.workers)
+
+    def take_lease(self) -> Tuple[int, gym_ferry_pb2.Lease]:
+        """Wait for a free worker, skipping the leases of workers that died since, and return its pid and lease."""
+        while True:
+            pid, lease = self.ready.get()
+            if self._alive(pid):
+                return pid, gym_ferry_pb2.Lease.FromString(lease)
+
+    def track_lease(self, worker: int, lease: gym_ferry_pb2.Lease, client: int):
+        """Watch for the client of a lease to die while it still holds the env."""
+        with self.lock:
+            self.leases[worker] = (lease.name, client, False)
+
+    def _abandoned(self) -> List[int]:
+        """
+        Workers whose client died with their data channel still open, for two checks in a row, so that a client that
+        closed its env just before exiting isn't mistaken for one. Leases whose channel is gone are finished.
+        """
+        abandoned = []
+        with self.lock:
+            for worker, (channel, client, seen_dead) in list(self.leases.items()):
+                if not os.path.exists(channel_path(channel)):
+                    del self.leases[worker]
+                elif not _process_exists(client):
+                    if seen_dead:
+                        abandoned.append(worker)
+                        del self.leases[worker]
+                    else:
+                        self.leases[worker] = (channel, client, True)
+        return abandoned
+
+    def _watch(self, interval: float):
+        while not self.closed.wait(interval):
+            abandoned = self._abandoned()
+            for i, worker in enumerate(self.workers):
+                if worker.pid in abandoned:
+                    worker.terminate()
+                    worker.join()
+                if not worker.is_alive():
+                    self._cleanup(worker)
+                    self.workers[i] = self._spawn(i)
+
+    def start(self, watch_interval: float = 1.) -> "EnvPool":
+        """Serve requests and replace dead workers from background threads."""
+        self._threads = [threading.Thread(target=self.server.serve_forever, daemon=True),
+                         threading.Thread(target=self._watch, args=(watch_interval,), daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        self.closed.set()
+        if self._threads:
+            self.server.shutdown()
+            for thread in self._threads:
+                thread.join()
+        self.server.server_close()
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+            self._cleanup(worker)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def __enter__(self) -> "EnvPool":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def request_lease(name: str = "ferry_pool", host: str = "localhost",
+                  port: Optional[int] = None) -> gym_ferry_pb2.Lease:
+    """Ask a pool for a warm env, waiting until one is free."""
+    family, address = _control_address(name, host, port)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.connect(address)
+        _send(sock, gym_ferry_pb2.GymnasiumMessage(lease=gym_ferry_pb2.Lease(pid=os.getpid())))
+        msg = _receive(sock)
+    assert msg is not None and msg.HasField("lease"), f"The pool {name} hung up without a lease."
+    return msg.lease
+
+
+def make_pooled_env(name: str = "ferry_pool", host: str = "localhost", port: Optional[int] = None,
+                    frames: bool = True, env_class: Type[ClientEnv] = ClientEnv) -> ClientEnv:
+    """Lease a warm env from a pool and attach to it. Closing the env hands it back to the pool."""
+    lease = request_lease(name, host, port)
+    return env_class(port=lease.port, frames=frames, name=lease.name, transport=lease.transport, host=host)
+
+
+class Parser(BaseParser):
+    env_id: str
+    size: int = 4
+    env_kwargs: Optional[str]
+    name: str = "ferry_pool"
+    transport: str = "mmap"
+    wait: str = "block"
+    host: str = "localhost"
+    port: Optional[int]
+
+    _help = {
+        "env_id": "Gymnasium id of the env to serve",
+        "size": "Number of warm envs to keep",
+        "env_kwargs": "Keyword arguments for gym.make, as JSON",
+        "name": "Name of the control channel, and prefix of the data channels",
+        "transport": "Transport of the data channels",
+        "wait": "Wait strategy of the data channels on shared memory transports",
+        "host": "Host to listen on, with a port",
+        "port": "Port of the control channel, over TCP. Without one, it's a Unix socket",
+    }
+
+
+if __name__ == "__main__":
+    args = Parser()
+    env_kwargs = json.loads(args.env_kwargs) if args.env_kwargs else {}
+    with EnvPool(args.env_id, args.size, env_kwargs, name=args.name, transport=args.transport, wait=args.wait,
+                 host=args.host, port=args.port) as pool:
+        print(f"Serving {args.size} x {args.env_id} on {pool.address}")
+        signal.signal(signal.SIGTERM, lambda *_: pool.closed.set())
+        try:
+            pool.closed.wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,150 @@
+"""
+Observation preprocessing applied by the backend before sending, so that only what the trainer keeps crosses the
+channel. A chain is a list of steps, applied in order:
+
+    "grayscale"     weighted sum of the RGB channels in the last axis, which is dropped
+    "resize:HxW"    bilinear resize of the first two axes to H by W
+    "uint8"         cast to uint8, scaling by 255 first if the space is within [0, 1]
+    "stack:K"       stack the last K observations along a new first axis, oldest first
+
+e.g. `ClientEnv(preprocess=["grayscale", "resize:84x84", "uint8", "stack:4"])` for Atari-style pixels.
+"""
+
+from __future__ import annotations
+
+from typing import Callable
+
+import gymnasium as gym
+import numpy as np
+
+GRAYSCALE_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _cast(array: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """Cast the float result of a step back to the input's dtype, rounding for integers."""
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return np.clip(np.rint(array), info.min, info.max).astype(dtype)
+    return array.astype(dtype, copy=False)
+
+
+def _grayscale(space: gym.spaces.Box) -> tuple[Callable[[np.ndarray], np.ndarray], gym.spaces.Box]:
+    if space.shape[-1] != 3:
+        raise ValueError(f"grayscale needs RGB observations in the last axis, got shape {space.shape}")
+    dtype = space.dtype
+
+    def apply(obs: np.ndarray) -> np.ndarray:
+        return _cast(np.dot(obs, GRAYSCALE_WEIGHTS), dtype)
+
+    low, high = apply(space.low), apply(space.high)
+    return apply, gym.spaces.Box(low, high, dtype=dtype)
+
+
+def _resize(space: gym.spaces.Box, arg: str) -> tuple[Callable[[np.ndarray], np.ndarray], gym.spaces.Box]:
+    height, width = (int(x) for x in arg.split("x"))
+    if len(space.shape) < 2:
+        raise ValueError(f"resize needs at least two axes, got shape {space.shape}")
+    dtype = space.dtype
+
+    # Source coordinates of every output row and column, with pixel centers aligned, and their interpolation weights
+    def axis(size: int, new_size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        coords = np.clip((np.arange(new_size) + 0.5) * size / new_size - 0.5, 0, size - 1)
+        lower = np.floor(coords).astype(np.intp)
+        upper = np.minimum(lower + 1, size - 1)
+        return lower, upper, (coords - lower).astype(np.float32)
+
+    rows, cols = axis(space.shape[0], height), axis(space.shape[1], width)
+    extra = (1,) * (len(space.shape) - 2)
+    row_weight = rows[2].reshape((height, 1) + extra)
+    col_weight = cols[2].reshape((1, width) + extra)
+
+    def apply(obs: np.ndarray) -> np.ndarray:
+        obs = obs.astype(np.float32, copy=False)
+        obs = obs[rows[0]] * (1 - row_weight) + obs[rows[1]] * row_weight
+        obs = obs[:, cols[0]] * (1 - col_weight) + obs[:, cols[1]] * col_weight
+        return _cast(obs, dtype)
+
+    low = np.full((height, width) + space.shape[2:], space.low.min(), dtype=dtype)
+    high = np.full((height, width) + space.shape[2:], space.high.max(), dtype=dtype)
+    return apply, gym.spaces.Box(low, high, dtype=dtype)
+
+
+def _uint8(space: gym.spaces.Box) -> tuple[Callable[[np.ndarray], np.ndarray], gym.spaces.Box]:
+    scale = 255. if np.issubdtype(space.dtype, np.floating) and space.high.max() <= 1 else 1.
+
+    def apply(obs: np.ndarray) -> np.ndarray:
+        if scale != 1.:
+            obs = obs * scale
+        return np.clip(obs, 0, 255).astype(np.uint8)
+
+    return apply, gym.spaces.Box(apply(space.low), apply(space.high), dtype=np.uint8)
+
+
+class FrameStack:
+    """
+    The last `count` observations, oldest first, in a preallocated ring. Each observation is written twice,
+    `count` slots apart, so that the stack is always a contiguous view of the ring and never needs to be gathered.
+    The view is only valid until the next `push` or `reset`.
+    """
+    def __init__(self, count: int, shape: tuple[int, ...], dtype: np.dtype):
+        self.count = count
+        self.ring = np.zeros((2 * count,) + shape, dtype=dtype)
+        self.position = count - 1
+
+    def reset(self, obs: np.ndarray) -> np.ndarray:
+        self.ring[...] = obs
+        self.position = self.count - 1
+        return self.ring[:self.count]
+
+    def push(self, obs: np.ndarray) -> np.ndarray:
+        self.position = (self.position + 1) % self.count
+        self.ring[self.position] = obs
+        self.ring[self.position + self.count] = obs
+        return self.ring[self.position + 1:self.position + 1 + self.count]
+
+
+class Preprocessing:
+    """A chain of preprocessing steps for Box observations, and the observation space it produces."""
+    def __init__(self, steps: list[str], observation_space: gym.Space):
+        if not isinstance(observation_space, gym.spaces.Box):
+            raise ValueError(f"Preprocessing needs a Box observation space, got {observation_space}")
+        self.steps = list(steps)
+        self.transforms = []
+        self.stack = None
+
+        space = observation_space
+        for i, step in enumerate(self.steps):
+            name, _, arg = step.partition(":")
+            if name == "grayscale":
+                transform, space = _grayscale(space)
+            elif name == "resize":
+                transform, space = _resize(space, arg)
+            elif name == "uint8":
+                transform, space = _uint8(space)
+            elif name == "stack" and i == len(self.steps) - 1:
+                self.stack = FrameStack(int(arg), space.shape, space.dtype)
+                space = gym.spaces.Box(np.repeat(space.low[None], int(arg), axis=0),
+                                       np.repeat(space.high[None], int(arg), axis=0), dtype=space.dtype)
+                continue
+            elif name == "stack":
+                raise ValueError("stack must be the last preprocessing step")
+            else:
+                raise ValueError(f"Unknown preprocessing step {step!r}")
+            self.transforms.append(transform)
+        self.observation_space = space
+
+    def _transform(self, obs: np.ndarray) -> np.ndarray:
+        obs = np.asarray(obs)
+        for transform in self.transforms:
+            obs = transform(obs)
+        return obs
+
+    def reset(self, obs: np.ndarray) -> np.ndarray:
+        """Process the first observation of an episode, filling the frame stack with it."""
+        obs = self._transform(obs)
+        return self.stack.reset(obs) if self.stack is not None else obs
+
+    def __call__(self, obs: np.ndarray) -> np.ndarray:
+        """Process the next observation of the episode."""
+        obs = self._transform(obs)
+        return self.stack.push(obs) if self.stack is not None else obs
@@ -0,0 +1,127 @@
+"""
+Optional timing of the hot path, split into phases (serialization, waiting for the other side, copies, the env's
+own step, ...). Each process keeps its own statistics. Instrumented code reads
+
+    start = profiling.enabled and time.perf_counter_ns()
+    ...
+    if start:
+        profiling.record("phase", start, nbytes)
+
+so when profiling is off, all it costs is a check of `enabled`. Phases may nest, e.g. `encode` is part of
+`build_message`. Setting the environment variable FERRY_PROFILE enables it at import, and FERRY_PROFILE_DUMP
+dumps the statistics to stderr every that many seconds, which is handy for backends running in subprocesses.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from typing import Optional, TextIO
+
+enabled = False
+
+# Durations are bucketed by their bit length in nanoseconds, i.e. power of two ranges
+BUCKETS = 64
+
+
+class Histogram:
+    """Counts of durations in power of two buckets, along with the bytes moved in the phase."""
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.bytes = 0
+
+    def add(self, ns: int, nbytes: int = 0):
+        self.buckets[min(ns.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        self.max_ns = max(self.max_ns, ns)
+        self.bytes += nbytes
+
+    def percentile(self, q: float) -> int:
+        """Upper bound of the bucket holding the q-th percentile, in nanoseconds."""
+        rank = q / 100 * self.count
+        seen = 0
+        for bit_length, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(1 << bit_length, self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": self.total_ns / 1e9,
+            "mean_us": self.total_ns / self.count / 1e3 if self.count else 0.,
+            "p50_us": self.percentile(50) / 1e3,
+            "p99_us": self.percentile(99) / 1e3,
+            "max_us": self.max_ns / 1e3,
+            "bytes": self.bytes,
+        }
+
+
+_histograms: dict[str, Histogram] = {}
+_dumper: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def record(phase: str, start_ns: int, nbytes: int = 0):
+    """Record the time since `start_ns` (from `time.perf_counter_ns`) under `phase`."""
+    elapsed = time.perf_counter_ns() - start_ns
+    histogram = _histograms.get(phase)
+    if histogram is None:
+        histogram = _histograms[phase] = Histogram()
+    histogram.add(elapsed, nbytes)
+
+
+def stats() -> dict[str, dict]:
+    """Summary of every phase recorded so far in this process."""
+    # A snapshot, since the hot path may add a phase while the dump thread walks them
+    return {phase: histogram.summary() for phase, histogram in list(_histograms.items())}
+
+
+def reset():
+    _histograms.clear()
+
+
+def dump(file: TextIO = sys.stderr):
+    """Print the statistics as a table."""
+    print(f"[ferry {os.getpid()}] {'phase':>14} {'count':>9} {'total s':>9} {'mean us':>9} {'p50 us':>9} "
+          f"{'p99 us':>9} {'max us':>9} {'MB':>9}", file=file)
+    for phase, s in sorted(stats().items()):
+        print(f"[ferry {os.getpid()}] {phase:>14} {s['count']:>9} {s['total_s']:>9.3f} {s['mean_us']:>9.1f} "
+              f"{s['p50_us']:>9.1f} {s['p99_us']:>9.1f} {s['max_us']:>9.1f} {s['bytes'] / 1e6:>9.1f}", file=file)
+    file.flush()
+
+
+def _dump_every(interval: float, file: TextIO):
+    while not _stop.wait(interval):
+        dump(file)
+
+
+def enable(dump_interval: Optional[float] = None, file: TextIO = sys.stderr):
+    """Start recording, and optionally dump the statistics to `file` every `dump_interval` seconds."""
+    global enabled, _dumper
+    enabled = True
+    if dump_interval and _dumper is None:
+        _stop.clear()
+        _dumper = threading.Thread(target=_dump_every, args=(dump_interval, file), daemon=True)
+        _dumper.start()
+
+
+def disable():
+    """Stop recording and dumping. The statistics are kept until `reset`."""
+    global enabled, _dumper
+    enabled = False
+    if _dumper is not None:
+        _stop.set()
+        _dumper.join()
+        _dumper = None
+
+
+if os.environ.get("FERRY_PROFILE"):
+    enable(float(os.environ.get("FERRY_PROFILE_DUMP", 0)) or None)
@@ -0,0 +1,249 @@
+"""
+Recording of every transition a backend steps through, for offline RL, and random access to them afterwards.
+
+A recording is a directory of raw memory-mapped column files, one row per observation:
+
+    meta.json        the specs of the observation and action spaces
+    obs.bin          the observation, packed with its SpaceLayout for Dict and Tuple spaces
+    action.bin       the action that led to it (zeros on the first row of an episode)
+    reward.bin       float64, the reward for that action
+    terminated.bin   bool
+    truncated.bin    bool
+    episodes.bin     int64 pairs (first row, number of rows) of every finished episode
+
+so that an episode of T steps takes T + 1 rows, starting with its reset. The columns are preallocated and grow by
+doubling, and an episode is only added to the index once it's fully written, so a reader can follow a recording
+that is still going on.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Optional
+
+import gymnasium as gym
+import numpy as np
+from google.protobuf import json_format
+
+from ferry import profiling
+from ferry.gym_grpc.gym_ferry_pb2 import ArraySpec
+from ferry.layout import SpaceLayout, space_spec, assign_value
+
+SCALAR_COLUMNS = {"reward": np.float64, "terminated": np.bool_, "truncated": np.bool_}
+
+
+def _row_format(layout: SpaceLayout) -> tuple[np.dtype, tuple[int, ...]]:
+    """Dtype and shape of one row of a space's column. Composite values are stored as their packed bytes."""
+    if layout.composite:
+        return np.dtype(np.uint8), (layout.nbytes,)
+    return np.dtype(layout.spec.dtype), tuple(layout.spec.shape)
+
+
+def _formats(obs_layout: SpaceLayout, action_layout: SpaceLayout) -> dict[str, tuple[np.dtype, tuple[int, ...]]]:
+    return {"obs": _row_format(obs_layout), "action": _row_format(action_layout),
+            **{name: (np.dtype(dtype), ()) for name, dtype in SCALAR_COLUMNS.items()}}
+
+
+def _write(column: np.memmap, layout: SpaceLayout, row: int, value: Any):
+    if layout.composite:
+        assign_value(layout.unpack(column[row]), value)
+    else:
+        column[row] = value
+
+
+def _spec(space: gym.Space, what: str) -> ArraySpec:
+    spec = space_spec(space)
+    if spec is None:
+        raise ValueError(f"Can't record the {what} space {space}, it has no fixed layout")
+    return spec
+
+
+class TrajectoryRecorder:
+    """Appends the transitions of a single env to a recording at `path`, which must not exist yet."""
+    def __init__(self, path: str, observation_space: gym.Space, action_space: gym.Space, capacity: int = 4096):
+        self.path = path
+        os.makedirs(path)
+        obs_spec, action_spec = _spec(observation_space, "observation"), _spec(action_space, "action")
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            json.dump({"obs": json_format.MessageToDict(obs_spec),
+                       "action": json_format.MessageToDict(action_spec)}, file)
+
+        self.obs_layout, self.action_layout = SpaceLayout(obs_spec), SpaceLayout(action_spec)
+        self.formats = _formats(self.obs_layout, self.action_layout)
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "wb+") for name in self.formats}
+        self.index = open(os.path.join(path, "episodes.bin"), "ab")
+
+        self.columns: dict[str, np.memmap] = {}
+        self.capacity = 0
+        self._grow(capacity)
+        self.rows = 0
+        self.episode_start: Optional[int] = None
+
+    def _grow(self, capacity: int):
+        self.columns = {}  # The old maps must go before the files are resized
+        for name, (dtype, shape) in self.formats.items():
+            file = self.files[name]
+            file.truncate(capacity * int(np.prod(shape, dtype=np.int64)) * dtype.itemsize)
+            self.columns[name] = np.memmap(file, dtype=dtype, mode="r+", shape=(capacity,) + shape)
+        self.capacity = capacity
+
+    def _append(self, obs: Any, action: Any, reward: float, terminated: bool, truncated: bool):
+        start = profiling.enabled and time.perf_counter_ns()
+        if self.rows == self.capacity:
+            self._grow(2 * self.capacity)
+        row = self.rows
+        _write(self.columns["obs"], self.obs_layout, row, obs)
+        if action is None:
+            self.columns["action"][row] = 0
+        else:
+            _write(self.columns["action"], self.action_layout, row, action)
+        self.columns["reward"][row] = reward
+        self.columns["terminated"][row] = terminated
+        self.columns["truncated"][row] = truncated
+        self.rows += 1
+        if start:
+            profiling.record("record", start)
+
+    def _end_episode(self):
+        if self.episode_start is not None:
+            self.index.write(np.array([self.episode_start, self.rows - self.episode_start], dtype=np.int64).tobytes())
+            self.index.flush()
+            self.episode_start = None
+
+    def reset(self, obs: Any):
+        """Start a new episode from its first observation. An unfinished previous one is cut short where it is."""
+        self._end_episode()
+        self.episode_start = self.rows
+        self._append(obs, None, 0., False, False)
+
+    def step(self, action: Any, obs: Any, reward: float, terminated: bool, truncated: bool):
+        """Record an action and what it led to, ending the episode if it's over."""
+        if self.episode_start is None:
+            return
+        self._append(obs, action, reward, terminated, truncated)
+        if terminated or truncated:
+            self._end_episode()
+
+    def close(self):
+        """Finish the current episode, and trim the columns to the rows actually written."""
+        self._end_episode()
+        for column in self.columns.values():
+            column.flush()
+        self.columns = {}
+        for name, (dtype, shape) in self.formats.items():
+            self.files[name].truncate(self.rows * int(np.prod(shape, dtype=np.int64)) * dtype.itemsize)
+            self.files[name].close()
+        self.index.close()
+
+
+class _Recording:
+    """Read-only maps of one recording directory."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as file:
+            meta = json.load(file)
+        self.obs_layout = SpaceLayout(json_format.ParseDict(meta["obs"], ArraySpec()))
+        self.action_layout = SpaceLayout(json_format.ParseDict(meta["action"], ArraySpec()))
+        self.formats = _formats(self.obs_layout, self.action_layout)
+        self.columns: dict[str, np.memmap] = {}
+        self.episodes = np.zeros((0, 2), dtype=np.int64)
+        self.refresh()
+
+    def refresh(self):
+        episodes = np.fromfile(os.path.join(self.path, "episodes.bin"), dtype=np.int64)
+        self.episodes = episodes[:len(episodes) // 2 * 2].reshape(-1, 2)
+        rows = int(self.episodes[-1].sum()) if len(self.episodes) else 0
+        if rows == 0:
+            self.columns = {}
+            return
+        self.columns = {name: np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode="r",
+                                        shape=(rows,) + shape)
+                        for name, (dtype, shape) in self.formats.items()}
+
+    def take(self, rows: np.ndarray | slice) -> dict[str, Any]:
+        """Rows of every column. Slices give views into the files, index arrays only read the rows they pick."""
+        columns = {name: column[rows] for name, column in self.columns.items()}
+        batch = columns["reward"].shape
+        columns["obs"] = self.obs_layout.unpack(columns["obs"], batch)
+        columns["action"] = self.action_layout.unpack(columns["action"], batch)
+        return columns
+
+
+class TrajectoryReader:
+    """
+    Random access to one or more recordings, without loading them into memory.
+
+    `path` is either a recording, or a directory of them (as written by a batched ServerBackend). Only finished
+    episodes are visible; `refresh` picks up the ones finished since.
+    """
+    def __init__(self, path: str):
+        if os.path.exists(os.path.join(path, "meta.json")):
+            paths = [path]
+        else:
+            paths = sorted(os.path.join(path, entry) for entry in os.listdir(path)
+                           if os.path.exists(os.path.join(path, entry, "meta.json")))
+        self.recordings = [_Recording(p) for p in paths]
+        self.refresh()
+
+    def refresh(self):
+        for recording in self.recordings:
+            recording.refresh()
+        # Transitions are numbered across the episodes of every recording, an episode of n rows holding n - 1
+        self._sources = np.concatenate([np.full(len(r.episodes), i, dtype=np.int64)
+                                        for i, r in enumerate(self.recordings)] + [np.zeros(0, dtype=np.int64)])
+        episodes = np.concatenate([r.episodes for r in self.recordings] + [np.zeros((0, 2), dtype=np.int64)])
+        self._starts = episodes[:, 0]
+        self._transitions = episodes[:, 1] - 1
+        self._ends = np.cumsum(self._transitions)
+
+    def __len__(self) -> int:
+        """Number of transitions."""
+        return int(self._ends[-1]) if len(self._ends) else 0
+
+    @property
+    def num_episodes(self) -> int:
+        return len(self._starts)
+
+    def episode(self, i: int) -> dict[str, Any]:
+        """
+        All rows of an episode as views into the files: `obs` holds its T + 1 observations, and the other columns
+        what led to each of them, so their first row is empty.
+        """
+        start, length = int(self._starts[i]), int(self._transitions[i]) + 1
+        return self.recordings[self._sources[i]].take(slice(start, start + length))
+
+    def sample(self, batch_size: int, rng: Optional[np.random.Generator] = None) -> dict[str, Any]:
+        """
+        A minibatch of transitions picked uniformly at random, with keys obs, action, reward, next_obs, terminated
+        and truncated. Only the pages holding the picked rows are read. Raises a ValueError until an episode with
+        at least one transition has finished.
+        """
+        if len(self) == 0:
+            raise ValueError(f"No finished transitions to sample from in {[r.path for r in self.recordings]}, "
+                             f"call refresh once an episode has finished")
+        rng = rng if rng is not None else np.random.default_rng()
+        transitions = np.sort(rng.integers(len(self), size=batch_size))
+        episodes = np.searchsorted(self._ends, transitions, side="right")
+        # Transition k of an episode goes from its row k to its row k + 1
+        rows = self._starts[episodes] + 1 + transitions - (self._ends[episodes] - self._transitions[episodes])
+        sources = self._sources[episodes]
+
+        parts = []
+        for i in np.unique(sources):
+            recording, picked = self.recordings[i], rows[sources == i]
+            part = recording.take(picked)
+            part["next_obs"] = part.pop("obs")
+            part["obs"] = recording.obs_layout.unpack(recording.columns["obs"][picked - 1], (len(picked),))
+            parts.append(part)
+        return _concatenate(parts) if len(parts) > 1 else parts[0]
+
+
+def _concatenate(parts: list[Any]) -> Any:
+    """Concatenate (possibly nested) batches along their first dimension."""
+    if isinstance(parts[0], dict):
+        return {key: _concatenate([part[key] for part in parts]) for key in parts[0]}
+    elif isinstance(parts[0], tuple):
+        return tuple(_concatenate(list(items)) for items in zip(*parts))
+    return np.concatenate(parts)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import mmap
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+from ferry import profiling
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.layout import FrameLayout, assign_value
+from ferry.shm import channel_path, create_file, publish, prefault, wait_for
+from ferry.wait import WaitStrategy, make_wait_strategy, wait_strategy_from_kind
+
+# Header layout: the channel's wait strategy, the number of slots per ring and the size of a slot.
+# It's followed by two rings, one per direction, each with its head and tail counters on separate cache lines,
+# and its slots. A slot starts with the length of its payload and whether more chunks of the message follow.
+WAIT_KIND = 1
+SLOTS = slice(4, 8)
+SLOT_SIZE = slice(8, 16)
+RING_OFFSET = 64
+TAIL_OFFSET = 64
+SLOTS_OFFSET = 128
+SLOT_MORE = 4
+SLOT_PAYLOAD = 8
+FRAME_LENGTH = (0xFFFFFFFF).to_bytes(4, byteorder='little')
+
+
+class _Ring:
+    """Head and tail counters of one direction, and the offsets of its slots."""
+    def __init__(self, map: mmap.mmap, offset: int, slots: int, slot_size: int):
+        self.head = np.ndarray((), dtype=np.uint64, buffer=map, offset=offset)
+        self.tail = np.ndarray((), dtype=np.uint64, buffer=map, offset=offset + TAIL_OFFSET)
+        self.slots = slots
+        self.offsets = [offset + SLOTS_OFFSET + i * slot_size for i in range(slots)]
+
+
+class RingCommunicator:
+    """
+    A drop-in replacement for Communicator that queues messages in a ring of slots per direction,
+    instead of handing a single buffer back and forth.
+
+    Either side can post several messages (e.g. the next action, or a reset) while the other one is still busy,
+    and only waits when the ring is full. Each ring has a single producer, which is the only one moving its head,
+    and a single consumer, which is the only one moving its tail, so no locks are needed. This relies on stores to
+    the shared mapping becoming visible in program order, which holds on x86.
+
+    Messages larger than a slot are split over consecutive slots. A frame has to fit in one slot, and stays
+    readable through `self.frame` until the next `receive_message`.
+
+    Like Communicator, the rings are faulted in at creation, as transparent huge pages with `hugepages=True`.
+    """
+    def __init__(self, name: str, size: int = 1 << 20, create: bool = True, wait: str | WaitStrategy = "spin",
+                 slots: int = 8, hugepages: bool = False):
+        self.name = name
+        self.create = create
+
+        filename = channel_path(name)
+
+        if create:
+            slot_size = -(-(size // slots) // 64) * 64
+            size = RING_OFFSET + 2 * (SLOTS_OFFSET + slots * slot_size)
+            staging, self.file = create_file(filename, size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+            prefault(self.map, hugepages=hugepages)
+            self.map[SLOTS] = slots.to_bytes(4, byteorder='little')
+            self.map[SLOT_SIZE] = slot_size.to_bytes(8, byteorder='little')
+            self.waiter = make_wait_strategy(wait)
+            self.waiter.attach(name, create, 0x01)
+            self.map[WAIT_KIND] = self.waiter.kind
+            publish(staging, filename)
+        else:
+            wait_for(lambda: os.path.exists(filename))
+            self.file = open(filename, "r+b")
+            wait_for(lambda: os.fstat(self.file.fileno()).st_size > 0)
+            size = os.fstat(self.file.fileno()).st_size
+            self.map = mmap.mmap(self.file.fileno(), size)
+            wait_for(lambda: self.map[WAIT_KIND] != 0)
+            slots = int.from_bytes(self.map[SLOTS], byteorder='little')
+            slot_size = int.from_bytes(self.map[SLOT_SIZE], byteorder='little')
+            self.waiter = wait_strategy_from_kind(self.map[WAIT_KIND])
+            self.waiter.attach(name, create, 0x02)
+
+        self.size = size
+        self.slot_size = slot_size
+        rings = [_Ring(self.map, RING_OFFSET + i * (SLOTS_OFFSET + slots * slot_size), slots, slot_size)
+                 for i in range(2)]
+        self.outbox, self.inbox = rings if create else rings[::-1]
+        # Each side is the only writer of its outbox head and its inbox tail, so it keeps them locally too
+        self._head = int(self.outbox.head)
+        self._tail = int(self.inbox.tail)
+
+        self.frame_capacity = slot_size - SLOT_PAYLOAD
+        self.layout: Optional[FrameLayout] = None
+        self.frame: Optional[dict[str, np.ndarray]] = None
+        self._out_frames: list[dict[str, np.ndarray]] = []
+        self._in_frames: list[dict[str, np.ndarray]] = []
+        self._held = False
+
+    def set_layout(self, layout: Optional[FrameLayout]):
+        """Bind the views of a negotiated frame layout in every slot, or go back to protobuf-only steps with None."""
+        self.layout = layout
+        if layout is None:
+            self._out_frames, self._in_frames, self.frame = [], [], None
+            return
+        self._out_frames = [layout.bind(self.map, offset + SLOT_PAYLOAD) for offset in self.outbox.offsets]
+        self._in_frames = [layout.bind(self.map, offset + SLOT_PAYLOAD) for offset in self.inbox.offsets]
+        self.frame = self._in_frames[self._tail % self.inbox.slots]
+
+    def _claim(self) -> int:
+        """Wait for a free slot in the outbox, and return its index."""
+        start = profiling.enabled and time.perf_counter_ns()
+        head = self._head
+        self.waiter.wait_until(lambda: head - int(self.outbox.tail) < self.outbox.slots)
+        if start:
+            profiling.record("wait", start)
+        return head % self.outbox.slots
+
+    def _publish(self):
+        self._head += 1
+        self.outbox.head[...] = self._head
+        self.waiter.notify()
+
+    def send_message(self, msg: gym_ferry_pb2.GymnasiumMessage):
+        start = profiling.enabled and time.perf_counter_ns()
+        serialized_msg = memoryview(msg.SerializeToString())
+        if start:
+            profiling.record("serialize", start, len(serialized_msg))
+        chunk_size = self.slot_size - SLOT_PAYLOAD
+        for position in range(0, len(serialized_msg) or 1, chunk_size):
+            chunk = serialized_msg[position:position + chunk_size]
+            offset = self.outbox.offsets[self._claim()]
+            start = profiling.enabled and time.perf_counter_ns()
+            self.map[offset + SLOT_MORE] = position + chunk_size < len(serialized_msg)
+            self.map[offset:offset + 4] = len(chunk).to_bytes(4, byteorder='little')
+            self.map[offset + SLOT_PAYLOAD:offset + SLOT_PAYLOAD + len(chunk)] = chunk
+            if start:
+                profiling.record("send", start, len(chunk))
+            self._publish()
+
+    def send_frame(self, **values: np.ndarray | float | bool):
+        """Write step values directly into the frame views of the next free slot, skipping serialization."""
+        index = self._claim()
+        start = profiling.enabled and time.perf_counter_ns()
+        frame = self._out_frames[index]
+        for name, value in values.items():
+            assign_value(frame[name], value)
+        offset = self.outbox.offsets[index]
+        self.map[offset:offset + 4] = FRAME_LENGTH
+        if start:
+            profiling.record("send_frame", start, sum(self.layout.sizes[name] for name in values))
+        self._publish()
+
+    def _release(self):
+        self._tail += 1
+        self.inbox.tail[...] = self._tail
+        self.waiter.notify()
+
+    def _next(self) -> int:
+        """Wait for a message in the inbox, and return the offset of its slot."""
+        start = profiling.enabled and time.perf_counter_ns()
+        tail = self._tail
+        self.waiter.wait_until(lambda: int(self.inbox.head) != tail)
+        if start:
+            profiling.record("wait", start)
+        return self.inbox.offsets[tail % self.inbox.slots]
+
+    def poll(self) -> bool:
+        """Whether a message is waiting, so that `receive_message` wouldn't block."""
+        return int(self.inbox.head) > self._tail + self._held
+
+    def fileno(self) -> Optional[int]:
+        """A file descriptor that becomes readable when a message might be waiting, if the wait strategy has one."""
+        return self.waiter.fileno()
+
+    def clear_wakeups(self):
+        """Consume the notifications that made `fileno()` readable."""
+        self.waiter.clear()
+
+    def receive_message(self) -> Optional[gym_ferry_pb2.GymnasiumMessage]:
+        """Wait for the next message. Returns None if it was a raw frame, which can then be read from `self.frame`."""
+        if self._held:
+            self._release()
+            self._held = False
+
+        offset = self._next()
+        if self.map[offset:offset + 4] == FRAME_LENGTH:
+            # Keep the slot until the next receive, so that the frame views stay valid
+            self.frame = self._in_frames[self._tail % self.inbox.slots]
+            self._held = True
+            return None
+
+        start = profiling.enabled and time.perf_counter_ns()
+        chunks = []
+        while True:
+            msg_len = int.from_bytes(self.map[offset:offset + 4], byteorder='little')
+            chunks.append(self.map[offset + SLOT_PAYLOAD:offset + SLOT_PAYLOAD + msg_len])
+            more = self.map[offset + SLOT_MORE]
+            self._release()
+            if not more:
+                break
+            offset = self._next()
+        serialized_msg = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        if start:
+            profiling.record("receive", start, len(serialized_msg))
+
+        start = profiling.enabled and time.perf_counter_ns()
+        msg = gym_ferry_pb2.GymnasiumMessage()
+        msg.ParseFromString(serialized_msg)
+        if start:
+            profiling.record("parse", start, len(serialized_msg))
+        return msg
+
+    def close(self):
+        self.frame = None
+        self._out_frames = self._in_frames = []
+        # The rings' counters are views of the mapping, which can't be closed while they're around
+        self.outbox = self.inbox = None
+        self.waiter.close(remove=self.create)
+        self.map.close()
+        self.file.close()
+        if self.create:
+            os.remove(channel_path(self.name))
@@ -0,0 +1,77 @@
+"""
+Where channel files live, how the two sides of a channel meet, and how their pages and processes are placed.
+
+Channel files (mappings, wake-up pipes and Unix sockets) go to `CHANNEL_DIR`, which is `/dev/shm` when it exists,
+so that they're backed by shared memory instead of a possibly disk-backed `/tmp` with its page-cache writeback.
+Setting `FERRY_CHANNEL_DIR` overrides it; both sides of a channel must agree on it.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import mmap
+import os
+import time
+from typing import BinaryIO, Callable, Iterable, Optional
+
+import numpy as np
+
+CHANNEL_DIR = os.environ.get("FERRY_CHANNEL_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp")
+HUGEPAGE_SIZE = 2 << 20
+
+
+def channel_path(name: str) -> str:
+    return os.path.join(CHANNEL_DIR, name)
+
+
+def wait_for(ready: Callable[[], bool], min_sleep: float = 1e-5, max_sleep: float = 1e-3):
+    """
+    Wait until `ready()` holds, polling with an exponentially growing interval. Something that's already there
+    is picked up right away, and something that shows up soon within a few tens of microseconds.
+    """
+    delay = min_sleep
+    while not ready():
+        time.sleep(delay)
+        delay = min(2 * delay, max_sleep)
+
+
+def create_file(path: str, size: int) -> tuple[str, BinaryIO]:
+    """
+    Create a channel file of `size` bytes under a temporary name, to be moved into place with `publish` once
+    it's fully set up, so that the other side never sees it half-initialized. Returns the temporary path and
+    the open file.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    staging = f"{path}.{os.getpid()}.init"
+    file = open(staging, "wb+")
+    file.truncate(size)
+    return staging, file
+
+
+def publish(staging: str, path: str):
+    os.rename(staging, path)
+
+
+def prefault(map: mmap.mmap, start: int = 0, hugepages: bool = False):
+    """
+    Back the pages of a fresh mapping, from the first page boundary at or after `start`, so that the first messages
+    don't pay for page faults.
+    With `hugepages`, mappings of at least HUGEPAGE_SIZE first ask for transparent huge pages, which the kernel
+    grants for shared memory if `/sys/kernel/mm/transparent_hugepage/shmem_enabled` is `advise` or `always`.
+    The pages must still be zero, since they're written to.
+    """
+    if hugepages and len(map) >= HUGEPAGE_SIZE:
+        with contextlib.suppress(AttributeError, OSError):
+            map.madvise(mmap.MADV_HUGEPAGE)
+    start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+    np.frombuffer(map, dtype=np.uint8)[start::mmap.PAGESIZE] = 0
+
+
+def pin(cpus: Optional[Iterable[int]]):
+    """
+    Restrict the current process to the given CPUs, e.g. two cores sharing a cache for both sides of a channel.
+    Does nothing with None, or where the OS doesn't support it.
+    """
+    if cpus is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cpus))
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import select
+import socket
+import time
+from typing import Optional
+
+import numpy as np
+
+from ferry import profiling
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.layout import FrameLayout, assign_value
+from ferry.shm import channel_path
+from ferry.wait import WaitStrategy
+
+# Every message starts with its length and, for raw frames (marked by FRAME_LENGTH), a bitmask of the layout
+# fields that follow, each as its raw bytes in layout order
+HEADER_SIZE = 8
+FRAME_LENGTH = 0xFFFFFFFF
+
+
+class SocketCommunicator:
+    """
+    A drop-in replacement for Communicator over a persistent stream socket, so that the env and the trainer
+    can live on different hosts.
+
+    The creating side listens and accepts a single connection, the other side connects to it, retrying until
+    the listener is up. With `address=None` this is a Unix socket at `{CHANNEL_DIR}/{name}.sock`, otherwise a TCP
+    socket with Nagle's algorithm disabled. Waiting always blocks in the kernel, so `wait` is ignored, and there's
+    no mapping for `hugepages` to apply to.
+
+    Frames only carry the fields that were sent, received straight into the views of `self.frame`.
+    """
+    def __init__(self, name: str, create: bool = True, wait: str | WaitStrategy = "block",
+                 address: Optional[tuple[str, int]] = None, hugepages: bool = False):
+        self.name = name
+        self.path = channel_path(f"{name}.sock") if address is None else None
+        self.create = create
+        family = socket.AF_UNIX if address is None else socket.AF_INET
+        target = self.path if address is None else address
+
+        if create:
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
+            listener = socket.socket(family, socket.SOCK_STREAM)
+            if address is not None:
+                listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(target)
+            listener.listen(1)
+            self.sock, _ = listener.accept()
+            listener.close()
+        else:
+            delay = 1e-5
+            while True:
+                self.sock = socket.socket(family, socket.SOCK_STREAM)
+                try:
+                    self.sock.connect(target)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    self.sock.close()
+                    time.sleep(delay)
+                    delay = min(2 * delay, 1e-3)
+
+        if address is not None:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.header = bytearray(HEADER_SIZE)
+        self.buffer = bytearray(1024)
+
+        self.frame_capacity = 2 ** 31
+        self.layout: Optional[FrameLayout] = None
+        self.frame: Optional[dict[str, np.ndarray]] = None
+        self._out_frame: Optional[dict[str, np.ndarray]] = None
+
+    def set_layout(self, layout: Optional[FrameLayout]):
+        """Allocate the buffers of a negotiated frame layout, or go back to protobuf-only steps with None."""
+        self.layout = layout
+        if layout is None:
+            self.frame = self._out_frame = None
+            return
+        in_buffer, out_buffer = bytearray(layout.nbytes), bytearray(layout.nbytes)
+        self.frame, self._out_frame = layout.bind(in_buffer), layout.bind(out_buffer)
+        self._in_bytes, self._out_bytes = layout.bind_bytes(in_buffer), layout.bind_bytes(out_buffer)
+        self._field_names = [name for name, _ in layout.fields]
+
+    def _recv_into(self, view: memoryview):
+        while len(view) > 0:
+            received = self.sock.recv_into(view)
+            if received == 0:
+                raise ConnectionError(f"Channel {self.name} was closed by the other side")
+            view = view[received:]
+
+    def _send_buffers(self, buffers: list[bytes | memoryview]):
+        """Gather the buffers in a single syscall when the socket takes them all at once, without joining them."""
+        buffers = [memoryview(buffer) for buffer in buffers]
+        while buffers:
+            sent = self.sock.sendmsg(buffers)
+            # On a partial send, resume from where it stopped
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers.pop(0))
+            if buffers:
+                buffers[0] = buffers[0][sent:]
+
+    def send_message(self, msg: gym_ferry_pb2.GymnasiumMessage):
+        start = profiling.enabled and time.perf_counter_ns()
+        serialized_msg = msg.SerializeToString()
+        if start:
+            profiling.record("serialize", start, len(serialized_msg))
+        start = profiling.enabled and time.perf_counter_ns()
+        header = len(serialized_msg).to_bytes(4, byteorder='little') + bytes(4)
+        self._send_buffers([header, serialized_msg])
+        if start:
+            profiling.record("send", start, len(serialized_msg))
+
+    def send_frame(self, **values: np.ndarray | float | bool):
+        """Send only the given step values as raw bytes, skipping serialization."""
+        start = profiling.enabled and time.perf_counter_ns()
+        mask = 0
+        for i, name in enumerate(self._field_names):
+            if name in values:
+                assign_value(self._out_frame[name], values[name])
+                mask |= 1 << i
+        header = FRAME_LENGTH.to_bytes(4, byteorder='little') + mask.to_bytes(4, byteorder='little')
+        fields = [memoryview(self._out_bytes[name]) for i, name in enumerate(self._field_names) if mask & (1 << i)]
+        self._send_buffers([header] + fields)
+        if start:
+            profiling.record("send_frame", start, sum(len(field) for field in fields))
+
+    def poll(self) -> bool:
+        """Whether a message has started arriving, so that `receive_message` won't wait for the other side."""
+        return bool(select.select([self.sock], [], [], 0)[0])
+
+    def fileno(self) -> Optional[int]:
+        """The socket itself, readable when a message arrives."""
+        return self.sock.fileno()
+
+    def clear_wakeups(self):
+        pass
+
+    def receive_message(self) -> Optional[gym_ferry_pb2.GymnasiumMessage]:
+        """Wait for the next message. Returns None if it was a raw frame, which can then be read from `self.frame`."""
+        start = profiling.enabled and time.perf_counter_ns()
+        self._recv_into(memoryview(self.header))
+        if start:
+            profiling.record("wait", start)
+
+        start = profiling.enabled and time.perf_counter_ns()
+        msg_len = int.from_bytes(self.header[:4], byteorder='little')
+        if msg_len == FRAME_LENGTH:
+            mask = int.from_bytes(self.header[4:], byteorder='little')
+            nbytes = 0
+            for i, name in enumerate(self._field_names):
+                if mask & (1 << i):
+                    view = memoryview(self._in_bytes[name])
+                    self._recv_into(view)
+                    nbytes += len(view)
+            if start:
+                profiling.record("receive_frame", start, nbytes)
+            return None
+
+        if msg_len > len(self.buffer):
+            self.buffer = bytearray(max(msg_len, 2 * len(self.buffer)))
+        view = memoryview(self.buffer)[:msg_len]
+        self._recv_into(view)
+        if start:
+            profiling.record("receive", start, msg_len)
+
+        start = profiling.enabled and time.perf_counter_ns()
+        msg = gym_ferry_pb2.GymnasiumMessage()
+        msg.ParseFromString(view)
+        if start:
+            profiling.record("parse", start, msg_len)
+        return msg
+
+    def close(self):
+        self.frame = self._out_frame = None
+        self.sock.close()
+        if self.create and self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,57 +1,82 @@
 from __future__ import annotations
 
+import time
 from typing import Any
 
 import google.protobuf.internal.containers
 import numpy as np
 
+from ferry import profiling
 from ferry.gym_grpc import gym_ferry_pb2
 
+from google.protobuf.struct_pb2 import ListValue
 from google.protobuf.struct_pb2 import Value
 from google.protobuf.struct_pb2 import Struct
 
 
-def encode(array: np.ndarray | int) -> gym_ferry_pb2.NDArray:
-    # array = np.asarray(array)
-    # return gym_ferry_pb2.NumpyArray(data=array.tobytes(), shape=np.array(array.shape).tobytes(), dtype=str(array.dtype))
-    return gym_ferry_pb2.NDArray(shape=array.shape, data=array.flatten(), dtype=str(array.dtype))
+def encode(array: np.ndarray | int) -> gym_ferry_pb2.NumpyArray:
+    """Pack an array into a NumpyArray message as its raw C-ordered bytes."""
+    start = profiling.enabled and time.perf_counter_ns()
+    array = np.asarray(array)
+    msg = gym_ferry_pb2.NumpyArray(data=array.tobytes(), shape=array.shape, dtype=array.dtype.str)
+    if start:
+        profiling.record("encode", start, array.nbytes)
+    return msg
 
 
-def decode(msg: gym_ferry_pb2.NDArray) -> np.ndarray:
-    # return np.frombuffer(data.data, dtype=data.dtype).reshape(np.frombuffer(data.shape, dtype=int))
-    return np.array(msg.data, dtype=msg.dtype).reshape(msg.shape)
+def decode(msg: gym_ferry_pb2.NumpyArray) -> np.ndarray:
+    """
+    Unpack a NumpyArray message. The result is a read-only view of the message bytes, which the envs copy before
+    handing it out.
+    """
+    start = profiling.enabled and time.perf_counter_ns()
+    array = np.frombuffer(msg.data, dtype=msg.dtype).reshape(msg.shape)
+    if start:
+        profiling.record("decode", start, array.nbytes)
+    return array
 
 
+def _wrap_value(v: Any) -> Value:
+    if v is None:
+        return Value(null_value=0)
+    elif isinstance(v, bool):
+        return Value(bool_value=v)
+    elif isinstance(v, (int, float)):
+        return Value(number_value=v)
+    elif isinstance(v, str):
+        return Value(string_value=v)
+    elif isinstance(v, dict):
+        return Value(struct_value=Struct(fields=wrap_dict(v)))
+    elif isinstance(v, (list, tuple)):
+        return Value(list_value=ListValue(values=[_wrap_value(x) for x in v]))
+    elif isinstance(v, (np.ndarray, np.generic)):
+        return _wrap_value(v.tolist())
+    raise TypeError(f"Can't convert a {type(v).__name__} to a protobuf Value")
+
+
+def _unwrap_value(v: Value) -> Any:
+    kind = v.WhichOneof("kind")
+    if kind == "number_value":
+        return v.number_value
+    elif kind == "string_value":
+        return v.string_value
+    elif kind == "bool_value":
+        return v.bool_value
+    elif kind == "struct_value":
+        return unwrap_dict(v.struct_value.fields)
+    elif kind == "list_value":
+        return [_unwrap_value(x) for x in v.list_value.values]
+    return None
+
 
 def wrap_dict(d: dict[str, Any]) -> dict[str, Value]:
-    """Convert an arbitrarily nested dictionary to a dictionary of protobuf Values."""
-    new_dict = {}
-    for k, v in d.items():
-        if isinstance(v, dict):
-            new_dict[k] = wrap_dict(v)
-        elif isinstance(v, int):
-            new_dict[k] = Value(number_value=v)
-        elif isinstance(v, float):
-            new_dict[k] = Value(number_value=v)
-        elif isinstance(v, str):
-            new_dict[k] = Value(string_value=v)
-        elif isinstance(v, bool):
-            new_dict[k] = Value(bool_value=v)
-
-    return new_dict
+    """
+    Convert an arbitrarily nested dictionary to a dictionary of protobuf Values.
+    Numbers all become floats, and tuples and arrays become lists. Info dicts go through `ferry.info` instead.
+    """
+    return {k: _wrap_value(v) for k, v in d.items()}
 
 
 def unwrap_dict(d: google.protobuf.internal.containers.MessageMap) -> dict[str, Any]:
     """Convert an arbitrarily nested dictionary of protobuf Values to a dictionary."""
-    new_dict = {}
-    for k, v in d.items():
-        if isinstance(v, Struct):
-            new_dict[k] = unwrap_dict(v)
-        elif v.HasField("number_value"):
-            new_dict[k] = v.number_value
-        elif v.HasField("string_value"):
-            new_dict[k] = v.string_value
-        elif v.HasField("bool_value"):
-            new_dict[k] = v.bool_value
-
-    return new_dict
+    return {k: _unwrap_value(v) for k, v in d.items()}
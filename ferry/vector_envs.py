@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import multiprocessing
+from typing import Any
+from typing import Optional
+
+import gymnasium as gym
+import numpy as np
+from gymnasium.vector.utils import batch_space, concatenate, create_empty_array, iterate
+
+from ferry.core import Communicator, make_communicator, create_gymnasium_message
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.mmap_backends import ServerBackend
+from ferry.mmap_envs import ClientEnv
+from ferry.info import InfoDecoder
+from ferry.layout import space_layouts, pack_value, unpack_value, copy_value
+from ferry.preprocessing import Preprocessing
+from ferry.utils import decode
+
+
+def _run_backend(env_id: str, env_kwargs: dict, name: str, num_envs: Optional[int] = None, wait: str = "spin",
+                 transport: str = "mmap", port: int = 50051, cpus: Optional[list[int]] = None,
+                 hugepages: bool = False):
+    ServerBackend(env_id, port=port, env_kwargs=env_kwargs, name=name, num_envs=num_envs, wait=wait,
+                  transport=transport, cpus=cpus, hugepages=hugepages).run()
+
+
+def _resolve_spaces(env_id: Optional[str], env_kwargs: dict, observation_space: Optional[gym.Space],
+                    action_space: Optional[gym.Space]) -> tuple[gym.Space, gym.Space]:
+    if observation_space is None or action_space is None:
+        assert env_id is not None, "Spaces must be provided when attaching to running backends."
+        env = gym.make(env_id, **env_kwargs)
+        observation_space = observation_space or env.observation_space
+        action_space = action_space or env.action_space
+        env.close()
+    return observation_space, action_space
+
+
+class ClientVectorEnv(gym.vector.VectorEnv):
+    """
+    A vector of ClientEnvs, each talking to its own ServerBackend over its own channel.
+
+    If `env_id` is given, the backends are launched as subprocesses, otherwise they're expected to be started
+    separately on the channels `{name}_0`, ..., `{name}_{num_envs - 1}`.
+    Sub-environments reset automatically in the same step they finish, with the final observation and info
+    stored under `final_obs` and `final_info`. Their backends are asked to do it themselves, saving a round trip.
+    Over "tcp", sub-environment `i` uses the port `port + i`. `action_repeat`, `max_pool`, `obs_compression` and
+    `preprocess` are passed on to every ClientEnv; `observation_space` is then the env's own, before preprocessing.
+    Launched backends are pinned round-robin to one of `backend_cpus` each, and `hugepages` is passed on to them.
+    """
+    def __init__(self,
+                 num_envs: int,
+                 env_id: Optional[str] = None,
+                 env_kwargs: dict = {},
+                 observation_space: Optional[gym.Space] = None,
+                 action_space: Optional[gym.Space] = None,
+                 name: str = "ferry",
+                 frames: bool = True,
+                 wait: str = "spin",
+                 transport: str = "mmap",
+                 port: int = 50051,
+                 host: str = "localhost",
+                 action_repeat: int = 1,
+                 max_pool: bool = False,
+                 obs_compression: Optional[str] = None,
+                 preprocess: Optional[list[str]] = None,
+                 backend_cpus: Optional[list[int]] = None,
+                 hugepages: bool = False):
+        observation_space, action_space = _resolve_spaces(env_id, env_kwargs, observation_space, action_space)
+        if preprocess:
+            observation_space = Preprocessing(preprocess, observation_space).observation_space
+
+        self.num_envs = num_envs
+        self.single_observation_space = observation_space
+        self.single_action_space = action_space
+        self.observation_space = batch_space(observation_space, num_envs)
+        self.action_space = batch_space(action_space, num_envs)
+        self.metadata = {"autoreset_mode": gym.vector.AutoresetMode.SAME_STEP}
+        self.closed = False
+
+        names = [f"{name}_{i}" for i in range(num_envs)]
+        self.processes = []
+        if env_id is not None:
+            for i, channel in enumerate(names):
+                Communicator.unlink(channel)
+                cpus = [backend_cpus[i % len(backend_cpus)]] if backend_cpus else None
+                process = multiprocessing.Process(target=_run_backend,
+                                                  args=(env_id, env_kwargs, channel, None, wait, transport, port + i,
+                                                        cpus, hugepages),
+                                                  daemon=True)
+                process.start()
+                self.processes.append(process)
+
+        self.envs = [ClientEnv(port=port + i, name=channel, frames=frames, transport=transport, host=host,
+                               action_repeat=action_repeat, max_pool=max_pool, autoreset=True,
+                               obs_compression=obs_compression, preprocess=preprocess)
+                     for i, channel in enumerate(names)]
+
+        self._observations = create_empty_array(observation_space, num_envs, fn=np.zeros)
+        self._rewards = np.zeros(num_envs, dtype=np.float64)
+        self._terminations = np.zeros(num_envs, dtype=np.bool_)
+        self._truncations = np.zeros(num_envs, dtype=np.bool_)
+
+    def reset(self, seed: Optional[int | list[int]] = None, options: Optional[dict[str, Any]] = None):
+        if seed is None or isinstance(seed, int):
+            seed = [None if seed is None else seed + i for i in range(self.num_envs)]
+
+        for env, env_seed in zip(self.envs, seed):
+            env.reset_async(seed=env_seed, options=options)
+
+        observations, infos = [], {}
+        for i, env in enumerate(self.envs):
+            obs, info = env.reset_wait()
+            observations.append(obs)
+            infos = self._add_info(infos, info, i)
+
+        concatenate(self.single_observation_space, observations, self._observations)
+        return self._observations.copy(), infos
+
+    def step_async(self, actions: np.ndarray):
+        """Send an action to every sub-environment. Their backends then step concurrently."""
+        for env, action in zip(self.envs, iterate(self.action_space, actions)):
+            env.step_async(action)
+
+    def step_wait(self):
+        """Collect the results of `step_async` and reset the sub-environments that finished."""
+        observations, infos = [], {}
+        finished = []
+        for i, env in enumerate(self.envs):
+            obs, self._rewards[i], self._terminations[i], self._truncations[i], info = env.step_wait()
+            if (self._terminations[i] or self._truncations[i]) and env.autoreset:
+                # The backend already reset it, and sent the final observation along
+                info = dict(info)
+                final = {"final_obs": info.pop("final_obs"), "final_info": info.pop("final_info")}
+                infos = self._add_info(infos, final, i)
+            elif self._terminations[i] or self._truncations[i]:
+                env.reset_async()
+                finished.append(i)
+                info = {"final_obs": obs, "final_info": dict(info)}
+            observations.append(obs)
+            infos = self._add_info(infos, info, i)
+
+        for i in finished:
+            observations[i], reset_info = self.envs[i].reset_wait()
+            infos = self._add_info(infos, reset_info, i)
+
+        concatenate(self.single_observation_space, observations, self._observations)
+        return (self._observations.copy(), self._rewards.copy(), self._terminations.copy(),
+                self._truncations.copy(), infos)
+
+    def step(self, actions: np.ndarray):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close_extras(self, **kwargs):
+        for env in self.envs:
+            env.close()
+        for process in self.processes:
+            process.join()
+
+    def close(self, **kwargs):
+        if self.closed:
+            return
+        self.close_extras(**kwargs)
+        self.closed = True
+
+
+class BatchClientEnv(gym.vector.VectorEnv):
+    """
+    A vector env backed by a single batched ServerBackend, which hosts all the copies of the environment.
+
+    Each step is one exchange carrying every action, so the synchronization cost doesn't grow with `num_envs`.
+    If `env_id` is given, the backend is launched as a subprocess with `num_envs` copies, otherwise it's expected
+    to be running on the channel `name`, and the number of copies comes from its handshake. A launched backend is
+    pinned to `backend_cpus`, and `hugepages` is passed on to it.
+    """
+    def __init__(self,
+                 num_envs: Optional[int] = None,
+                 env_id: Optional[str] = None,
+                 env_kwargs: dict = {},
+                 observation_space: Optional[gym.Space] = None,
+                 action_space: Optional[gym.Space] = None,
+                 name: str = "ferry",
+                 wait: str = "spin",
+                 transport: str = "mmap",
+                 port: int = 50051,
+                 host: str = "localhost",
+                 backend_cpus: Optional[list[int]] = None,
+                 hugepages: bool = False):
+        observation_space, action_space = _resolve_spaces(env_id, env_kwargs, observation_space, action_space)
+
+        self.process = None
+        if env_id is not None:
+            assert num_envs is not None, "The number of environments is needed to launch a backend."
+            Communicator.unlink(name)
+            self.process = multiprocessing.Process(target=_run_backend,
+                                                   args=(env_id, env_kwargs, name, num_envs, wait, transport, port,
+                                                         backend_cpus, hugepages),
+                                                   daemon=True)
+            self.process.start()
+
+        self.communicator = make_communicator(transport, name, create=False, host=host, port=port)
+        self.info_decoder = InfoDecoder()
+        offer = self.communicator.receive_message().handshake
+        assert offer.num_envs > 0, f"The backend on {name} is not batched."
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(handshake=gym_ferry_pb2.Handshake()))
+        self.communicator.receive_message()
+
+        self.num_envs = offer.num_envs
+        self.obs_layout, self.action_layout = space_layouts(offer)
+        self.single_observation_space = observation_space
+        self.single_action_space = action_space
+        self.observation_space = batch_space(observation_space, self.num_envs)
+        self.action_space = batch_space(action_space, self.num_envs)
+        self.metadata = {"autoreset_mode": gym.vector.AutoresetMode.SAME_STEP}
+        self.closed = False
+
+    def _unpack(self, batch: gym_ferry_pb2.BatchStepReturn):
+        infos = {}
+        for i, info in enumerate(batch.info):
+            infos = self._add_info(infos, dict(self.info_decoder.decode(info)), i)
+
+        done = decode(batch.done)
+        final_obs = decode(batch.final_obs)
+        for j, i in enumerate(np.flatnonzero(done)):
+            final = {"final_obs": copy_value(unpack_value(self.obs_layout, final_obs[j])),
+                     "final_info": dict(self.info_decoder.decode(batch.final_info[j]))}
+            infos = self._add_info(infos, final, i)
+
+        # Copied out of the message, so that they're writable like those of ClientVectorEnv
+        return copy_value(unpack_value(self.obs_layout, decode(batch.obs), (self.num_envs,))), infos
+
+    def reset(self, seed: Optional[int] = None, options: Optional[dict[str, Any]] = None):
+        seed = seed if seed is not None else -1
+        options = options or {}
+        self.communicator.send_message(create_gymnasium_message(reset_args=(seed, options)))
+
+        response = self.communicator.receive_message()
+        return self._unpack(response.batch_step_return)
+
+    def step_async(self, actions: np.ndarray):
+        """Send all actions in one message."""
+        if self.action_layout is not None and self.action_layout.composite:
+            actions = np.stack([pack_value(self.action_layout, action)
+                                for action in iterate(self.action_space, actions)])
+        self.communicator.send_message(create_gymnasium_message(batch_action=np.asarray(actions)))
+
+    def step_wait(self):
+        """Receive the stacked results of `step_async`."""
+        batch = self.communicator.receive_message().batch_step_return
+        obs, infos = self._unpack(batch)
+        return obs, decode(batch.reward).copy(), decode(batch.terminated).copy(), decode(batch.truncated).copy(), infos
+
+    def step(self, actions: np.ndarray):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close_extras(self, **kwargs):
+        self.communicator.send_message(gym_ferry_pb2.GymnasiumMessage(close=True))
+        if self.process is not None:
+            self.process.join()
+        self.communicator.close()
+
+    def close(self, **kwargs):
+        if self.closed:
+            return
+        self.close_extras(**kwargs)
+        self.closed = True
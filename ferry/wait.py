@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import mmap
+import os
+import time
+from typing import Callable
+from typing import Optional
+
+from ferry.shm import channel_path
+
+
+class WaitStrategy:
+    """How one side of a channel waits for its turn, and how it wakes the other side up when handing it over."""
+    kind: int = 0
+
+    def attach(self, name: str, create: bool, active_code: int):
+        """Set up whatever the strategy needs for the channel `name`, on the side waiting for `active_code`."""
+        pass
+
+    def wait(self, map: mmap.mmap, code: int):
+        """Wait until the turn flag at the start of `map` is set to `code`."""
+        self.wait_until(lambda: map[0] == code)
+
+    def wait_until(self, ready: Callable[[], bool]):
+        """Wait until `ready()` holds. It must only become true through the other side, which then calls `notify`."""
+        raise NotImplementedError
+
+    def notify(self):
+        """Called after handing the turn to the other side."""
+        pass
+
+    def fileno(self) -> Optional[int]:
+        """A file descriptor that becomes readable when the other side notifies, or None if there isn't one."""
+        return None
+
+    def clear(self):
+        """Consume the pending notifications once `fileno()` is readable."""
+        pass
+
+    def close(self, remove: bool = False):
+        pass
+
+
+class SpinWait(WaitStrategy):
+    """Busy-spin on the flag. Lowest latency, but burns a full core while waiting."""
+    kind = 1
+
+    def wait(self, map: mmap.mmap, code: int):
+        while map[0] != code:
+            pass
+
+    def wait_until(self, ready: Callable[[], bool]):
+        while not ready():
+            pass
+
+
+class YieldWait(WaitStrategy):
+    """Spin for a while, then keep giving up the rest of the time slice to other processes."""
+    kind = 2
+
+    def __init__(self, spins: int = 1000):
+        self.spins = spins
+
+    def wait_until(self, ready: Callable[[], bool]):
+        for _ in range(self.spins):
+            if ready():
+                return
+        while not ready():
+            os.sched_yield()
+
+
+class SleepWait(WaitStrategy):
+    """Spin for a while, then sleep with an exponentially growing interval, up to `max_sleep` seconds."""
+    kind = 3
+
+    def __init__(self, spins: int = 1000, min_sleep: float = 1e-6, max_sleep: float = 1e-3):
+        self.spins = spins
+        self.min_sleep = min_sleep
+        self.max_sleep = max_sleep
+
+    def wait_until(self, ready: Callable[[], bool]):
+        for _ in range(self.spins):
+            if ready():
+                return
+        delay = self.min_sleep
+        while not ready():
+            time.sleep(delay)
+            delay = min(2 * delay, self.max_sleep)
+
+
+class BlockingWait(WaitStrategy):
+    """
+    Spin for a while, then block in the kernel until the other side writes a wake-up byte into a named pipe.
+
+    Each side reads from its own pipe, `{CHANNEL_DIR}/{name}.wake{code}`, and writes to the other one. Writes never
+    block: if the pipe is full, the reader has plenty of wake-ups pending anyway.
+    """
+    kind = 4
+
+    def __init__(self, spins: int = 1000):
+        self.spins = spins
+        self.read_fd = None
+        self.write_fd = None
+
+    def attach(self, name: str, create: bool, active_code: int):
+        self.paths = [channel_path(f"{name}.wake{code}") for code in (0x01, 0x02)]
+        if create:
+            for path in self.paths:
+                if os.path.exists(path):
+                    os.remove(path)
+                os.mkfifo(path)
+        own, other = (self.paths[0], self.paths[1]) if active_code == 0x01 else (self.paths[1], self.paths[0])
+        # O_RDWR lets us open a FIFO without waiting for the other end to show up
+        self.read_fd = os.open(own, os.O_RDWR)
+        self.write_fd = os.open(other, os.O_RDWR | os.O_NONBLOCK)
+
+    def wait_until(self, ready: Callable[[], bool]):
+        for _ in range(self.spins):
+            if ready():
+                return
+        while not ready():
+            os.read(self.read_fd, 4096)
+
+    def notify(self):
+        try:
+            os.write(self.write_fd, b"\x01")
+        except BlockingIOError:
+            pass
+
+    def fileno(self) -> Optional[int]:
+        return self.read_fd
+
+    def clear(self):
+        os.read(self.read_fd, 4096)
+
+    def close(self, remove: bool = False):
+        for fd in (self.read_fd, self.write_fd):
+            if fd is not None:
+                os.close(fd)
+        self.read_fd = self.write_fd = None
+        if remove:
+            for path in self.paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+WAIT_STRATEGIES = {
+    "spin": SpinWait,
+    "yield": YieldWait,
+    "sleep": SleepWait,
+    "block": BlockingWait,
+}
+
+
+def make_wait_strategy(wait: str | WaitStrategy) -> WaitStrategy:
+    return WAIT_STRATEGIES[wait]() if isinstance(wait, str) else wait
+
+
+def wait_strategy_from_kind(kind: int) -> WaitStrategy:
+    for cls in WAIT_STRATEGIES.values():
+        if cls.kind == kind:
+            return cls()
+    raise ValueError(f"Unknown wait strategy {kind}")
@@ -0,0 +1,97 @@
+"""Toy envs for the tests, registered with Gymnasium, and helpers to run a backend for one in a subprocess."""
+
+import multiprocessing
+import os
+from typing import Any, Callable
+
+import gymnasium as gym
+import numpy as np
+
+from ferry.core import Communicator
+
+
+class CountingEnv(gym.Env):
+    """
+    Observes the number of steps taken in the episode, which is truncated after `length` steps. Infos are empty
+    up to the second step, then `{"x": 1}`; the reset info echoes the options.
+    """
+    observation_space = gym.spaces.Box(0, np.inf, (1,), np.float32)
+    action_space = gym.spaces.Discrete(2)
+
+    def __init__(self, length: int = 100):
+        self.length = length
+        self.t = 0
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.t = 0
+        return np.zeros(1, dtype=np.float32), ({"options": options} if options else {})
+
+    def step(self, action):
+        self.t += 1
+        info = {"x": 1} if self.t >= 2 else {}
+        return np.full(1, self.t, dtype=np.float32), float(action), False, self.t >= self.length, info
+
+
+gym.register("FerryCounting-v0", entry_point=CountingEnv)
+
+
+def channel(label: str) -> str:
+    """A channel name unique to this test process, with no leftover files from an earlier run."""
+    name = f"ferry_test_{os.getpid()}_{label}"
+    Communicator.unlink(name)
+    return name
+
+
+def start(target: Callable[..., Any], *args: Any) -> multiprocessing.Process:
+    """Run `target(*args)` in a daemon subprocess, e.g. a backend's constructor and `run`."""
+    process = multiprocessing.Process(target=target, args=args, daemon=True)
+    process.start()
+    return process
+
+
+class LookupEnv(gym.Env):
+    """
+    Walks along five cells, looking up the move of its composite action in a dict, so that the action must
+    arrive as something hashable. Episodes are truncated after ten steps.
+    """
+    MOVES = {0: -1, 1: 0, 2: 1}
+    observation_space = gym.spaces.Dict({"pos": gym.spaces.Discrete(5),
+                                         "vel": gym.spaces.Box(-1, 1, (2,), np.float32)})
+    action_space = gym.spaces.Dict({"move": gym.spaces.Discrete(3),
+                                    "force": gym.spaces.Box(-1, 1, (2,), np.float32)})
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.t, self.pos, self.vel = 0, 2, np.zeros(2, dtype=np.float32)
+        return {"pos": self.pos, "vel": self.vel.copy()}, {}
+
+    def step(self, action):
+        self.t += 1
+        self.pos = min(max(self.pos + self.MOVES[action["move"]], 0), 4)
+        self.vel = np.asarray(action["force"], dtype=np.float32)
+        return {"pos": self.pos, "vel": self.vel.copy()}, float(self.pos), False, self.t >= 10, {}
+
+
+gym.register("FerryLookup-v0", entry_point=LookupEnv)
+
+
+class BlinkEnv(gym.Env):
+    """
+    Observes a light that is on every other step, next to the step count, so that max-pooling two consecutive
+    observations always sees it on. Episodes are truncated after seven steps.
+    """
+    observation_space = gym.spaces.Box(0, np.inf, (2,), np.float32)
+    action_space = gym.spaces.Discrete(2)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.t = 0
+        return np.zeros(2, dtype=np.float32), {}
+
+    def step(self, action):
+        self.t += 1
+        return np.array([self.t % 2, self.t], dtype=np.float32), 1., False, self.t >= 7, {}
+
+
+gym.register("FerryBlink-v0", entry_point=BlinkEnv)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import numpy as np
+
+from ferry.broadcast import BroadcastReader, BroadcastWriter
+from ferry.mmap_backends import ServerBackend
+from ferry.mmap_envs import ClientEnv
+
+from tests.envs import CountingEnv, LookupEnv, channel, start
+
+
+def _writer(label: str, env, slots: int = 4) -> tuple[str, BroadcastWriter]:
+    name = channel(label)
+    return name, BroadcastWriter(name, env.observation_space, env.action_space, slots=slots)
+
+
+def test_records():
+    name, writer = _writer("broadcast", CountingEnv())
+    reader = BroadcastReader(name)
+    try:
+        assert not reader.poll() and reader.read() is None
+        writer.reset(np.zeros(1, dtype=np.float32))
+        writer.step(1, np.ones(1, dtype=np.float32), 1., False, True)
+        first, second = reader.read(), reader.read()
+        assert reader.read() is None
+        assert first["seq"] == 0 and first["reset"] and first["action"] == 0 and first["obs"][0] == 0
+        assert second["seq"] == 1 and not second["reset"] and second["action"] == 1 and second["reward"] == 1
+        assert second["truncated"] and not second["terminated"]
+
+        # Records are copies, which later writes to the slot don't touch
+        for t in range(4):
+            writer.step(0, np.full(1, t + 2, dtype=np.float32), 0., False, False)
+        assert second["obs"][0] == 1
+    finally:
+        writer.close()
+    assert reader.poll() and not reader.closed
+    reader.close()
+
+
+def test_lapped_reader():
+    name, writer = _writer("broadcast_lapped", CountingEnv())
+    reader = BroadcastReader(name)
+    try:
+        writer.reset(np.zeros(1, dtype=np.float32))
+        for t in range(1, 10):
+            writer.step(1, np.full(1, t, dtype=np.float32), 1., False, False)
+        # The writer never waits, so a reader a ring behind only finds the last records
+        records = [reader.read() for _ in range(4)]
+        assert [record["seq"] for record in records] == [6, 7, 8, 9] and reader.dropped == 6
+        assert reader.read() is None
+
+        late = BroadcastReader(name, from_start=True)
+        assert late.read()["seq"] == 6
+        late.close()
+    finally:
+        writer.close()
+    assert reader.closed
+    reader.close()
+
+
+def test_composite_action():
+    name, writer = _writer("broadcast_composite", LookupEnv())
+    reader = BroadcastReader(name)
+    env = LookupEnv()
+    try:
+        obs, _ = env.reset(seed=0)
+        writer.reset(obs)
+        action = {"move": 2, "force": np.array([0.5, -0.5], dtype=np.float32)}
+        writer.step(action, *env.step(action)[:4])
+        reset, step = reader.read(), reader.read()
+        # A reset has no action, which is zeroed across the whole composite value
+        assert reset["action"]["move"] == 0 and not reset["action"]["force"].any()
+        assert step["action"]["move"] == 2 and step["obs"]["pos"] == 3
+        np.testing.assert_array_equal(step["action"]["force"], action["force"])
+    finally:
+        writer.close()
+        reader.close()
+
+
+def _run_server_backend(name: str):
+    ServerBackend("FerryCounting-v0", name=name, wait="block", broadcast=name).run()
+
+
+def test_backend_broadcasts():
+    name = channel("broadcast_backend")
+    backend = start(_run_server_backend, name)
+    env = ClientEnv(name=name)
+    reader = BroadcastReader(name, from_start=True)
+    try:
+        env.reset(seed=0)
+        for action in [1, 0, 1]:
+            env.step(action)
+        records = [reader.read() for _ in range(4)]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+        reader.close()
+    assert backend.exitcode == 0
+    assert [record["reset"] for record in records] == [True, False, False, False]
+    assert [int(record["action"]) for record in records] == [0, 1, 0, 1]
+    assert [record["obs"][0] for record in records] == [0, 1, 2, 3]
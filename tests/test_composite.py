@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ferry.mmap_backends import ClientBackend, ServerBackend
+from ferry.mmap_envs import ClientEnv, ServerEnv
+from ferry.vector_envs import BatchClientEnv
+
+from tests.envs import LookupEnv, channel, start
+
+ACTIONS = [{"move": move, "force": np.array([0.5, -float(move) / 4], dtype=np.float32)} for move in [2, 2, 0, 1, 2]]
+
+
+def _run_server_backend(name: str):
+    ServerBackend("FerryLookup-v0", name=name, wait="block").run()
+
+
+def _run_client_backend(name: str):
+    ClientBackend("FerryLookup-v0", name=name).run()
+
+
+def _local_trajectory() -> list[tuple]:
+    env = LookupEnv()
+    obs, _ = env.reset(seed=0)
+    return [(obs, 0.)] + [env.step(action)[:2] for action in ACTIONS]
+
+
+def _assert_obs_equal(obs, expected):
+    assert isinstance(obs, dict) and obs.keys() == expected.keys()
+    assert int(obs["pos"]) == expected["pos"]
+    np.testing.assert_array_equal(obs["vel"], expected["vel"])
+
+
+@pytest.mark.parametrize("frames", [True, False])
+def test_client_env(frames: bool):
+    name = channel(f"composite_{frames}")
+    backend = start(_run_server_backend, name)
+    env = ClientEnv(name=name, frames=frames)
+    try:
+        assert (env.communicator.frame is not None) == frames
+        obs, _ = env.reset(seed=0)
+        steps = [(obs, 0.)] + [env.step(action)[:2] for action in ACTIONS]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    assert len(steps) == len(ACTIONS) + 1
+    for (obs, reward), (expected_obs, expected_reward) in zip(steps, _local_trajectory()):
+        _assert_obs_equal(obs, expected_obs)
+        assert reward == expected_reward
+
+
+def test_server_env():
+    name = channel("composite_server")
+    backend = start(_run_client_backend, name)
+    env = ServerEnv(name=name, wait="block")
+    try:
+        env.reset(seed=0)
+        steps = [env.step(action)[:2] for action in ACTIONS + ACTIONS[:1]]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    assert len(steps) == len(ACTIONS) + 1
+    for (obs, reward), (expected_obs, expected_reward) in zip(steps, _local_trajectory()):
+        _assert_obs_equal(obs, expected_obs)
+        assert reward == expected_reward
+
+
+def test_batch_client_env():
+    name = channel("composite_batch")
+    env = BatchClientEnv(2, "FerryLookup-v0", name=name, wait="block")
+    try:
+        obs, _ = env.reset(seed=0)
+        steps = [(obs, np.zeros(2))]
+        for action in ACTIONS:
+            batch = {"move": np.array([action["move"]] * 2), "force": np.stack([action["force"]] * 2)}
+            steps.append(env.step(batch)[:2])
+    finally:
+        env.close()
+    for (obs, rewards), (expected_obs, expected_reward) in zip(steps, _local_trajectory()):
+        for i in range(2):
+            _assert_obs_equal({"pos": obs["pos"][i], "vel": obs["vel"][i]}, expected_obs)
+        np.testing.assert_array_equal(rewards, [expected_reward] * 2)
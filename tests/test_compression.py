@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ferry.compression import ObsDecoder, ObsEncoder
+from ferry.utils import encode
+
+
+def _frames(count: int, seed: int = 0) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)
+    frames = []
+    for _ in range(count):
+        frame = frame.copy()
+        frame[rng.integers(0, 16), rng.integers(0, 16)] = rng.integers(0, 256, 3)
+        frames.append(frame)
+    return frames
+
+
+def test_keyframes_and_deltas():
+    encoder, decoder = ObsEncoder("zlib", keyframe_interval=4), ObsDecoder()
+    deltas = []
+    for frame in _frames(10):
+        msg = encoder.encode(frame)
+        deltas.append(msg.delta)
+        decoded = decoder.decode(msg)
+        assert decoded.dtype == frame.dtype
+        np.testing.assert_array_equal(decoded, frame)
+        assert not decoded.flags.writeable
+    assert deltas == [False, True, True, True] * 2 + [False, True]
+
+
+def test_reset_sends_keyframe():
+    encoder, decoder = ObsEncoder("zlib"), ObsDecoder()
+    first, second, third = _frames(3)
+    assert not encoder.encode(first).delta
+    assert encoder.encode(second).delta
+    encoder.reset()
+    msg = encoder.encode(third)
+    assert not msg.delta
+    # A keyframe doesn't need the decoder to have seen anything before
+    np.testing.assert_array_equal(decoder.decode(msg), third)
+
+
+def test_shape_change_sends_keyframe():
+    encoder = ObsEncoder("zlib")
+    encoder.encode(np.zeros((4, 4), dtype=np.float32))
+    assert not encoder.encode(np.zeros((2, 4), dtype=np.float32)).delta
+
+
+def test_missing_reference():
+    encoder = ObsEncoder("zlib")
+    first, second = _frames(2)
+    encoder.encode(first)
+    with pytest.raises(ValueError):
+        ObsDecoder().decode(encoder.encode(second))
+
+
+def test_uncompressed_passthrough():
+    array = np.arange(12, dtype=np.int32).reshape(3, 4)
+    np.testing.assert_array_equal(ObsDecoder().decode(encode(array)), array)
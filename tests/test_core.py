@@ -0,0 +1,55 @@
+import mmap
+import threading
+
+import numpy as np
+
+from ferry.core import Communicator
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.utils import encode
+
+from tests.envs import channel
+
+
+def _message(nbytes: int, seed: int = 0) -> gym_ferry_pb2.GymnasiumMessage:
+    data = np.random.default_rng(seed).integers(0, 256, nbytes, dtype=np.uint8)
+    return gym_ferry_pb2.GymnasiumMessage(action=encode(data))
+
+
+def test_mapping_grows():
+    name = channel("core_grow")
+    creator = Communicator(name, create=True, wait="block")
+    attached = Communicator(name, create=False)
+    try:
+        assert attached.size == 1024
+        creator.send_message(_message(3000))
+        assert attached.receive_message() == _message(3000)
+        # Both sides now map the grown file, and the other direction uses it too
+        assert attached.size == creator.size >= 3000
+        attached.send_message(_message(5000, seed=1))
+        assert creator.receive_message() == _message(5000, seed=1)
+        assert creator.size == attached.size >= 5000
+    finally:
+        attached.close()
+        creator.close()
+
+
+def test_chunked_messages():
+    name = channel("core_chunks")
+    creator = Communicator(name, create=True, wait="block", max_size=mmap.PAGESIZE)
+    attached = Communicator(name, create=False)
+    try:
+        assert attached.max_size == mmap.PAGESIZE
+        # Several times the largest mapping, so the sender and the receiver take turns chunk by chunk
+        sender = threading.Thread(target=creator.send_message, args=(_message(5 * mmap.PAGESIZE),))
+        sender.start()
+        received = attached.receive_message()
+        sender.join()
+        assert received == _message(5 * mmap.PAGESIZE)
+        assert creator.size == attached.size == mmap.PAGESIZE
+
+        # Small messages still go in one turn afterwards, in either direction
+        attached.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))
+        assert creator.receive_message().status
+    finally:
+        attached.close()
+        creator.close()
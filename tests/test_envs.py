@@ -0,0 +1,94 @@
+import pytest
+
+from ferry.mmap_backends import ClientBackend, ServerBackend
+from ferry.mmap_envs import ClientEnv, ServerEnv
+
+from tests.envs import channel, start
+
+OPTIONS = {"level": 3, "name": "a", "nested": {"flags": [True, None]}}
+
+
+def _run_client_backend(name: str):
+    ClientBackend("FerryCounting-v0", name=name).run()
+
+
+def _run_server_backend(name: str):
+    ServerBackend("FerryCounting-v0", name=name, wait="block").run()
+
+
+def test_server_env_reset_keeps_info_schema():
+    name = channel("schema")
+    backend = start(_run_client_backend, name)
+    env = ServerEnv(name=name, wait="block")
+    try:
+        env.reset(seed=0)
+        # The first observation comes back from the first step, so the backend has now sent the first info with
+        # a schema, which the reset discards along with the rest of the step return
+        assert [dict(env.step(0)[4]) for _ in range(2)] == [{}, {}]
+        env.reset(seed=0)
+        assert [dict(env.step(0)[4]) for _ in range(4)] == [{}, {}, {"x": 1}, {"x": 1}]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+
+
+def test_server_env_reset_options():
+    name = channel("server_options")
+    backend = start(_run_client_backend, name)
+    env = ServerEnv(name=name, wait="block")
+    try:
+        _, info = env.reset(seed=0, options=OPTIONS)
+        assert dict(info) == {"options": OPTIONS}
+        _, info = env.reset()
+        assert dict(info) == {}
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+
+
+def test_client_env_reset_options():
+    name = channel("client_options")
+    backend = start(_run_server_backend, name)
+    env = ClientEnv(name=name)
+    try:
+        _, info = env.reset(seed=0, options=OPTIONS)
+        assert dict(info) == {"options": OPTIONS}
+        env.step(1)
+        _, info = env.reset()
+        assert dict(info) == {}
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+
+
+@pytest.mark.parametrize("frames", [True, False])
+def test_client_env_obs_are_writable(frames: bool):
+    name = channel(f"writable_{frames}")
+    backend = start(_run_server_backend, name)
+    env = ClientEnv(name=name, frames=frames)
+    try:
+        # The reset and the steps with an info come in messages, the others in raw frames when accepted
+        observations = [env.reset(seed=0)[0]] + [env.step(1)[0] for _ in range(3)]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    for t, obs in enumerate(observations):
+        assert obs.flags.writeable and obs[0] == t
+        obs += 1
+
+
+def test_server_env_obs_are_writable():
+    name = channel("server_writable")
+    backend = start(_run_client_backend, name)
+    env = ServerEnv(name=name, wait="block")
+    try:
+        observations = [env.reset(seed=0)[0]] + [env.step(1)[0] for _ in range(3)]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    assert all(obs.flags.writeable for obs in observations)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from ferry.mmap_backends import ClientBackend, ServerBackend
+from ferry.mmap_envs import ClientEnv, ServerEnv
+
+from tests.envs import channel, start
+
+
+def _run_server_backend(name: str, env_id: str, env_kwargs: dict):
+    ServerBackend(env_id, name=name, wait="block", env_kwargs=env_kwargs).run()
+
+
+def _run_client_backend(name: str):
+    ClientBackend("FerryCounting-v0", name=name, env_kwargs={"length": 5}).run()
+
+
+@pytest.mark.parametrize("frames", [True, False])
+def test_action_repeat(frames: bool):
+    name = channel(f"repeat_{frames}")
+    backend = start(_run_server_backend, name, "FerryCounting-v0", {"length": 5})
+    env = ClientEnv(name=name, frames=frames, action_repeat=3)
+    try:
+        assert env.action_repeat == 3 and not env.autoreset
+        env.reset(seed=0)
+        obs, reward, _, truncated, _ = env.step(1)
+        assert obs[0] == 3 and reward == 3 and not truncated
+        # The episode ends after two of the three repeats, and the rest are skipped
+        obs, reward, _, truncated, _ = env.step(1)
+        assert obs[0] == 5 and reward == 2 and truncated
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+
+
+def test_max_pool():
+    name = channel("max_pool")
+    backend = start(_run_server_backend, name, "FerryBlink-v0", {})
+    env = ClientEnv(name=name, action_repeat=2, max_pool=True)
+    try:
+        assert env.max_pool
+        env.reset(seed=0)
+        # The light is off on every second step, but one of the last two observations always has it on
+        steps = [env.step(0) for _ in range(3)]
+        np.testing.assert_array_equal([obs for obs, *_ in steps], [[1, 2], [1, 4], [1, 6]])
+        assert [reward for _, reward, *_ in steps] == [2, 2, 2]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+
+
+@pytest.mark.parametrize("frames", [True, False])
+def test_autoreset(frames: bool):
+    name = channel(f"autoreset_{frames}")
+    backend = start(_run_server_backend, name, "FerryCounting-v0", {"length": 5})
+    env = ClientEnv(name=name, frames=frames, autoreset=True)
+    try:
+        assert env.autoreset
+        env.reset(seed=0)
+        for t in range(1, 5):
+            assert env.step(1)[0][0] == t
+        # The backend resets in the step the episode ends, and sends the final observation and info along
+        obs, reward, _, truncated, info = env.step(1)
+        assert obs[0] == 0 and reward == 1 and truncated
+        info = dict(info)
+        assert info["final_obs"][0] == 5 and dict(info["final_info"]) == {"x": 1}
+        assert env.step(1)[0][0] == 1
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+
+
+def test_server_env_action_repeat():
+    name = channel("server_repeat")
+    backend = start(_run_client_backend, name)
+    env = ServerEnv(name=name, wait="block", action_repeat=2)
+    try:
+        assert env.action_repeat == 2
+        env.reset(seed=0)
+        # The first step returns the reset observation, the next ones come two env steps apart
+        steps = [env.step(1) for _ in range(3)]
+        assert [float(obs[0]) for obs, *_ in steps] == [0, 2, 4]
+        assert [reward for _, reward, *_ in steps] == [0, 2, 2]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import gymnasium as gym
+import numpy as np
+import pytest
+
+from ferry.mmap_backends import ClientBackend, ServerBackend
+from ferry.mmap_envs import ClientEnv, ServerEnv
+
+from tests.envs import channel, start
+
+ACTIONS = [1, 2, 2, 1, 0, 3, 1, 2, 1, 1, 0, 2]
+
+
+def _run_server_backend(env_id: str, name: str):
+    ServerBackend(env_id, name=name, wait="block").run()
+
+
+def _run_client_backend(env_id: str, name: str):
+    ClientBackend(env_id, name=name).run()
+
+
+def _local_trajectory(env_id: str) -> list[tuple]:
+    env = gym.make(env_id)
+    obs, _ = env.reset(seed=0)
+    steps = [(obs, 0., False, False)]
+    for action in ACTIONS:
+        obs, reward, terminated, truncated, _ = env.step(action)
+        steps.append((obs, reward, terminated, truncated))
+        if terminated or truncated:
+            break
+    return steps
+
+
+@pytest.mark.parametrize("env_id", ["FrozenLake-v1", "Taxi-v4"])
+@pytest.mark.parametrize("frames", [True, False])
+def test_discrete_actions_client_env(env_id: str, frames: bool):
+    name = channel(f"{env_id}_{frames}")
+    backend = start(_run_server_backend, env_id, name)
+    env = ClientEnv(name=name, frames=frames)
+    try:
+        expected = _local_trajectory(env_id)
+        obs, _ = env.reset(seed=0)
+        steps = [(obs, 0., False, False)]
+        for action in ACTIONS[:len(expected) - 1]:
+            steps.append(env.step(np.int64(action))[:4])
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    assert [(int(obs), *rest) for obs, *rest in steps] == [(int(obs), *rest) for obs, *rest in expected]
+
+
+@pytest.mark.parametrize("env_id", ["FrozenLake-v1", "Taxi-v4"])
+def test_discrete_actions_server_env(env_id: str):
+    name = channel(env_id)
+    backend = start(_run_client_backend, env_id, name)
+    env = ServerEnv(name=name, wait="block")
+    try:
+        expected = _local_trajectory(env_id)
+        env.reset(seed=0)
+        # The first step returns the reset observation, and each one after it the result of the previous action,
+        # so the last action is only there to answer the last request
+        steps = [env.step(action)[:4] for action in ACTIONS[:len(expected) - 1] + [0]]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    assert [(int(obs), *rest) for obs, *rest in steps] == [(int(obs), *rest) for obs, *rest in expected]
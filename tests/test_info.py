@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from ferry.info import InfoDecoder, InfoEncoder, LazyInfo
+
+
+def test_empty_info():
+    assert InfoDecoder().decode(InfoEncoder().encode({})) == {}
+    assert InfoDecoder().decode(InfoEncoder().encode(None)) == {}
+
+
+def test_round_trip():
+    info = {
+        "none": None, "flag": True, "count": 3, "value": 0.5, "name": "ferry", "raw": b"\x00\x01",
+        "array": np.arange(6, dtype=np.float32).reshape(2, 3), "scalar": np.int16(7),
+        "nested": {"list": [1, "a", None], "tuple": (2.5, False)},
+    }
+    decoded = InfoDecoder().decode(InfoEncoder().encode(info))
+    assert isinstance(decoded, LazyInfo)
+    decoded = dict(decoded)
+
+    assert decoded.keys() == info.keys()
+    for key in ("none", "flag", "count", "value", "name", "raw", "nested"):
+        assert decoded[key] == info[key]
+        assert type(decoded[key]) is type(info[key])
+    assert decoded["array"].dtype == np.float32
+    np.testing.assert_array_equal(decoded["array"], info["array"])
+    assert decoded["scalar"] == 7 and decoded["scalar"].dtype == np.int16
+
+
+def test_numpy_scalars_keep_their_type():
+    # np.float64 is also a float, and must not come back as one
+    info = {"double": np.float64(0.1), "flag": np.bool_(True), "long": np.int64(-3), "single": np.float32(2.5)}
+    decoded = dict(InfoDecoder().decode(InfoEncoder().encode(info)))
+    for key, value in info.items():
+        assert type(decoded[key]) is type(value) and decoded[key] == value
+
+
+def test_schema_sent_once():
+    encoder, decoder = InfoEncoder(), InfoDecoder()
+    first = encoder.encode({"x": 1, "y": [0.5]})
+    second = encoder.encode({"x": 2, "y": [1.5]})
+    other = encoder.encode({"z": "a"})
+
+    assert first.schema and not second.schema and other.schema
+    assert first.schema_id == second.schema_id != other.schema_id
+    assert dict(decoder.decode(first)) == {"x": 1, "y": [0.5]}
+    assert dict(decoder.decode(second)) == {"x": 2, "y": [1.5]}
+    assert dict(decoder.decode(other)) == {"z": "a"}
+
+
+def test_schema_cache_is_bounded():
+    encoder, decoder = InfoEncoder(max_schemas=4), InfoDecoder()
+    for i in range(20):
+        assert dict(decoder.decode(encoder.encode({f"key_{i}": i}))) == {f"key_{i}": i}
+    assert len(encoder.schemas) == 4 and len(decoder.readers) == 4
+
+    # Recently sent schemas are kept, the evicted ones are sent again under a reused id
+    assert not encoder.encode({"key_19": 0}).schema
+    msg = encoder.encode({"key_0": 0})
+    assert msg.schema and 1 <= msg.schema_id <= 4
+    assert dict(decoder.decode(msg)) == {"key_0": 0}
+    assert dict(decoder.decode(encoder.encode({"key_19": 1}))) == {"key_19": 1}
+
+
+def test_unknown_schema():
+    encoder = InfoEncoder()
+    encoder.encode({"x": 1})
+    with pytest.raises(KeyError):
+        InfoDecoder().decode(encoder.encode({"x": 2}))
+
+
+def test_lazy_info():
+    info = InfoDecoder().decode(InfoEncoder().encode({"x": 1, "array": np.zeros(3)}))
+    assert info._info is None
+    assert len(info) == 2 and set(info) == {"x", "array"}
+    assert not info["array"].flags.writeable
+
+    info["y"] = 2
+    del info["x"]
+    assert dict(info).keys() == {"array", "y"}
+
+
+def test_unsupported_value():
+    with pytest.raises(TypeError):
+        InfoEncoder().encode({"x": object()})
@@ -0,0 +1,78 @@
+import gymnasium as gym
+import numpy as np
+
+from ferry.layout import ALIGNMENT, SpaceLayout, pack_value, scalar_value, space_spec, unpack_value
+from ferry.utils import decode, encode
+
+COMPOSITE = gym.spaces.Dict({
+    "image": gym.spaces.Box(0, 255, (4, 5, 3), np.uint8),
+    "state": gym.spaces.Tuple((gym.spaces.Discrete(3), gym.spaces.Box(-1, 1, (2,), np.float64))),
+    "keys": gym.spaces.MultiBinary(5),
+})
+
+
+def _assert_equal(value, expected):
+    if isinstance(expected, dict):
+        assert isinstance(value, dict) and value.keys() == expected.keys()
+        for key in expected:
+            _assert_equal(value[key], expected[key])
+    elif isinstance(expected, tuple):
+        assert isinstance(value, tuple) and len(value) == len(expected)
+        for item, expected_item in zip(value, expected):
+            _assert_equal(item, expected_item)
+    else:
+        np.testing.assert_array_equal(value, expected)
+
+
+def test_space_spec():
+    assert space_spec(gym.spaces.Discrete(4)).dtype == np.dtype(np.int64).str
+    assert tuple(space_spec(gym.spaces.Box(0, 1, (2, 3))).shape) == (2, 3)
+    assert list(space_spec(COMPOSITE).keys) == list(COMPOSITE.spaces)
+    assert space_spec(gym.spaces.Text(5)) is None
+    assert space_spec(gym.spaces.Dict({"text": gym.spaces.Text(5)})) is None
+
+
+def test_plain_round_trip():
+    space = gym.spaces.Box(-1, 1, (3, 2), np.float32)
+    layout = SpaceLayout(space_spec(space))
+    assert not layout.composite
+    value = space.sample()
+    _assert_equal(unpack_value(layout, pack_value(layout, value)), value)
+    assert unpack_value(None, pack_value(None, 2)) == 2
+
+
+def test_composite_round_trip():
+    COMPOSITE.seed(0)
+    layout = SpaceLayout(space_spec(COMPOSITE))
+    assert layout.composite
+    value = COMPOSITE.sample()
+
+    packed = pack_value(layout, value)
+    assert packed.dtype == np.uint8 and packed.shape == (layout.nbytes,)
+    _assert_equal(unpack_value(layout, decode(encode(packed))), value)
+
+
+def test_composite_batch():
+    COMPOSITE.seed(1)
+    layout = SpaceLayout(space_spec(COMPOSITE))
+    values = [COMPOSITE.sample() for _ in range(3)]
+
+    batch = unpack_value(layout, np.stack([pack_value(layout, value) for value in values]), (3,))
+    assert batch["image"].shape == (3, 4, 5, 3)
+    for i, value in enumerate(values):
+        _assert_equal({"image": batch["image"][i], "state": (batch["state"][0][i], batch["state"][1][i]),
+                       "keys": batch["keys"][i]}, value)
+
+
+def test_leaves_aligned():
+    layout = SpaceLayout(space_spec(COMPOSITE))
+    assert all(offset % ALIGNMENT == 0 for offset in layout.offsets)
+    assert layout.nbytes % ALIGNMENT == 0
+
+
+def test_scalar_value():
+    layout = SpaceLayout(space_spec(COMPOSITE))
+    value = scalar_value(unpack_value(layout, pack_value(layout, COMPOSITE.sample())))
+    assert isinstance(value["state"][0], np.int64)
+    assert {value["state"][0]: 1}[int(value["state"][0])] == 1
+    assert value["image"].shape == (4, 5, 3) and value["keys"].shape == (5,)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import numpy as np
+
+from ferry.mmap_backends import ClientBackend
+from ferry.policy_server import PolicyServer
+
+from tests.envs import channel, start
+
+
+def _run_client_backend(name: str):
+    ClientBackend("FerryCounting-v0", name=name, env_kwargs={"length": 3}).run()
+
+
+def _serve(label: str, num_clients: int, rounds: int, **kwargs) -> tuple[dict, list]:
+    """Answer client `i` with the action `i % 2`, and collect what each client sent, and the sizes of the batches."""
+    name = channel(label)
+    backends = [start(_run_client_backend, f"{name}_{i}") for i in range(num_clients)]
+    server = PolicyServer(num_clients, name=name, **kwargs)
+    sent, batches = {i: [] for i in range(num_clients)}, []
+    try:
+        server.reset(seed=0)
+        for _ in range(rounds):
+            ids, obs, rewards, terminated, truncated, infos = server.receive()
+            batches.append(len(ids))
+            for k, i in enumerate(ids):
+                sent[i].append((float(obs[k, 0]), rewards[k], bool(truncated[k]), dict(infos[k])))
+            server.respond(ids, ids % 2)
+    finally:
+        server.close()
+        for backend in backends:
+            backend.join(timeout=10)
+    assert all(backend.exitcode == 0 for backend in backends)
+    return sent, batches
+
+
+def test_batches():
+    sent, batches = _serve("policy", 3, rounds=6, max_wait=1.)
+    assert batches == [3] * 6
+    for i, steps in sent.items():
+        # The first request carries the reset observation, and the episodes roll over on the clients
+        assert [obs for obs, *_ in steps] == [0, 1, 2, 0, 1, 2]
+        assert [reward for _, reward, *_ in steps] == [0] + [i % 2] * 5
+        assert [truncated for _, _, truncated, _ in steps] == [False] * 3 + [True] + [False] * 2
+        final = steps[3][3]
+        assert final["final_obs"][0] == 3 and dict(final["final_info"]) == {"x": 1}
+
+
+def test_max_batch():
+    sent, batches = _serve("policy_batch", 3, rounds=6, max_batch=2, max_wait=1.)
+    assert all(1 <= size <= 2 for size in batches)
+    # Every client keeps being served in turn, stepping through its own episode
+    for steps in sent.values():
+        assert len(steps) >= 3 and [obs for obs, *_ in steps] == [0, 1, 2, 0, 1, 2][:len(steps)]
@@ -0,0 +1,78 @@
+import glob
+import os
+import time
+
+import pytest
+
+from ferry.pool import EnvPool, make_pooled_env, request_lease
+from ferry.shm import channel_path
+
+from tests.envs import start
+
+
+def _wait_until(ready, timeout: float = 10.):
+    deadline = time.monotonic() + timeout
+    while not ready():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def _offered(pool: EnvPool) -> int:
+    """The number of data channels open for clients to attach to."""
+    return len(glob.glob(channel_path(f"{pool.name}_*_[0-9]")))
+
+
+def _abandon(pool_name: str):
+    """Lease an env and die in the middle of an episode, without closing it."""
+    env = make_pooled_env(pool_name)
+    env.reset(seed=0)
+    env.step(0)
+    os._exit(0)
+
+
+@pytest.mark.parametrize("transport", ["mmap", "ring", "unix"])
+def test_lease_round_trip(transport: str):
+    with EnvPool("FerryCounting-v0", size=2, name=f"ferry_test_pool_{os.getpid()}", transport=transport) as pool:
+        channels = set()
+        for seed in range(3):
+            env = make_pooled_env(pool.name)
+            channels.add(env.communicator.name)
+            obs, _ = env.reset(seed=seed)
+            assert obs[0] == 0
+            obs, reward, *_ = env.step(1)
+            assert obs[0] == 1 and reward == 1.
+            env.close()
+        # Every lease is a fresh channel, and the workers take turns
+        assert len(channels) == 3
+        assert len({name.split("_")[-2] for name in channels}) == 2
+
+
+def test_dead_worker_leases_are_dropped():
+    pool = EnvPool("FerryCounting-v0", size=2, name=f"ferry_test_pool_{os.getpid()}").start(watch_interval=60)
+    try:
+        _wait_until(lambda: _offered(pool) == 2)
+        dead = pool.workers[0]
+        dead.terminate()
+        dead.join()
+        # The dead worker's lease is still queued, and must be skipped rather than handed out
+        lease = request_lease(pool.name)
+        assert lease.name.split("_")[-2] == str(pool.workers[1].pid)
+    finally:
+        pool.close()
+
+
+def test_abandoned_worker_is_replaced():
+    pool = EnvPool("FerryCounting-v0", size=1, name=f"ferry_test_pool_{os.getpid()}").start(watch_interval=0.05)
+    try:
+        worker = pool.workers[0]
+        client = start(_abandon, pool.name)
+        client.join(timeout=10)
+        _wait_until(lambda: pool.workers[0] is not worker and pool.workers[0].is_alive())
+        assert not worker.is_alive()
+
+        env = make_pooled_env(pool.name)
+        obs, _ = env.reset(seed=0)
+        assert obs[0] == 0
+        env.close()
+    finally:
+        pool.close()
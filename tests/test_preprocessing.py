@@ -0,0 +1,86 @@
+import gymnasium as gym
+import numpy as np
+import pytest
+
+from ferry.mmap_backends import ClientBackend, ServerBackend
+from ferry.mmap_envs import ClientEnv, ServerEnv
+from ferry.preprocessing import Preprocessing
+
+from tests.envs import channel, start
+
+PIXELS = gym.spaces.Box(0, 255, (8, 6, 3), np.uint8)
+
+
+def test_chain():
+    preprocessing = Preprocessing(["grayscale", "resize:4x3", "stack:2"], PIXELS)
+    assert preprocessing.observation_space == gym.spaces.Box(0, 255, (2, 4, 3), np.uint8)
+
+    white = np.full((8, 6, 3), 255, dtype=np.uint8)
+    red = np.zeros((8, 6, 3), dtype=np.uint8)
+    red[..., 0] = 200
+    np.testing.assert_array_equal(preprocessing.reset(white), np.full((2, 4, 3), 255))
+    # The newest frame comes last, and 0.299 of the red channel makes it through
+    stacked = preprocessing(red)
+    np.testing.assert_array_equal(stacked[0], np.full((4, 3), 255))
+    np.testing.assert_array_equal(stacked[1], np.full((4, 3), 60))
+    np.testing.assert_array_equal(preprocessing(white)[0], stacked[1])
+
+
+def test_uint8_scales_unit_floats():
+    preprocessing = Preprocessing(["uint8"], gym.spaces.Box(0, 1, (2,), np.float32))
+    np.testing.assert_array_equal(preprocessing.reset(np.array([0., 1.], dtype=np.float32)), [0, 255])
+    assert preprocessing.observation_space.dtype == np.uint8
+
+
+@pytest.mark.parametrize("steps", [["grayscale"], ["stack:2", "uint8"], ["blur"]])
+def test_invalid_chains(steps: list):
+    with pytest.raises(ValueError):
+        Preprocessing(steps, gym.spaces.Box(0, 1, (4, 4), np.float32))
+
+
+def _run_server_backend(name: str):
+    ServerBackend("FerryCounting-v0", name=name, wait="block").run()
+
+
+def _run_client_backend(name: str):
+    ClientBackend("FerryCounting-v0", name=name).run()
+
+
+@pytest.mark.parametrize("frames", [True, False])
+def test_client_env(frames: bool):
+    name = channel(f"preprocess_{frames}")
+    backend = start(_run_server_backend, name)
+    env = ClientEnv(name=name, frames=frames, preprocess=["stack:3"])
+    try:
+        assert env.preprocess == ["stack:3"]
+        observations = [env.reset(seed=0)[0]] + [env.step(1)[0] for _ in range(3)]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    np.testing.assert_array_equal(np.stack(observations)[..., 0], [[0, 0, 0], [0, 0, 1], [0, 1, 2], [1, 2, 3]])
+
+
+def test_server_env():
+    name = channel("preprocess_server")
+    backend = start(_run_client_backend, name)
+    env = ServerEnv(name=name, wait="block", preprocess=["stack:2"])
+    try:
+        assert env.preprocess == ["stack:2"]
+        env.reset(seed=0)
+        observations = [env.step(1)[0] for _ in range(3)]
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+    np.testing.assert_array_equal(np.stack(observations)[..., 0], [[0, 0], [0, 1], [1, 2]])
+
+
+def test_declined_chain():
+    name = channel("preprocess_declined")
+    backend = start(_run_server_backend, name)
+    # The env's observations have no RGB axis, so the backend declines and the env side raises
+    with pytest.raises(ValueError, match="declined"):
+        ClientEnv(name=name, preprocess=["grayscale"])
+    backend.join(timeout=10)
+    assert backend.exitcode == 0
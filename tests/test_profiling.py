@@ -0,0 +1,55 @@
+import io
+import threading
+import time
+
+from ferry import profiling
+
+
+def test_record_and_stats():
+    profiling.reset()
+    for ns in (1_000, 2_000, 1_000_000):
+        profiling.record("phase", time.perf_counter_ns() - ns, nbytes=10)
+    stats = profiling.stats()["phase"]
+    assert stats["count"] == 3 and stats["bytes"] == 30
+    assert stats["max_us"] >= 1_000 and stats["p50_us"] < stats["p99_us"]
+
+    out = io.StringIO()
+    profiling.dump(out)
+    assert "phase" in out.getvalue()
+    profiling.reset()
+    assert profiling.stats() == {}
+
+
+def test_stats_while_phases_are_added():
+    profiling.reset()
+    done = threading.Event()
+
+    def add_phases():
+        i = 0
+        while not done.is_set():
+            profiling.record(f"phase_{i % 1000}", time.perf_counter_ns())
+            if i % 1000 == 999:
+                profiling.reset()
+            i += 1
+
+    thread = threading.Thread(target=add_phases)
+    thread.start()
+    try:
+        for _ in range(100):
+            profiling.stats()
+    finally:
+        done.set()
+        thread.join()
+        profiling.reset()
+
+
+def test_dump_thread():
+    out = io.StringIO()
+    profiling.enable(dump_interval=0.01, file=out)
+    try:
+        profiling.record("phase", time.perf_counter_ns())
+        time.sleep(0.1)
+    finally:
+        profiling.disable()
+        profiling.reset()
+    assert "phase" in out.getvalue()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pytest
+
+from ferry.mmap_backends import ServerBackend
+from ferry.mmap_envs import ClientEnv
+from ferry.recording import TrajectoryReader, TrajectoryRecorder
+
+from tests.envs import CountingEnv, LookupEnv, channel, start
+
+
+def _record(path: str, env, actions: list, episodes: int):
+    recorder = TrajectoryRecorder(path, env.observation_space, env.action_space, capacity=4)
+    for episode in range(episodes):
+        obs, _ = env.reset(seed=episode)
+        recorder.reset(obs)
+        for action in actions:
+            obs, reward, terminated, truncated, _ = env.step(action)
+            recorder.step(action, obs, reward, terminated, truncated)
+            if terminated or truncated:
+                break
+    recorder.close()
+
+
+def test_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "counting")
+    _record(path, CountingEnv(length=5), [1, 0, 1, 1, 0, 1], episodes=3)
+
+    reader = TrajectoryReader(path)
+    assert reader.num_episodes == 3 and len(reader) == 15
+    episode = reader.episode(1)
+    np.testing.assert_array_equal(episode["obs"][:, 0], np.arange(6))
+    np.testing.assert_array_equal(episode["action"], [0, 1, 0, 1, 1, 0])
+    np.testing.assert_array_equal(episode["reward"], [0, 1, 0, 1, 1, 0])
+    np.testing.assert_array_equal(episode["truncated"], [False] * 5 + [True])
+
+    batch = reader.sample(32, rng=np.random.default_rng(0))
+    assert batch["obs"].shape == (32, 1) and batch["reward"].shape == (32,)
+    # Each observation counts the steps so far, so the next one is always one more
+    np.testing.assert_array_equal(batch["next_obs"], batch["obs"] + 1)
+    np.testing.assert_array_equal(batch["truncated"], batch["next_obs"][:, 0] == 5)
+
+
+def test_composite_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "lookup")
+    actions = [{"move": move, "force": np.array([0.5, -0.5], dtype=np.float32)} for move in [2, 2, 0]]
+    _record(path, LookupEnv(), actions, episodes=1)
+
+    reader = TrajectoryReader(path)
+    assert len(reader) == 3
+    episode = reader.episode(0)
+    np.testing.assert_array_equal(episode["obs"]["pos"], [2, 3, 4, 3])
+    np.testing.assert_array_equal(episode["action"]["move"], [0, 2, 2, 0])
+    batch = reader.sample(8, rng=np.random.default_rng(0))
+    assert batch["obs"]["vel"].shape == (8, 2)
+
+
+def test_sample_without_finished_episode(tmp_path):
+    path = os.path.join(tmp_path, "unfinished")
+    env = CountingEnv()
+    recorder = TrajectoryRecorder(path, env.observation_space, env.action_space)
+    obs, _ = env.reset()
+    recorder.reset(obs)
+    recorder.step(1, *env.step(1)[:4])
+
+    reader = TrajectoryReader(path)
+    with pytest.raises(ValueError, match="No finished transitions"):
+        reader.sample(4)
+    recorder.close()
+    reader.refresh()
+    assert len(reader.sample(4)["reward"]) == 4
+
+
+def _run_server_backend(name: str, record: str):
+    ServerBackend("FerryCounting-v0", name=name, wait="block", record=record).run()
+
+
+def test_backend_records(tmp_path):
+    name, path = channel("recording"), os.path.join(tmp_path, "backend")
+    backend = start(_run_server_backend, name, path)
+    env = ClientEnv(name=name)
+    try:
+        for _ in range(2):
+            env.reset()
+            for action in [1, 0, 1]:
+                env.step(action)
+    finally:
+        env.close()
+        backend.join(timeout=10)
+    assert backend.exitcode == 0
+
+    reader = TrajectoryReader(path)
+    assert reader.num_episodes == 2
+    np.testing.assert_array_equal(reader.episode(0)["reward"], [0, 1, 0, 1])
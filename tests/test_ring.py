@@ -0,0 +1,88 @@
+import threading
+
+import gymnasium as gym
+import numpy as np
+
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.layout import FrameLayout, space_spec
+from ferry.ring import RingCommunicator
+from ferry.utils import decode, encode
+
+from tests.envs import channel
+
+
+def _message(nbytes: int, seed: int = 0) -> gym_ferry_pb2.GymnasiumMessage:
+    data = np.random.default_rng(seed).integers(0, 256, nbytes, dtype=np.uint8)
+    return gym_ferry_pb2.GymnasiumMessage(action=encode(data))
+
+
+def _pair(label: str, **kwargs) -> tuple:
+    name = channel(label)
+    creator = RingCommunicator(name, create=True, size=4096, slots=4, **kwargs)
+    return creator, RingCommunicator(name, create=False)
+
+
+def test_queued_messages():
+    creator, attached = _pair("ring_queue")
+    try:
+        assert not attached.poll()
+        # Both directions queue messages without waiting for the other side, in order
+        for i in range(3):
+            creator.send_message(_message(16, seed=i))
+        attached.send_message(gym_ferry_pb2.GymnasiumMessage(request=True))
+        assert attached.poll()
+        for i in range(3):
+            assert attached.receive_message() == _message(16, seed=i)
+        assert not attached.poll()
+        assert creator.receive_message().request
+    finally:
+        attached.close()
+        creator.close()
+
+
+def test_chunked_messages():
+    creator, attached = _pair("ring_chunks")
+    try:
+        # Spread over a few slots of the ring
+        creator.send_message(_message(2500))
+        assert attached.receive_message() == _message(2500)
+
+        # Larger than the whole ring, so the sender waits for the receiver to free slots
+        sender = threading.Thread(target=creator.send_message, args=(_message(20_000, seed=1),))
+        sender.start()
+        received = attached.receive_message()
+        sender.join()
+        assert received == _message(20_000, seed=1)
+        assert np.array_equal(decode(received.action), decode(_message(20_000, seed=1).action))
+    finally:
+        attached.close()
+        creator.close()
+
+
+def test_frames():
+    creator, attached = _pair("ring_frames")
+    space = gym.spaces.Box(-1, 1, (3,), np.float32)
+    layout = FrameLayout(space_spec(space), space_spec(gym.spaces.Discrete(2)))
+    try:
+        creator.set_layout(layout)
+        attached.set_layout(layout)
+        for i in range(6):
+            creator.send_frame(obs=np.full(3, i / 10, dtype=np.float32), reward=float(i), terminated=i == 5)
+            assert attached.receive_message() is None
+            np.testing.assert_array_equal(attached.frame["obs"], np.full(3, i / 10, dtype=np.float32))
+            assert attached.frame["reward"] == i and attached.frame["terminated"] == (i == 5)
+        # Frames and messages can be mixed
+        creator.send_message(gym_ferry_pb2.GymnasiumMessage(close=True))
+        assert attached.receive_message().close
+    finally:
+        attached.close()
+        creator.close()
+
+
+def test_close_releases_mapping():
+    creator, attached = _pair("ring_close")
+    creator.send_message(_message(16))
+    attached.receive_message()
+    attached.close()
+    creator.close()
+    assert creator.map.closed and attached.map.closed
@@ -0,0 +1,118 @@
+import socket
+import threading
+
+import gymnasium as gym
+import numpy as np
+import pytest
+
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.layout import FrameLayout, space_spec
+from ferry.sockets import SocketCommunicator
+from ferry.utils import encode
+
+from tests.envs import channel
+
+
+def _message(nbytes: int, seed: int = 0) -> gym_ferry_pb2.GymnasiumMessage:
+    data = np.random.default_rng(seed).integers(0, 256, nbytes, dtype=np.uint8)
+    return gym_ferry_pb2.GymnasiumMessage(action=encode(data))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def _pair(label: str, transport: str) -> tuple:
+    """The listening side accepts in a thread while the other one connects."""
+    name = channel(label)
+    address = ("localhost", _free_port()) if transport == "tcp" else None
+    created = []
+    listener = threading.Thread(target=lambda: created.append(SocketCommunicator(name, create=True, address=address)))
+    listener.start()
+    attached = SocketCommunicator(name, create=False, address=address)
+    listener.join()
+    return created[0], attached
+
+
+@pytest.mark.parametrize("transport", ["unix", "tcp"])
+def test_messages(transport: str):
+    creator, attached = _pair(f"socket_messages_{transport}", transport)
+    try:
+        for i in range(3):
+            creator.send_message(_message(16, seed=i))
+        attached.send_message(gym_ferry_pb2.GymnasiumMessage(request=True))
+        for i in range(3):
+            assert attached.receive_message() == _message(16, seed=i)
+        assert creator.poll() and creator.receive_message().request
+
+        # Much larger than the socket buffers, so the sender waits for the receiver to drain them
+        sender = threading.Thread(target=creator.send_message, args=(_message(8 << 20, seed=1),))
+        sender.start()
+        received = attached.receive_message()
+        sender.join()
+        assert received == _message(8 << 20, seed=1)
+    finally:
+        attached.close()
+        creator.close()
+
+
+@pytest.mark.parametrize("transport", ["unix", "tcp"])
+def test_frames(transport: str):
+    creator, attached = _pair(f"socket_frames_{transport}", transport)
+    layout = FrameLayout(space_spec(gym.spaces.Box(0, 255, (256, 256, 3), np.uint8)),
+                         space_spec(gym.spaces.Discrete(2)))
+    try:
+        creator.set_layout(layout)
+        attached.set_layout(layout)
+        for i in range(3):
+            obs = np.full((256, 256, 3), i, dtype=np.uint8)
+            sender = threading.Thread(target=creator.send_frame, kwargs={"obs": obs, "reward": float(i)})
+            sender.start()
+            assert attached.receive_message() is None
+            sender.join()
+            np.testing.assert_array_equal(attached.frame["obs"], obs)
+            assert attached.frame["reward"] == i
+        # Only the fields that were sent are received, the others keep their last values
+        creator.send_frame(terminated=True)
+        assert attached.receive_message() is None
+        assert attached.frame["terminated"] and attached.frame["reward"] == 2
+        creator.send_message(gym_ferry_pb2.GymnasiumMessage(close=True))
+        assert attached.receive_message().close
+    finally:
+        attached.close()
+        creator.close()
+
+
+class _TrickleSocket:
+    """Takes at most `limit` bytes per sendmsg, as a socket may when interrupted."""
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.received = bytearray()
+
+    def sendmsg(self, buffers):
+        data = b"".join(bytes(buffer) for buffer in buffers)[:self.limit]
+        self.received += data
+        return len(data)
+
+
+def test_partial_sends():
+    creator, attached = _pair("socket_partial", "unix")
+    creator.sock, sock = _TrickleSocket(limit=7), creator.sock
+    try:
+        creator.send_message(_message(100))
+        serialized = _message(100).SerializeToString()
+        assert bytes(creator.sock.received) == len(serialized).to_bytes(4, byteorder="little") + bytes(4) + serialized
+    finally:
+        creator.sock = sock
+        attached.close()
+        creator.close()
+
+
+def test_closed_by_other_side():
+    creator, attached = _pair("socket_closed", "unix")
+    creator.close()
+    with pytest.raises(ConnectionError):
+        attached.receive_message()
+    attached.close()
@@ -0,0 +1,61 @@
+import numpy as np
+
+from ferry.vector_envs import BatchClientEnv, ClientVectorEnv
+
+from tests.envs import channel
+
+
+def test_client_vector_env():
+    env = ClientVectorEnv(num_envs=2, env_id="FerryCounting-v0", env_kwargs={"length": 3}, name=channel("vector"),
+                          wait="block")
+    try:
+        obs, info = env.reset(seed=0, options={"level": 1})
+        np.testing.assert_array_equal(obs, np.zeros((2, 1)))
+        np.testing.assert_array_equal(info["options"]["level"], [1, 1])
+        for t in range(1, 3):
+            obs, reward, terminated, truncated, info = env.step(np.array([1, 0]))
+            np.testing.assert_array_equal(obs[:, 0], [t, t])
+            np.testing.assert_array_equal(reward, [1, 0])
+            assert not terminated.any() and not truncated.any()
+
+        # Both backends reset in the step their episode ends, with the final observation in the info
+        obs, reward, terminated, truncated, info = env.step(np.array([0, 1]))
+        assert truncated.all()
+        np.testing.assert_array_equal(obs, np.zeros((2, 1)))
+        np.testing.assert_array_equal(np.stack(info["final_obs"])[:, 0], [3, 3])
+        np.testing.assert_array_equal(info["final_info"]["x"], [1, 1])
+
+        obs, *_ = env.step(np.array([1, 1]))
+        np.testing.assert_array_equal(obs[:, 0], [1, 1])
+    finally:
+        env.close()
+    assert all(process.exitcode == 0 for process in env.processes)
+
+
+def test_batch_client_env():
+    env = BatchClientEnv(num_envs=3, env_id="FerryCounting-v0", env_kwargs={"length": 3}, name=channel("batch"),
+                         wait="block")
+    try:
+        obs, _ = env.reset(seed=0)
+        np.testing.assert_array_equal(obs, np.zeros((3, 1)))
+        for t in range(1, 3):
+            obs, reward, terminated, truncated, info = env.step(np.array([1, 0, 1]))
+            np.testing.assert_array_equal(obs[:, 0], [t] * 3)
+            np.testing.assert_array_equal(reward, [1, 0, 1])
+            assert not terminated.any() and not truncated.any()
+        np.testing.assert_array_equal(info["x"], [1, 1, 1])
+
+        obs, reward, terminated, truncated, info = env.step(np.array([0, 1, 0]))
+        assert truncated.all()
+        # Finished copies are reset on the backend, their last observation comes along in the info
+        np.testing.assert_array_equal(obs, np.zeros((3, 1)))
+        np.testing.assert_array_equal(np.stack(info["final_obs"])[:, 0], [3, 3, 3])
+        np.testing.assert_array_equal(info["final_info"]["x"], [1, 1, 1])
+
+        # Like ClientVectorEnv, the results are the caller's to modify
+        for array in (obs, reward, terminated, truncated, info["final_obs"][0]):
+            assert array.flags.writeable
+        reward += 1
+    finally:
+        env.close()
+    assert env.process.exitcode == 0
@@ -0,0 +1,57 @@
+import os
+import threading
+
+import pytest
+
+from ferry.core import Communicator
+from ferry.gym_grpc import gym_ferry_pb2
+from ferry.shm import channel_path
+from ferry.wait import WAIT_STRATEGIES
+
+from tests.envs import channel
+
+
+def _echo(communicator: Communicator, count: int):
+    for _ in range(count):
+        communicator.send_message(communicator.receive_message())
+
+
+@pytest.mark.parametrize("wait", list(WAIT_STRATEGIES))
+def test_round_trips(wait: str):
+    name = channel(f"wait_{wait}")
+    creator = Communicator(name, create=True, wait=wait)
+    attached = Communicator(name, create=False)
+    # The attaching side adopts the creator's strategy from the header
+    assert type(attached.waiter) is type(creator.waiter) is WAIT_STRATEGIES[wait]
+
+    echo = threading.Thread(target=_echo, args=(attached, 5))
+    echo.start()
+    try:
+        for i in range(5):
+            msg = gym_ferry_pb2.GymnasiumMessage(reset_args=gym_ferry_pb2.ResetArgs(seed=i))
+            creator.send_message(msg)
+            assert creator.receive_message() == msg
+    finally:
+        echo.join()
+        attached.close()
+        creator.close()
+
+
+def test_blocking_wait_pipes():
+    name = channel("wait_pipes")
+    creator = Communicator(name, create=True, wait="block")
+    attached = Communicator(name, create=False)
+    paths = [channel_path(f"{name}.wake{code}") for code in (1, 2)]
+    assert all(os.path.exists(path) for path in paths)
+
+    # Waiting past the spins blocks on the pipe until the other side hands the turn over
+    creator.waiter.spins = attached.waiter.spins = 0
+    receiver = threading.Thread(target=attached.receive_message)
+    receiver.start()
+    creator.send_message(gym_ferry_pb2.GymnasiumMessage(status=True))
+    receiver.join(timeout=10)
+    assert not receiver.is_alive()
+
+    attached.close()
+    creator.close()
+    assert not any(os.path.exists(path) for path in paths)